@@ -23,6 +23,12 @@ def create_app():
     from app.routes.api.v1.scheduler_routes import bp as scheduler_bp
     app.register_blueprint(scheduler_bp, url_prefix='/api/v1')
 
+    from app.routes.api.v1.stream_routes import bp as stream_bp
+    app.register_blueprint(stream_bp, url_prefix='/api/v1')
+
+    from app.routes.api.v1.scan_routes import bp as scans_bp
+    app.register_blueprint(scans_bp, url_prefix='/api/v1')
+
     # Start background scheduler
     from app.services.scheduler_service import init_scheduler
     init_scheduler(app)
@@ -1,5 +1,23 @@
 import os
 
+
+def _probe_socket_cap(requested):
+    """Clamp the sweep's open sockets to a quarter of the soft open-files limit.
+
+    The rest is left to gunicorn's threads, pooled SMB/DB connections and a
+    second scan type sweeping at the same time. No clamp where the resource
+    module (RLIMIT_NOFILE) is unavailable, e.g. on Windows.
+    """
+    try:
+        import resource
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ImportError, OSError, ValueError):
+        return requested
+    if soft == resource.RLIM_INFINITY:
+        return requested
+    return max(1, min(requested, soft // 4))
+
+
 class Config:
     DB_SERVER = os.getenv('DB_SERVER')
     DB_DATABASE = os.getenv('DB_DATABASE')
@@ -7,6 +25,8 @@ class Config:
     DB_PASSWORD = os.getenv('DB_PASSWORD')
     SHARE_NAME = os.getenv('SHARE', 'd$')
     FOLDER_PATH = os.getenv('FOLDER', 'BackupFull')
+    # SMB search patterns for backup files, e.g. '*.bak,*.bak.zip'
+    BACKUP_FILE_PATTERNS = [p.strip() for p in os.getenv('BACKUP_FILE_PATTERNS', '*.bak').split(',') if p.strip()]
     SHARE_USERNAME = os.getenv('SMB_USER')
     SHARE_PASSWORD = os.getenv('SMB_PASS')
     PING_COMMAND = 'ping -n 3' if os.name == 'nt' else 'ping -c 3'
@@ -14,9 +34,39 @@ class Config:
     TIMEOUT = 30
     MAX_RETRIES = 3
 
+    # Scan pipeline: a TCP/445 sweep (up to SCAN_PROBE_CONCURRENCY sockets open
+    # at once) feeds reachable hosts to a bounded SMB stage (SCAN_SMB_WORKERS)
+    SCAN_PROBE_CONCURRENCY = _probe_socket_cap(int(os.getenv('SCAN_PROBE_CONCURRENCY', '256')))
+    SCAN_SMB_WORKERS = int(os.getenv('SCAN_SMB_WORKERS', str(MAX_WORKERS)))  # initial limit
+    SCAN_SMB_MIN_WORKERS = int(os.getenv('SCAN_SMB_MIN_WORKERS', '2'))
+    SCAN_SMB_MAX_WORKERS = int(os.getenv('SCAN_SMB_MAX_WORKERS', '64'))
+    PROBE_TIMEOUT = int(os.getenv('PROBE_TIMEOUT', '5'))
+    PROBE_RETRY_DELAY = int(os.getenv('PROBE_RETRY_DELAY', '1'))
+
+    # Scan results are saved in micro-batches of this size, or once the
+    # oldest buffered result is this many seconds old
+    SCAN_SAVE_BATCH_SIZE = int(os.getenv('SCAN_SAVE_BATCH_SIZE', '50'))
+    SCAN_SAVE_FLUSH_SECONDS = int(os.getenv('SCAN_SAVE_FLUSH_SECONDS', '5'))
+
+    # SMB sessions stay warm across checks/scans until idle this long
+    SMB_SESSION_IDLE_TTL_SECONDS = int(os.getenv('SMB_SESSION_IDLE_TTL_SECONDS', '900'))
+
+    # Adaptive (AIMD) SMB concurrency: +1 per healthy window of checks,
+    # x DECREASE_FACTOR when errors or latency spike within a window
+    SCAN_AIMD_WINDOW = int(os.getenv('SCAN_AIMD_WINDOW', '20'))
+    SCAN_AIMD_ERROR_THRESHOLD = float(os.getenv('SCAN_AIMD_ERROR_THRESHOLD', '0.2'))
+    SCAN_AIMD_LATENCY_FACTOR = float(os.getenv('SCAN_AIMD_LATENCY_FACTOR', '2.0'))
+    SCAN_AIMD_DECREASE_FACTOR = float(os.getenv('SCAN_AIMD_DECREASE_FACTOR', '0.5'))
+
     # IBSTORAGE: USB portable drive with variable drive letter
     IB_STORAGE_DRIVES = os.getenv('IB_STORAGE_DRIVES', 'e$,f$,g$,h$,i$').split(',')
     IB_STORAGE_FOLDER = os.getenv('IB_STORAGE_FOLDER', 'BackupFull')
+    # Threads shared by all concurrent IBSTORAGE drive-letter probes in a worker;
+    # by default enough for every SMB worker to probe all drives at once, so
+    # probes never queue behind each other inside a check's timeout
+    IB_DRIVE_PROBE_MAX_WORKERS = int(os.getenv(
+        'IB_DRIVE_PROBE_MAX_WORKERS', str(SCAN_SMB_MAX_WORKERS * len(IB_STORAGE_DRIVES))
+    ))
 
     # JWT Authentication
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'fallback-dev-secret-change-me')
@@ -27,10 +77,57 @@ class Config:
     SCHEDULER_INTERVAL_MINUTES = int(os.getenv('SCHEDULER_INTERVAL_MINUTES', '60'))
     SCHEDULER_START_HOUR = int(os.getenv('SCHEDULER_START_HOUR', '8'))
     SCHEDULER_END_HOUR = int(os.getenv('SCHEDULER_END_HOUR', '0'))  # 0 = midnight (12 AM)
+    # 'separate' = D-drive and IBSTORAGE jobs; 'combined' = one visit per outlet for both
+    SCHEDULER_SCAN_MODE = os.getenv('SCHEDULER_SCAN_MODE', 'separate').lower()
     SCHEDULER_STALE_RUNNING_TIMEOUT_MINUTES = int(os.getenv('SCHEDULER_STALE_RUNNING_TIMEOUT_MINUTES', '120'))
 
     # Central Server (EPSMirror) — read-only sync source
     CENTRAL_DB_SERVER = os.getenv('CENTRAL_DB_SERVER')
     CENTRAL_DB_DATABASE = os.getenv('CENTRAL_DB_DATABASE')
     CENTRAL_DB_USERNAME = os.getenv('CENTRAL_DB_USERNAME')
-    CENTRAL_DB_PASSWORD = os.getenv('CENTRAL_DB_PASSWORD')
\ No newline at end of file
+    CENTRAL_DB_PASSWORD = os.getenv('CENTRAL_DB_PASSWORD')
+
+    # Outlet sync runs as its own scheduler job every OUTLET_SYNC_INTERVAL_MINUTES;
+    # a scan only syncs on demand when the last sync is older than OUTLET_SYNC_TTL_MINUTES
+    OUTLET_SYNC_INTERVAL_MINUTES = int(os.getenv('OUTLET_SYNC_INTERVAL_MINUTES', '30'))
+    OUTLET_SYNC_TTL_MINUTES = int(os.getenv('OUTLET_SYNC_TTL_MINUTES', '60'))
+
+    # pyodbc connection pools (app/db_pool.py), one set per worker process
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+    CENTRAL_DB_POOL_MAX_SIZE = int(os.getenv('CENTRAL_DB_POOL_MAX_SIZE', '2'))
+    DB_POOL_IDLE_TIMEOUT_SECONDS = int(os.getenv('DB_POOL_IDLE_TIMEOUT_SECONDS', '300'))
+    DB_POOL_CHECKOUT_TIMEOUT_SECONDS = int(os.getenv('DB_POOL_CHECKOUT_TIMEOUT_SECONDS', '30'))
+
+    # Paged stats reads (/backup-stats, /ibstorage-stats with limit/cursor/sort/...)
+    STATS_PAGE_SIZE = int(os.getenv('STATS_PAGE_SIZE', '100'))
+    STATS_PAGE_MAX_SIZE = int(os.getenv('STATS_PAGE_MAX_SIZE', '1000'))
+    # Browser/proxy cache lifetime of the stats count endpoints (the UI polls every 30s)
+    STATS_COUNT_MAX_AGE_SECONDS = int(os.getenv('STATS_COUNT_MAX_AGE_SECONDS', '30'))
+    # Rows fetched (fetchmany) and written per chunk by the streaming stats exports
+    STATS_EXPORT_CHUNK_SIZE = int(os.getenv('STATS_EXPORT_CHUNK_SIZE', '1000'))
+    # Exports running at once per worker; each holds a DB_POOL_MAX_SIZE connection
+    # for the whole download, so slow clients cannot starve scans and API reads
+    STATS_EXPORT_MAX_CONCURRENT = int(os.getenv('STATS_EXPORT_MAX_CONCURRENT', '2'))
+
+    # Server-push stats stream (/stats/stream): change checks per worker, keep-alive
+    # comments, per-subscriber event buffer and the subscriber cap per worker
+    STATS_STREAM_POLL_SECONDS = int(os.getenv('STATS_STREAM_POLL_SECONDS', '3'))
+    STATS_STREAM_HEARTBEAT_SECONDS = int(os.getenv('STATS_STREAM_HEARTBEAT_SECONDS', '15'))
+    STATS_STREAM_QUEUE_SIZE = int(os.getenv('STATS_STREAM_QUEUE_SIZE', '100'))
+    # Every open stream holds one gunicorn thread for its lifetime, so by default
+    # at most a quarter of a worker's threads (GUNICORN_THREADS, the Dockerfile's
+    # --threads) serve streams; the rest stay free for scans and plain requests
+    GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', '16'))
+    STATS_STREAM_MAX_SUBSCRIBERS = int(os.getenv('STATS_STREAM_MAX_SUBSCRIBERS', str(max(1, GUNICORN_THREADS // 4))))
+
+    # Shared scan registry (Scan_Registry): a Running scan silent for longer than
+    # STALE_SECONDS is taken over, progress is written at most every PROGRESS_SECONDS
+    # and attached clients poll it every POLL_SECONDS
+    SCAN_REGISTRY_STALE_SECONDS = int(os.getenv('SCAN_REGISTRY_STALE_SECONDS', '300'))
+    SCAN_REGISTRY_PROGRESS_SECONDS = float(os.getenv('SCAN_REGISTRY_PROGRESS_SECONDS', '2'))
+    SCAN_REGISTRY_POLL_SECONDS = float(os.getenv('SCAN_REGISTRY_POLL_SECONDS', '1'))
+
+    # Detached scan jobs (/scans): finished jobs kept per worker for GET /scans/<id>,
+    # and how long GET /backup-status waits for its scan (below the gunicorn --timeout)
+    SCAN_JOB_HISTORY = int(os.getenv('SCAN_JOB_HISTORY', '20'))
+    SCAN_JOB_WAIT_SECONDS = int(os.getenv('SCAN_JOB_WAIT_SECONDS', '240'))
\ No newline at end of file
@@ -0,0 +1,348 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import pyodbc
+from app.config import Config
+
+
+class PoolTimeoutError(pyodbc.Error):
+    """No pooled connection became free within the checkout timeout."""
+
+
+def _is_disconnect(error):
+    """True for pyodbc errors that mean the connection itself is gone (SQLSTATE 08xxx).
+
+    Other OperationalErrors (query timeout HYT00, deadlock victims) leave the
+    connection usable and must not reset the pool.
+    """
+    sqlstate = error.args[0] if isinstance(error, pyodbc.Error) and error.args else ''
+    return isinstance(sqlstate, str) and sqlstate.startswith('08')
+
+
+class PooledConnection:
+    """A checked-out pyodbc connection.
+
+    Behaves like the pyodbc connection it wraps. `with conn:` keeps pyodbc's
+    semantics (commit on success, rollback on error) and then hands the
+    connection back to the pool; close() also returns it instead of closing.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._broken = False
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise pyodbc.ProgrammingError('Attempt to use a connection returned to the pool')
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._raw is not None:
+                if exc_type is None:
+                    self._raw.commit()
+                else:
+                    self._raw.rollback()
+        except pyodbc.Error as e:
+            self._broken = self._broken or _is_disconnect(e)
+        finally:
+            if exc is not None and _is_disconnect(exc):
+                self._broken = True
+            self.close()
+        return False
+
+    def close(self):
+        """Return the connection to the pool (idempotent)."""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw, broken=self._broken)
+
+    def __del__(self):
+        # Safety net for code paths that never close the connection
+        if self.__dict__.get('_raw') is not None:
+            self.close()
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of pyodbc connections to one database.
+
+    - At most max_size connections are open; further checkouts wait up to
+      checkout_timeout seconds, then raise PoolTimeoutError.
+    - Connections idle longer than idle_timeout are closed.
+    - A connection that sat idle more than HEALTH_CHECK_AFTER seconds is
+      checked with SELECT 1 before it is handed out.
+    - A connection that fails with a disconnect error is discarded along
+      with every idle one, since they most likely share its fate (e.g. the
+      SQL Server restarted).
+    """
+
+    HEALTH_CHECK_AFTER = 30  # seconds idle before a checkout runs SELECT 1
+
+    def __init__(self, name, conn_str, max_size, idle_timeout, checkout_timeout):
+        self.name = name
+        self._conn_str = conn_str
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (raw connection, last_used), most recent on the right
+        self._open = 0
+        self._in_use = 0
+
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+        self._wait_seconds_total = 0.0
+        self._wait_seconds_max = 0.0
+
+    # ------------------------------------------------------------------
+    # Checkout
+    # ------------------------------------------------------------------
+
+    def connection(self):
+        """Check out a connection; use as `with pool.connection() as conn:` or close() it."""
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        waited = False
+
+        while True:
+            raw = None
+            create = False
+            evicted = []
+            try:
+                with self._cond:
+                    evicted += self._evict_idle()
+                    while not self._idle and self._open >= self.max_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.timeouts += 1
+                            raise PoolTimeoutError(
+                                'HYT00', f"[{self.name}] No database connection free after {self.checkout_timeout}s"
+                            )
+                        waited = True
+                        self._cond.wait(remaining)
+                        evicted += self._evict_idle()
+
+                    if self._idle:
+                        raw, last_used = self._idle.pop()
+                        stale = time.monotonic() - last_used > self.HEALTH_CHECK_AFTER
+                    else:
+                        create = True
+                        stale = False
+                        self._open += 1
+                    self._in_use += 1
+            finally:
+                # Closing is a network round trip; never hold up checkouts with it
+                for stale_raw in evicted:
+                    self._close_quietly(stale_raw)
+
+            if create:
+                try:
+                    raw = pyodbc.connect(self._conn_str)
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.created += 1
+            elif stale and not self._is_alive(raw):
+                self._discard(raw, in_use=True)
+                continue
+
+            waited_for = time.monotonic() - started
+            with self._cond:
+                self.checkouts += 1
+                if waited:
+                    self.waits += 1
+                    self._wait_seconds_total += waited_for
+                    self._wait_seconds_max = max(self._wait_seconds_max, waited_for)
+            return PooledConnection(self, raw)
+
+    def release(self, raw, broken=False):
+        if not broken:
+            try:
+                raw.rollback()  # never hand out an open transaction
+            except pyodbc.Error as e:
+                broken = _is_disconnect(e)
+        if broken:
+            self._discard(raw, in_use=True)
+            self.reset()
+            return
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+
+    def reset(self):
+        """Close every idle connection (after a disconnect was seen)."""
+        with self._cond:
+            idle = [raw for raw, _ in self._idle]
+            self._idle.clear()
+            self._open -= len(idle)
+            self.discarded += len(idle)
+            self._cond.notify_all()
+        for raw in idle:
+            self._close_quietly(raw)
+
+    def _evict_idle(self):
+        """Take connections idle longer than idle_timeout out of the pool (caller holds _cond).
+
+        Returns them for the caller to close once it has released _cond.
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        evicted = []
+        while self._idle and self._idle[0][1] < cutoff:
+            raw, _ = self._idle.popleft()
+            self._open -= 1
+            self.discarded += 1
+            evicted.append(raw)
+        return evicted
+
+    def _discard(self, raw, in_use=False):
+        with self._cond:
+            self._open -= 1
+            if in_use:
+                self._in_use -= 1
+            self.discarded += 1
+            self._cond.notify()
+        self._close_quietly(raw)
+
+    @staticmethod
+    def _is_alive(raw):
+        try:
+            cursor = raw.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                'maxSize': self.max_size,
+                'open': self._open,
+                'inUse': self._in_use,
+                'idle': len(self._idle),
+                'utilization': round(self._in_use / self.max_size, 3),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'avgWaitMs': round(self._wait_seconds_total / self.waits * 1000) if self.waits else 0,
+                'maxWaitMs': round(self._wait_seconds_max * 1000),
+                'timeouts': self.timeouts,
+                'created': self.created,
+                'discarded': self.discarded,
+            }
+
+
+@contextmanager
+def app_lock(conn, resource, timeout_ms=0):
+    """Hold an exclusive sp_getapplock on resource for the duration of the block.
+
+    Yields True when the lock was granted, False when another session held
+    it for longer than timeout_ms. The lock is owned by the session rather
+    than a transaction: in pyodbc's manual-commit mode SQL Server has no
+    transaction open yet when the lock is requested, and a transaction-owned
+    lock would be rejected. It is released on leaving the block, so commit
+    inside it; a connection whose release fails is discarded rather than
+    returned to the pool still holding the lock.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SET NOCOUNT ON;
+        DECLARE @result INT;
+        EXEC @result = sp_getapplock @Resource = ?, @LockMode = 'Exclusive',
+                                     @LockOwner = 'Session', @LockTimeout = ?;
+        SET NOCOUNT OFF;
+        SELECT @result;
+    """, (resource, timeout_ms))
+    if cursor.fetchone()[0] < 0:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        try:
+            cursor.execute("EXEC sp_releaseapplock @Resource = ?, @LockOwner = 'Session'", (resource,))
+        except pyodbc.Error:
+            if isinstance(conn, PooledConnection):
+                conn._broken = True
+
+
+def _conn_str(server, database, username, password):
+    return (
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+        f"SERVER={server};"
+        f"DATABASE={database};"
+        f"UID={username};"
+        f"PWD={password};"
+        "Encrypt=no;TrustServerCertificate=yes;"
+    )
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(name):
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            if name == 'central':
+                conn_str = _conn_str(Config.CENTRAL_DB_SERVER, Config.CENTRAL_DB_DATABASE,
+                                     Config.CENTRAL_DB_USERNAME, Config.CENTRAL_DB_PASSWORD)
+                max_size = Config.CENTRAL_DB_POOL_MAX_SIZE
+            else:
+                conn_str = _conn_str(Config.DB_SERVER, Config.DB_DATABASE,
+                                     Config.DB_USERNAME, Config.DB_PASSWORD)
+                max_size = Config.DB_POOL_MAX_SIZE
+            pool = ConnectionPool(
+                name, conn_str, max_size,
+                idle_timeout=Config.DB_POOL_IDLE_TIMEOUT_SECONDS,
+                checkout_timeout=Config.DB_POOL_CHECKOUT_TIMEOUT_SECONDS,
+            )
+            _pools[name] = pool
+        return pool
+
+
+def get_local_connection():
+    """Pooled connection to the local DBBAK database."""
+    return _get_pool('local').connection()
+
+
+def get_central_connection():
+    """Pooled connection to the central EPSMirror database (read-only use)."""
+    return _get_pool('central').connection()
+
+
+def get_pool_snapshots():
+    """Size, utilization and wait metrics of every pool in this worker process."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {name: pool.snapshot() for name, pool in pools.items()}
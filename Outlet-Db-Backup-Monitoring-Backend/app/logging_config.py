@@ -73,3 +73,7 @@ def get_ib_storage_logger():
 
 def get_scheduler_logger():
     return _setup_logger('scheduler', 'Scheduler_log')
+
+
+def get_combined_logger():
+    return _setup_logger('combined', 'Combined_Scan_log')
@@ -1,9 +1,17 @@
-from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from flask import Blueprint, jsonify, request, Response, stream_with_context
 from app.services.backup_service import BackupMonitor
-from app.services.outlet_sync_service import OutletSyncService
+from app.services.rollup_service import GRANULARITIES
+from app.services.scan_engine import ScanEngine
+from app.services.scan_jobs import scan_events, start_scan_job, wait_for_scan
+from app.services.scan_registry import claim_scan, finish_from
+from app.services.stats_changes import decode_change_token
+from app.services.stats_export import EXPORT_FORMATS, finish_export, stream_export, try_start_export
+from app.services.stats_page import parse_filter_args, parse_page_args
+from app.services.stats_snapshot import stamp_body
+from app.config import Config
 from app.middleware.auth import token_required, role_required
 from datetime import datetime, date, timezone
+import itertools
 import json
 import time
 
@@ -52,22 +60,18 @@ def backup_status():
             }), 500
 
     try:
-        outlets = monitor.get_unscanned_outlets()
-        if not outlets:
-            # If no unscanned outlets, return current stats
-            categorized = monitor.get_all_backup_stats()
-            return jsonify(_build_response(categorized, start_time))
-
-        with ThreadPoolExecutor(max_workers=monitor.config.MAX_WORKERS) as executor:
-            results = list(executor.map(monitor.check_server, outlets))
+        # The scan runs as a detached job (shared with any scan of this type
+        # already running); wait for it up to SCAN_JOB_WAIT_SECONDS, below
+        # the gunicorn request timeout, then return what is saved so far
+        scan_id, _ = start_scan_job(monitor.scan_type)
+        scan = wait_for_scan(scan_id, Config.SCAN_JOB_WAIT_SECONDS)
 
-        # Persist results to database
-        monitor.save_backup_status(results)
-
-        # Fetch latest data from the table to show in frontend
         categorized = monitor.get_all_backup_stats()
-
-        return jsonify(_build_response(categorized, start_time))
+        response = _build_response(categorized, start_time)
+        if scan is None or scan['status'] == 'Running':
+            response['scanInProgress'] = True
+            response['scanId'] = scan_id
+        return jsonify(response)
 
     except Exception as e:
         monitor.log_error(f"API Endpoint Error: {str(e)}", severity="CRITICAL")
@@ -96,81 +100,14 @@ def scan_with_progress():
                 'timestamp': datetime.now(timezone.utc).isoformat()
             }), 400
 
-    monitor.scan_date = scan_date
-
     def generate():
+        # The scan is a detached job: this stream only subscribes to it (or to
+        # the scan of this type and date already running), so closing it
+        # leaves the scan running; DELETE /scans/<id> cancels it
         try:
-            # Sync outlets from central server before scanning
-            sync_service = OutletSyncService()
-            sync_result = sync_service.sync_outlets()
-            if sync_result and (sync_result['inserted'] or sync_result['updated'] or sync_result['deactivated']):
-                yield f"data: {json.dumps({'type': 'sync', 'inserted': sync_result['inserted'], 'updated': sync_result['updated'], 'deactivated': sync_result['deactivated']})}\n\n"
-
-            outlets = monitor.get_unscanned_outlets()
-            if not outlets:
-                yield f"data: {json.dumps({'type': 'info', 'message': 'All outlets already scanned for today'})}\n\n"
-                yield f"data: {json.dumps({'type': 'complete', 'total': 0, 'success': 0, 'failed': 0})}\n\n"
-                return
-
-            total = len(outlets)
-            results = []
-            success = 0
-            failed = 0
-
-            yield f"data: {json.dumps({'type': 'start', 'total': total})}\n\n"
-
-            executor = ThreadPoolExecutor(max_workers=monitor.config.MAX_WORKERS)
-            try:
-                futures = {executor.submit(monitor.check_server, o): o for o in outlets}
-                pending = set(futures)
-                task_timeout = monitor.config.TIMEOUT * 2
-
-                while pending:
-                    done, pending = wait(pending, timeout=task_timeout, return_when=FIRST_COMPLETED)
-                    if not done:
-                        monitor.log_error(
-                            f"[Backup] Scan stalled: no worker completed in {task_timeout} seconds; marking {len(pending)} pending tasks as timed out.",
-                            severity="ERROR"
-                        )
-                        for future in list(pending):
-                            outlet = futures[future]
-                            results.append({
-                                'outletCode': outlet[0],
-                                'server': outlet[1],
-                                'lastModified': None,
-                                'status': 'Error',
-                                'errorDetails': f"Scan task timed out after {task_timeout} seconds",
-                                'backupsize': None
-                            })
-                        break
-
-                    for future in done:
-                        outlet = futures[future]
-                        try:
-                            result = future.result()
-                        except Exception as e:
-                            monitor.log_error(f"[Backup] Scan task failed for outlet {outlet[0]} ({outlet[1]}): {str(e)}", severity="ERROR")
-                            result = {
-                                'outletCode': outlet[0],
-                                'server': outlet[1],
-                                'lastModified': None,
-                                'status': 'Error',
-                                'errorDetails': f"Scan task failure: {str(e)}",
-                                'backupsize': None
-                            }
-                        results.append(result)
-                        if result['status'] == 'Successful':
-                            success += 1
-                        else:
-                            failed += 1
-                        yield f"data: {json.dumps({'type': 'progress', 'completed': len(results), 'total': total, 'success': success, 'failed': failed, 'current': result['outletCode']})}\n\n"
-            finally:
-                executor.shutdown(wait=False)
-
-            if results:
-                monitor.save_backup_status(results)
-
-            yield f"data: {json.dumps({'type': 'complete', 'total': total, 'success': success, 'failed': failed})}\n\n"
+            scan_id, started = start_scan_job(monitor.scan_type, scan_date)
+            for event in scan_events(scan_id, attached=not started):
+                yield f"data: {json.dumps(event)}\n\n" if event else ": heartbeat\n\n"
         except Exception as e:
             monitor.log_error(f"SSE scan error: {str(e)}", severity="CRITICAL")
             yield f"data: {json.dumps({'type': 'error', 'message': 'Internal Server Error'})}\n\n"
@@ -185,7 +122,16 @@ def scan_with_progress():
 @token_required
 @role_required('A', 'S')
 def backup_stats():
-    """Read-only endpoint: returns saved records from D_Drive_Backup_Stat without scanning."""
+    """Read-only endpoint: returns saved records from D_Drive_Backup_Stat without scanning.
+
+    Without paging params every row of the latest scan date (or of the
+    outlet/date filter) is returned. With any of limit, cursor, sort
+    (outlet, status, lastModified, size; '-' prefix = descending), status
+    (successful/failed) or search (outlet code substring) one keyset page is
+    returned with 'nextCursor'; the total is served by /backup-stats/count.
+    The plain latest-scan read is served from the Stats_Version snapshot
+    with an ETag (304 on a matching If-None-Match).
+    """
     monitor = BackupMonitor()
     start_time = time.time()
 
@@ -194,12 +140,44 @@ def backup_stats():
     date_to = request.args.get('date_to')
 
     try:
+        page = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({
+            'status': 'Error',
+            'message': str(e),
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 400
+
+    try:
+        if page is None and not (outlet or date_from or date_to):
+            # Dashboard poll: the cached payload of the current Stats_Version,
+            # or 304 when the client already has it
+            snapshot = monitor.get_stats_snapshot(
+                lambda: _build_response(monitor.get_all_backup_stats(raise_errors=True), start_time)
+            )
+            if snapshot:
+                etag, body = snapshot
+                # processingTime/timestamp are per response, outside the
+                # cached body, hence a weak ETag
+                body = stamp_body(body, {
+                    'processingTime': round(time.time() - start_time, 2),
+                    'timestamp': datetime.now(timezone.utc).isoformat()
+                })
+                response = Response(body, content_type='application/json')
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response.make_conditional(request)
+
         if outlet or date_from or date_to:
-            categorized = monitor.get_filtered_backup_stats(outlet, date_from, date_to)
+            categorized = monitor.get_filtered_backup_stats(outlet, date_from, date_to, page=page)
         else:
-            categorized = monitor.get_all_backup_stats()
+            categorized = monitor.get_all_backup_stats(page=page)
 
-        return jsonify(_build_response(categorized, start_time))
+        response = _build_response(categorized, start_time)
+        if page is not None:
+            response['limit'] = page['limit']
+            response['nextCursor'] = categorized.get('nextCursor')
+        return jsonify(response)
     except Exception as e:
         monitor.log_error(f"Backup stats read error: {str(e)}", severity="CRITICAL")
         return jsonify({
@@ -209,6 +187,162 @@ def backup_stats():
         }), 500
 
 
+@bp.route('/backup-stats/count', methods=['GET'])
+@token_required
+@role_required('A', 'S')
+def backup_stats_count():
+    """Total rows behind the /backup-stats pages (same outlet/date/status/search filters).
+
+    Kept out of the page response so it is computed once per filter, not per
+    page; the client may cache it for STATS_COUNT_MAX_AGE_SECONDS.
+    """
+    monitor = BackupMonitor()
+
+    try:
+        filters = parse_filter_args(request.args)
+    except ValueError as e:
+        return jsonify({
+            'status': 'Error',
+            'message': str(e),
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 400
+
+    total = monitor.count_backup_stats(
+        filters, request.args.get('outlet'), request.args.get('date_from'), request.args.get('date_to')
+    )
+    if total is None:
+        monitor.log_error("Stats count failed", severity="CRITICAL")
+        return jsonify({
+            'status': 'Error',
+            'message': 'Internal Server Error',
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 500
+
+    response = jsonify({
+        'status': 'success',
+        'total': total,
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    })
+    response.headers['Cache-Control'] = f'private, max-age={Config.STATS_COUNT_MAX_AGE_SECONDS}'
+    return response
+
+
+@bp.route('/backup-stats/changes', methods=['GET'])
+@token_required
+@role_required('A', 'S')
+def backup_stats_changes():
+    """Latest-scan rows changed since a token, for cheap steady-state polling.
+
+    Query param: since (the 'token' of the previous response). Without it, or
+    once the latest scan date has moved on, every row of the latest scan date
+    is returned with reset=true; otherwise only outlets whose row was inserted
+    or updated after the token. Always returns the token for the next call.
+    """
+    monitor = BackupMonitor()
+    start_time = time.time()
+
+    since = request.args.get('since')
+    try:
+        since = decode_change_token(since) if since else None
+    except ValueError as e:
+        return jsonify({
+            'status': 'Error',
+            'message': str(e),
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 400
+
+    changes = monitor.get_backup_stat_changes(since)
+    if changes is None:
+        monitor.log_error("Stats changes read failed", severity="CRITICAL")
+        return jsonify({
+            'status': 'Error',
+            'message': 'Internal Server Error',
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 500
+
+    response = _build_response(changes, start_time)
+    response['scanDate'] = changes['scanDate']
+    response['token'] = changes['token']
+    response['reset'] = changes['reset']
+    return jsonify(response)
+
+
+@bp.route('/backup-stats/export', methods=['GET'])
+@token_required
+@role_required('A', 'S')
+def backup_stats_export():
+    """Stream saved records as NDJSON or CSV for long-range exports.
+
+    Query params: format ('ndjson' or 'csv', default 'ndjson') plus the
+    outlet/date_from/date_to/status/search filters of /backup-stats (latest scan
+    date when no outlet or date is given). Rows go from the cursor to the
+    client chunk by chunk, so the export size does not grow worker memory.
+    """
+    monitor = BackupMonitor()
+
+    fmt = request.args.get('format', 'ndjson')
+    outlet = request.args.get('outlet')
+    try:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f'format must be one of {sorted(EXPORT_FORMATS)}')
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        date_from = date.fromisoformat(date_from) if date_from else None
+        date_to = date.fromisoformat(date_to) if date_to else None
+        filters = parse_filter_args(request.args)
+    except ValueError as e:
+        return jsonify({
+            'status': 'Error',
+            'message': str(e),
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 400
+
+    if not try_start_export():
+        return jsonify({
+            'status': 'Error',
+            'message': 'Too many exports in progress, retry later',
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 503
+
+    # Read the first chunk up front so a database error is still a 500
+    chunks = monitor.iter_backup_stats(filters, outlet, date_from, date_to)
+    try:
+        first = next(chunks, None)
+    except Exception as e:
+        finish_export()
+        monitor.log_error(f"Stats export error: {str(e)}", severity="CRITICAL")
+        return jsonify({
+            'status': 'Error',
+            'message': 'Internal Server Error',
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 500
+
+    def generate():
+        try:
+            rest = itertools.chain([first], chunks) if first else chunks
+            yield from stream_export(rest, fmt, monitor.EXPORT_FIELDS)
+        except Exception as e:
+            # Headers are already sent; aborting the stream marks the export incomplete
+            monitor.log_error(f"Stats export stream error: {str(e)}", severity="CRITICAL")
+            raise
+        finally:
+            chunks.close()
+
+    period = '_'.join(d.isoformat() for d in (date_from, date_to) if d) or 'latest'
+    response = Response(stream_with_context(generate()), content_type=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{monitor.scan_type}_backup_stats_{period}.{fmt}"'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+
+    def on_close():
+        # Also runs when the client goes away before the stream started
+        chunks.close()
+        finish_export()
+
+    response.call_on_close(on_close)
+    return response
+
+
 @bp.route('/backup-status/sync', methods=['POST'])
 @token_required
 @role_required('A')
@@ -245,21 +379,38 @@ def sync_outlets():
                 'timestamp': datetime.now(timezone.utc).isoformat()
             }), 404
 
-        # Scan only the selected servers in parallel
-        with ThreadPoolExecutor(max_workers=monitor.config.MAX_WORKERS) as executor:
-            results = list(executor.map(monitor.check_server, outlets))
+        # The re-scan takes the scan registry slot for today like any other
+        # scan, so it never overlaps a scheduled or manual scan
+        registration = claim_scan(monitor.scan_type, date.today(), 'sync', monitor.logger)
+        if registration and not registration.owned:
+            return jsonify({
+                'status': 'Error',
+                'message': 'A scan is already running; try again when it has finished',
+                'scanId': registration.scan_id,
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            }), 409
 
-        # Persist results to database (updates only these outlets for today)
-        monitor.save_backup_status(results)
+        # Scan only the selected servers in parallel and persist results
+        # (updates only these outlets for today)
+        if registration:
+            registration.start(len(outlets))
+        try:
+            batcher = ScanEngine(monitor).run_and_save(outlets, registration)
+        except Exception as e:
+            if registration:
+                finish_from(registration, None, str(e))
+            raise
+        if registration:
+            finish_from(registration, batcher)
 
         # Count actual successes vs failures from scan results
-        success_count = sum(1 for r in results if r['status'] == 'Successful')
-        failed_count = len(results) - success_count
+        success_count = batcher.success
+        failed_count = batcher.failed
 
         # Return the full latest view (so frontend can refresh the dashboard)
         categorized = monitor.get_all_backup_stats()
         response = _build_response(categorized, start_time)
-        response['syncedCount'] = len(results)
+        response['syncedCount'] = batcher.completed
         response['syncSuccessCount'] = success_count
         response['syncFailedCount'] = failed_count
 
@@ -274,6 +425,57 @@ def sync_outlets():
         }), 500
 
 
+@bp.route('/backup-stats/rollups', methods=['GET'])
+@token_required
+@role_required('A', 'S')
+def rollups():
+    """Per-outlet D Drive backup rollups for long-range reports.
+
+    Query params: granularity ('week' or 'month', default 'week'),
+    date_from / date_to (YYYY-MM-DD, on period start), outlet.
+    """
+    monitor = BackupMonitor()
+    start_time = time.time()
+
+    granularity = request.args.get('granularity', 'week')
+    if granularity not in GRANULARITIES:
+        return jsonify({
+            'status': 'Error',
+            'message': f'granularity must be one of {sorted(GRANULARITIES)}',
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 400
+
+    try:
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        date_from = date.fromisoformat(date_from) if date_from else None
+        date_to = date.fromisoformat(date_to) if date_to else None
+    except ValueError:
+        return jsonify({
+            'status': 'Error',
+            'message': 'date_from and date_to must be YYYY-MM-DD',
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 400
+
+    try:
+        rows = monitor.get_rollups(granularity, date_from, date_to, request.args.get('outlet'))
+        return jsonify({
+            'status': 'success',
+            'granularity': granularity,
+            'data': rows,
+            'count': len(rows),
+            'processingTime': round(time.time() - start_time, 2),
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        })
+    except Exception as e:
+        monitor.log_error(f"Rollup report error: {str(e)}", severity="CRITICAL")
+        return jsonify({
+            'status': 'Error',
+            'message': 'Internal Server Error',
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 500
+
+
 @bp.route('/backup-stats/daily-summary', methods=['GET'])
 @token_required
 @role_required('A', 'S')
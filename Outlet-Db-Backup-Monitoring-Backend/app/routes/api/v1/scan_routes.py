@@ -0,0 +1,111 @@
+from flask import Blueprint, jsonify, request
+from app.logging_config import get_scheduler_logger
+from app.services.scan_jobs import SCAN_TYPES, cancel_scan_job, get_scan_status, start_scan_job
+from app.middleware.auth import token_required, role_required
+from datetime import datetime, date, timezone
+import uuid
+
+bp = Blueprint('scans', __name__)
+logger = get_scheduler_logger()
+
+
+def _error(message, code):
+    return jsonify({
+        'status': 'Error',
+        'message': message,
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    }), code
+
+
+def _valid_scan_id(scan_id):
+    try:
+        uuid.UUID(scan_id)
+        return True
+    except ValueError:
+        return False
+
+
+@bp.route('/scans', methods=['POST'])
+@token_required
+@role_required('A', 'S')
+def start_scan():
+    """Start a scan as a background job and return its id right away.
+
+    Request body:
+        { "scanType": "D_Drive" | "IB_Storage" | "Combined", "scanDate": "YYYY-MM-DD" (optional) }
+
+    When a scan of that type and date is already running (in any worker) its
+    id is returned with started=false instead of starting another one.
+    """
+    body = request.get_json(silent=True) or {}
+    scan_type = body.get('scanType')
+    if scan_type not in SCAN_TYPES:
+        return _error(f'scanType must be one of {list(SCAN_TYPES)}', 400)
+
+    scan_date = None
+    if body.get('scanDate'):
+        try:
+            scan_date = date.fromisoformat(body['scanDate'])
+        except (TypeError, ValueError):
+            return _error(f"Invalid scanDate format: {body['scanDate']}. Expected YYYY-MM-DD.", 400)
+
+    try:
+        scan_id, started = start_scan_job(scan_type, scan_date)
+        return jsonify({
+            'status': 'success',
+            'scanId': scan_id,
+            'started': started,
+            'scan': get_scan_status(scan_id),
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 202
+    except Exception as e:
+        logger.error(f"[Scans] Start {scan_type} scan error: {e}")
+        return _error('Internal Server Error', 500)
+
+
+@bp.route('/scans/<scan_id>', methods=['GET'])
+@token_required
+@role_required('A', 'S')
+def scan_status(scan_id):
+    """Progress, result counts and per-stage timing of a scan."""
+    if not _valid_scan_id(scan_id):
+        return _error('Scan not found', 404)
+    try:
+        scan = get_scan_status(scan_id)
+    except Exception as e:
+        logger.error(f"[Scans] Status read error for {scan_id}: {e}")
+        return _error('Internal Server Error', 500)
+    if scan is None:
+        return _error('Scan not found', 404)
+    return jsonify({
+        'status': 'success',
+        'scan': scan,
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    })
+
+
+@bp.route('/scans/<scan_id>', methods=['DELETE'])
+@token_required
+@role_required('A', 'S')
+def cancel_scan(scan_id):
+    """Cancel a running scan: no further outlets start, results in flight are saved."""
+    if not _valid_scan_id(scan_id):
+        return _error('Scan not found', 404)
+    try:
+        scan = cancel_scan_job(scan_id)
+    except Exception as e:
+        logger.error(f"[Scans] Cancel error for {scan_id}: {e}")
+        return _error('Internal Server Error', 500)
+    if scan is None:
+        return _error('Scan not found', 404)
+    if scan['status'] != 'Running':
+        return _error(f"Scan already {scan['status'].lower()}", 409)
+    if not scan['cancelRequested']:
+        return _error('Scan runs in another worker and cannot be cancelled before '
+                      'migration_add_scan_jobs.sql has run', 409)
+    return jsonify({
+        'status': 'success',
+        'message': 'Cancellation requested',
+        'scan': scan,
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    }), 202
@@ -0,0 +1,53 @@
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+from app.config import Config
+from app.services.stats_stream import decode_position, get_event_hub
+from app.middleware.auth import token_required, role_required
+from datetime import datetime, timezone
+import queue
+
+bp = Blueprint('stream', __name__)
+
+
+@bp.route('/stats/stream', methods=['GET'])
+@token_required
+@role_required('A', 'S')
+def stats_stream():
+    """SSE endpoint: pushes stats deltas and scheduler state instead of 30s polling.
+
+    Events (data is JSON with a 'type'):
+    - stats: rows of one scanType changed since the last event, or the whole
+      latest scan date when reset is true
+    - scheduler: Scheduler_Status entries and next run times, on every change
+    A ': heartbeat' comment is sent every STATS_STREAM_HEARTBEAT_SECONDS.
+    Each event id is a resume position: reconnecting with Last-Event-ID (or
+    ?last_event_id=) replays only what changed since, not the full tables.
+    Needs the Authorization header, so browsers read it with fetch() rather
+    than EventSource.
+    """
+    hub = get_event_hub()
+    subscriber = hub.subscribe()
+    if subscriber is None:
+        return jsonify({
+            'status': 'Error',
+            'message': 'Too many open stats streams, retry later',
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 503
+
+    position = decode_position(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+
+    def generate():
+        try:
+            yield "retry: 5000\n\n"
+            yield from hub.catch_up(position)
+            while not (subscriber.dropped and subscriber.queue.empty()):
+                try:
+                    yield subscriber.queue.get(timeout=Config.STATS_STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+        finally:
+            hub.unsubscribe(subscriber)
+
+    response = Response(stream_with_context(generate()), content_type='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,12 +1,40 @@
 import os
 import time
+import threading
 import pyodbc
 import traceback
-from smbprotocol.exceptions import SMBConnectionClosed, SMBException
-from datetime import datetime, date, timezone
-from smbclient import register_session, delete_session, listdir, scandir
+from smbprotocol.exceptions import SMBConnectionClosed, SMBException, SMBOSError
+from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor
+from smbclient.path import isdir as smb_isdir
 from app.config import Config
+from app.db_pool import get_local_connection
 from app.logging_config import get_ib_storage_logger
+from app.services.backup_search import find_latest_backup, format_backup_size
+from app.services.backup_stat_writer import merge_backup_stats
+from app.services.daily_summary_service import read_daily_summary
+from app.services.rollup_service import read_rollups, refresh_rollups
+from app.services.host_profile_service import HostProfileStore
+from app.services.smb_session_pool import get_session_pool
+from app.services.stats_changes import read_stat_changes
+from app.services.stats_page import build_count_query, build_export_query, build_page_query, encode_cursor
+from app.services.stats_snapshot import get_snapshot_cache, read_stats_version
+
+
+_drive_probe_executor = None
+_drive_probe_lock = threading.Lock()
+
+
+def _get_drive_probe_executor():
+    """Shared pool for concurrent IBSTORAGE drive probes (threads start lazily)."""
+    global _drive_probe_executor
+    with _drive_probe_lock:
+        if _drive_probe_executor is None:
+            _drive_probe_executor = ThreadPoolExecutor(
+                max_workers=max(1, Config.IB_DRIVE_PROBE_MAX_WORKERS),
+                thread_name_prefix='ib-drive-probe'
+            )
+        return _drive_probe_executor
 
 
 class IBStorageMonitor:
@@ -16,10 +44,24 @@ class IBStorageMonitor:
     so we try each candidate drive letter until we find one with a BackupFull folder.
     """
 
+    scan_type = 'IB_Storage'  # matches Scheduler_Status.ScanType
+
+    # Columns read by the stats endpoints, in _parse_row order
+    STATS_COLUMNS = (
+        "b.OutletServer, o.IPAddress, b.Status, b.LastBackupTakenUtc, "
+        "b.BackupFile, b.BackupFileSize, b.ScanDate, b.ErrorDetails, b.DriveLetter, b.BackupFileSizeBytes, "
+        "CASE WHEN YEAR(b.LastBackupTakenUtc) > YEAR(GETDATE()) THEN 1 ELSE 0 END"
+    )
+
+    # Export record keys (_parse_row + advancedDate), also the CSV column order
+    EXPORT_FIELDS = ('outletCode', 'server', 'status', 'lastModified', 'file', 'backupsize',
+                     'backupSizeBytes', 'scanDate', 'errorDetails', 'driveLetter', 'advancedDate')
+
     def __init__(self):
         self.config = Config()
         self.logger = get_ib_storage_logger()
         self.scan_date = None  # None = today; date object = back-date scan
+        self.host_profiles = HostProfileStore()
 
     def log_error(self, message, severity="ERROR"):
         if severity == "CRITICAL":
@@ -28,16 +70,8 @@ class IBStorageMonitor:
             self.logger.error(message)
 
     def get_db_connection(self):
-        conn_str = (
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER={self.config.DB_SERVER};"
-            f"DATABASE={self.config.DB_DATABASE};"
-            f"UID={self.config.DB_USERNAME};"
-            f"PWD={self.config.DB_PASSWORD};"
-            "Encrypt=no;TrustServerCertificate=yes;"
-        )
         try:
-            return pyodbc.connect(conn_str)
+            return get_local_connection()
         except pyodbc.Error as e:
             self.logger.error(f"Database connection error: {e}")
             return None
@@ -62,146 +96,193 @@ class IBStorageMonitor:
         return False
 
     def find_ibstorage_path(self, server_name):
-        """Try each candidate drive letter to find the IBSTORAGE BackupFull folder.
+        """Probe every candidate drive letter at once to find the IBSTORAGE BackupFull folder.
+
+        smbprotocol has no srvsvc (NetShareEnum) client, so the share list
+        cannot be read in one call; instead all candidates are checked
+        concurrently and the first drive in IB_STORAGE_DRIVES order that has
+        the folder wins. A missing drive now costs one round trip, not five.
 
         Returns (smb_path, drive_letter) if found, or (None, None) if not found.
         """
         folder = self.config.IB_STORAGE_FOLDER
-        for drive in self.config.IB_STORAGE_DRIVES:
-            drive = drive.strip()
-            smb_path = f"\\\\{server_name}\\{drive}\\{folder}"
-            try:
-                listdir(smb_path)
-                self.logger.info(f"[IB] Found IBSTORAGE at {smb_path}")
-                return smb_path, drive
-            except Exception:
-                continue
+        drives = [drive.strip() for drive in self.config.IB_STORAGE_DRIVES if drive.strip()]
+        paths = [f"\\\\{server_name}\\{drive}\\{folder}" for drive in drives]
+
+        executor = _get_drive_probe_executor()
+        probes = [executor.submit(self._drive_has_folder, smb_path) for smb_path in paths]
+        try:
+            for drive, smb_path, probe in zip(drives, paths, probes):
+                if probe.result():
+                    self.logger.info(f"[IB] Found IBSTORAGE at {smb_path}")
+                    return smb_path, drive
+        finally:
+            for probe in probes:
+                probe.cancel()
         return None, None
 
-    def check_server(self, outlet):
-        """Check IBSTORAGE backup status for a single outlet server."""
+    @staticmethod
+    def _drive_has_folder(smb_path):
+        """True when smb_path is a folder; a missing or inaccessible drive is False.
+
+        Anything else (auth failure, dropped connection) is raised so
+        exception_result reports it and drops a broken pooled session.
+        """
+        try:
+            return smb_isdir(smb_path)
+        except SMBOSError:
+            return False
+
+    def new_result(self, outlet):
+        """Build the default (failed) result dict for an outlet."""
         outlet_code, server_ip = outlet
-        result = {
+        return {
             'outletCode': outlet_code,
             'server': server_ip,
             'lastModified': None,
             'status': 'Error',
             'errorDetails': None,
             'backupsize': None,
+            'backupSizeBytes': None,
             'driveLetter': None
         }
 
+    def error_result(self, outlet, details):
+        """Build a failed result carrying the given error details."""
+        result = self.new_result(outlet)
+        result['errorDetails'] = details
+        return result
+
+    def exception_result(self, outlet, error):
+        """Build a failed result from an exception raised while talking SMB."""
+        server_ip = outlet[1]
+        if isinstance(error, SMBConnectionClosed):
+            get_session_pool().invalidate(server_ip)
+        if isinstance(error, (SMBConnectionClosed, SMBException)):
+            self.logger.error(f"[IB] SMB Protocol Error for {server_ip}: {str(error)}")
+            return self.error_result(outlet, f"SMB Protocol Error: {str(error)}")
+        self.logger.error(f"[IB] Unexpected Error for {server_ip}: {str(error)}")
+        return self.error_result(outlet, f"Error: {str(error)}")
+
+    def check_server(self, outlet):
+        """Check IBSTORAGE backup status for a single outlet server."""
+        outlet_code, server_ip = outlet
+
         self.logger.info(f"[IB] Checking server: {server_ip} (Outlet: {outlet_code})")
         if not self.ping_with_retry(server_ip):
             self.logger.error(f"[IB] Ping failed for {server_ip}")
-            result['errorDetails'] = 'Server not Reachable'
-            return result
+            return self.error_result(outlet, 'Server not Reachable')
+
+        return self.check_share(outlet)
+
+    def check_share(self, outlet):
+        """Inspect the IBSTORAGE drive of a server that is known to be reachable."""
+        server_ip = outlet[1]
 
         try:
-            register_session(
+            with get_session_pool().session(
                 server_ip,
                 username=self.config.SHARE_USERNAME,
                 password=self.config.SHARE_PASSWORD
-            )
+            ):
+                return self.inspect_share(outlet)
+        except Exception as e:
+            return self.exception_result(outlet, e)
 
-            # Try candidate drive letters to find IBSTORAGE
-            smb_path, drive_letter = self.find_ibstorage_path(server_ip)
-            if not smb_path:
-                self.logger.warning(f"[IB] IBSTORAGE drive not found on {server_ip}")
-                result['errorDetails'] = 'IBSTORAGE drive not found (checked e$-i$)'
-                return result
+    def inspect_share(self, outlet):
+        """Locate IBSTORAGE and check its backups over an already registered SMB session.
 
-            result['driveLetter'] = drive_letter
+        The drive recorded in the outlet's host profile is tried first; every
+        candidate drive is probed only when there is no profile or the cached
+        path no longer works.
+        """
+        result = self.new_result(outlet)
+        outlet_code, server_ip = outlet
+
+        try:
+            found = self._search_cached_path(outlet)
+            if found is None:
+                # Try candidate drive letters to find IBSTORAGE
+                smb_path, drive_letter = self.find_ibstorage_path(server_ip)
+                if not smb_path:
+                    self.logger.warning(f"[IB] IBSTORAGE drive not found on {server_ip}")
+                    result['errorDetails'] = 'IBSTORAGE drive not found (checked e$-i$)'
+                    return result
+                result['driveLetter'] = drive_letter
+                backup = self.get_validated_backup(smb_path, cutoff_date=self.scan_date)
+                self.host_profiles.record(
+                    outlet_code, drive_letter, self.config.IB_STORAGE_FOLDER,
+                    get_session_pool().dialect(server_ip)
+                )
+            else:
+                smb_path, drive_letter, backup = found
+                result['driveLetter'] = drive_letter
 
             # Get latest backup with validation
-            latest_file, mod_time, backup_size = self.get_validated_backup(smb_path, cutoff_date=self.scan_date)
+            latest_file, mod_time, backup_size = backup
             if latest_file:
-                self.logger.info(f"[IB] Found valid backup: {latest_file} ({backup_size} GB)")
+                result['backupsize'] = format_backup_size(backup_size)
+                self.logger.info(f"[IB] Found valid backup: {latest_file} ({result['backupsize']})")
                 result['lastModified'] = mod_time.isoformat()
                 result['status'] = 'Successful'
                 result['file'] = os.path.basename(latest_file)
-                result['backupsize'] = f"{backup_size} GB"
+                result['backupSizeBytes'] = backup_size
             else:
                 self.logger.warning(f"[IB] No valid backup files found in {smb_path}")
                 result['errorDetails'] = 'No Valid Backup Files Found'
 
-        except (SMBConnectionClosed, SMBException) as smb_e:
-            self.logger.error(f"[IB] SMB Protocol Error for {server_ip}: {str(smb_e)}")
-            result['errorDetails'] = f"SMB Protocol Error: {str(smb_e)}"
         except Exception as e:
-            self.logger.error(f"[IB] Unexpected Error for {server_ip}: {str(e)}")
-            result['errorDetails'] = f"Error: {str(e)}"
-        finally:
-            try:
-                delete_session(server_ip)
-            except Exception:
-                pass
+            error_result = self.exception_result(outlet, e)
+            error_result['driveLetter'] = result['driveLetter']
+            return error_result
 
         return result
 
+    def _search_cached_path(self, outlet):
+        """Search the IBSTORAGE path from the outlet's host profile.
+
+        Returns (smb_path, drive_letter, backup) or None when there is no
+        usable profile or the cached path failed (the profile is then dropped).
+        """
+        outlet_code, server_ip = outlet
+        profile = self.host_profiles.get(outlet_code)
+        if not profile or not profile['drive'] or profile['path'] != self.config.IB_STORAGE_FOLDER:
+            return None
+
+        drive = profile['drive']
+        smb_path = f"\\\\{server_ip}\\{drive}\\{profile['path']}"
+        try:
+            backup = self.get_validated_backup(smb_path, cutoff_date=self.scan_date)
+        except SMBOSError as e:
+            self.logger.info(f"[IB] Cached IBSTORAGE path {smb_path} failed ({str(e)}), probing drives")
+            self.host_profiles.invalidate(outlet_code)
+            return None
+        self.logger.info(f"[IB] Using cached IBSTORAGE path {smb_path}")
+        return smb_path, drive, backup
+
     def get_validated_backup(self, smb_path, cutoff_date=None):
-        """Find the latest valid .bak file and its size.
+        """Find the latest valid backup file and its size in bytes.
 
-        Uses scandir() with follow_symlinks=False so file metadata is read
-        from the cached directory listing rather than opening each file.
-        This avoids STATUS_INVALID_PARAMETER errors on USB/IBSTORAGE drives.
+        The SMB server filters the folder by BACKUP_FILE_PATTERNS and the
+        listing is streamed once, keeping only the newest file. Size and
+        modification time come from the directory listing (entry.smb_info)
+        rather than opening each file, which also avoids
+        STATUS_INVALID_PARAMETER errors on USB/IBSTORAGE drives.
 
         When cutoff_date (a date object) is provided, only files modified on or
         before that date are considered. This enables back-date scanning.
         """
         try:
-            latest_file = None
-            latest_time = None
-            latest_size = 0
-            min_size = 1024
-
-            # For back-date scans, compute end-of-day cutoff in UTC
-            cutoff_dt = None
-            if cutoff_date:
-                cutoff_dt = datetime.combine(cutoff_date, datetime.max.time()).replace(tzinfo=timezone.utc)
-
-            for entry in scandir(smb_path):
-                if not entry.name.lower().endswith('.bak'):
-                    continue
-
-                try:
-                    # follow_symlinks=False uses cached dir listing metadata
-                    # instead of opening each file individually
-                    file_info = entry.stat(follow_symlinks=False)
-                    file_size = file_info.st_size
-                    mod_time = datetime.fromtimestamp(file_info.st_mtime, tz=timezone.utc)
-                except Exception:
-                    # Fallback: use smb_info (SMBDirEntryInformation named tuple)
-                    # from the directory listing when stat() fails with
-                    # STATUS_INVALID_PARAMETER on USB/IBSTORAGE drives
-                    try:
-                        info = entry.smb_info
-                        file_size = info.end_of_file
-                        mod_time = info.last_write_time
-                        if mod_time.tzinfo is None:
-                            mod_time = mod_time.replace(tzinfo=timezone.utc)
-                    except Exception as e2:
-                        self.logger.warning(f"[IB] Cannot get info for {entry.name}: {e2}")
-                        continue
-
-                if file_size < min_size:
-                    continue
-
-                # Skip files newer than the cutoff for back-date scans
-                if cutoff_dt and mod_time > cutoff_dt:
-                    continue
-
-                if not latest_time or mod_time > latest_time:
-                    latest_file = entry.name
-                    latest_time = mod_time
-                    latest_size = file_size
-
+            latest_file, latest_time, latest_size = find_latest_backup(
+                smb_path, self.config.BACKUP_FILE_PATTERNS, cutoff_date=cutoff_date
+            )
             if latest_file:
-                file_size_gb = round(latest_size / (1024 * 1024 * 1024), 2)
-                return (latest_file, latest_time, file_size_gb)
+                return (latest_file, latest_time, latest_size)
             else:
                 return None, None, None
 
+        except SMBOSError:
+            raise  # Path missing or inaccessible; handled by the caller
         except (SMBConnectionClosed, SMBException) as smb_e:
             self.logger.error(f"[IB] SMB Protocol Error during backup search: {str(smb_e)}")
             raise
@@ -217,79 +298,51 @@ class IBStorageMonitor:
         """Save IBSTORAGE check results to IB_Storage_Backup_Stat.
 
         Skips UPDATE if key fields (Status, BackupFile, BackupFileSize, ErrorDetails,
-        DriveLetter) are unchanged from the existing record.
+        DriveLetter) are unchanged from the existing record. All results go to
+        SQL Server in one batch and one MERGE; returns the inserted/updated/
+        unchanged counts, or None if the batch could not be saved.
         """
         self.logger.info(f"[IB] Saving {len(results)} results")
-        today = self.scan_date if self.scan_date else date.today()
-
         try:
             conn = self.get_db_connection()
             if not conn:
-                return
+                return None
 
-            updated = inserted = skipped = 0
             with conn:
-                cursor = conn.cursor()
-                for res in results:
-                    outlet_code = res['outletCode']
-                    status = res['status']
-                    last_backup = res.get('lastModified')
-                    backup_file = res.get('file', 'N/A')
-                    storage_used = res.get('backupsize', 'N/A')
-                    error_details = res.get('errorDetails')
-                    drive_letter = res.get('driveLetter')
-
-                    # Convert ISO string to naive datetime for SQL Server compatibility
-                    last_backup_dt = None
-                    if last_backup:
-                        try:
-                            last_backup_dt = datetime.fromisoformat(last_backup).replace(tzinfo=None)
-                        except (ValueError, TypeError):
-                            self.logger.warning(f"[IB] Could not parse lastModified '{last_backup}' for {outlet_code}")
-
-                    try:
-                        # Fetch existing record for comparison
-                        cursor.execute(
-                            "SELECT Status, BackupFile, BackupFileSize, ErrorDetails, DriveLetter FROM [dbo].[IB_Storage_Backup_Stat] WHERE OutletServer = ? AND ScanDate = ?",
-                            (outlet_code, today)
-                        )
-                        existing = cursor.fetchone()
-
-                        if existing:
-                            # Skip update if key fields are unchanged
-                            if (existing[0] == status and
-                                    (existing[1] or '') == (backup_file or '') and
-                                    (existing[2] or '') == (storage_used or '') and
-                                    (existing[3] or '') == (error_details or '') and
-                                    (existing[4] or '') == (drive_letter or '')):
-                                skipped += 1
-                                continue
-
-                            cursor.execute("""
-                                UPDATE [dbo].[IB_Storage_Backup_Stat]
-                                SET Status = ?, LastBackupTaken = ?, BackupFile = ?, Duration = ?,
-                                    BackupFileSize = ?, ErrorDetails = ?, DriveLetter = ?
-                                WHERE OutletServer = ? AND ScanDate = ?
-                            """, (status, last_backup_dt, backup_file, None, storage_used,
-                                  error_details, drive_letter, outlet_code, today))
-                            updated += 1
-                        else:
-                            cursor.execute("""
-                                INSERT INTO [dbo].[IB_Storage_Backup_Stat]
-                                (OutletServer, Status, LastBackupTaken, BackupFile, Duration,
-                                 BackupFileSize, ScanDate, ErrorDetails, DriveLetter)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """, (outlet_code, status, last_backup_dt, backup_file, None,
-                                  storage_used, today, error_details, drive_letter))
-                            inserted += 1
-                    except Exception as sql_e:
-                        self.logger.error(f"[IB] SQL Error for outlet {outlet_code}: {str(sql_e)}")
-
+                counts = self.merge_backup_status(conn, results)
                 conn.commit()
-                self.logger.info(f"[IB] IB_Storage_Backup_Stat ScanDate={today}: {inserted} inserted, {updated} updated, {skipped} unchanged")
+            return counts
         except Exception as e:
             self.logger.error(f"[IB] Database Persistence Error: {str(e)}")
             self.logger.error(traceback.format_exc())
+            return None
+
+    def merge_backup_status(self, conn, results):
+        """MERGE results into IB_Storage_Backup_Stat on conn; the caller commits. Returns the counts."""
+        today = self.scan_date if self.scan_date else date.today()
+
+        rows = [
+            {
+                'OutletServer': res['outletCode'],
+                'Status': res['status'],
+                'LastBackupTaken': res.get('lastModified'),
+                'BackupFile': res.get('file', 'N/A'),
+                'BackupFileSize': res.get('backupsize', 'N/A'),
+                'BackupFileSizeBytes': res.get('backupSizeBytes'),
+                'ErrorDetails': res.get('errorDetails'),
+                'DriveLetter': res.get('driveLetter'),
+            }
+            for res in results
+        ]
+
+        counts = merge_backup_stats(
+            conn, 'IB_Storage_Backup_Stat', today, rows, with_drive_letter=True, scan_type=self.scan_type
+        )
+        self.logger.info(
+            f"[IB] IB_Storage_Backup_Stat ScanDate={today}: {counts['inserted']} inserted, "
+            f"{counts['updated']} updated, {counts['unchanged']} unchanged"
+        )
+        return counts
 
     def _parse_row(self, row):
         return {
@@ -301,45 +354,41 @@ class IBStorageMonitor:
             'backupsize': row[5],
             'scanDate': row[6].isoformat() if isinstance(row[6], date) else row[6],
             'errorDetails': row[7],
-            'driveLetter': row[8]
+            'driveLetter': row[8],
+            'backupSizeBytes': row[9]
         }
 
-    def _is_advanced_date(self, last_modified):
-        if not last_modified:
-            return False
-        try:
-            if isinstance(last_modified, str):
-                last_modified = datetime.fromisoformat(last_modified)
-            return last_modified.year > date.today().year
-        except (ValueError, AttributeError):
-            return False
-
     def _categorize_results(self, rows):
         normal = []
         advanced_date = []
         for row in rows:
             record = self._parse_row(row)
-            if self._is_advanced_date(row[3]):
+            if row[10]:
                 advanced_date.append(record)
             else:
                 normal.append(record)
         return normal, advanced_date
 
-    def get_all_backup_stats(self):
-        """Fetch latest scan date's IBSTORAGE stats."""
+    def get_all_backup_stats(self, page=None, raise_errors=False):
+        """Fetch latest scan date's IBSTORAGE stats (one keyset page when page is given)."""
+        if page is not None:
+            return self._get_stats_page(page, latest=True)
         try:
             conn = self.get_db_connection()
             if not conn:
+                if raise_errors:
+                    raise pyodbc.Error("No database connection")
                 return {'normal': [], 'advancedDate': []}
             with conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT b.OutletServer, o.IPAddress, b.Status, b.LastBackupTaken,
-                           b.BackupFile, b.BackupFileSize, b.ScanDate, b.ErrorDetails,
-                           b.DriveLetter
-                    FROM [dbo].[IB_Storage_Backup_Stat] b
+                cursor.execute(f"""
+                    WITH latest AS (
+                        SELECT TOP (1) ScanDate FROM [dbo].[IB_Storage_Backup_Stat] ORDER BY ScanDate DESC
+                    )
+                    SELECT {self.STATS_COLUMNS}
+                    FROM latest
+                    INNER JOIN [dbo].[IB_Storage_Backup_Stat] b ON b.ScanDate = latest.ScanDate
                     LEFT JOIN [dbo].[Outlets] o ON b.OutletServer = o.OutletCode
-                    WHERE b.ScanDate = (SELECT MAX(ScanDate) FROM [dbo].[IB_Storage_Backup_Stat])
                     ORDER BY b.OutletServer
                 """)
                 rows = cursor.fetchall()
@@ -348,19 +397,65 @@ class IBStorageMonitor:
         except Exception as e:
             self.logger.error(f"[IB] Database Read Error: {str(e)}")
             self.logger.error(traceback.format_exc())
+            if raise_errors:
+                raise
             return {'normal': [], 'advancedDate': []}
 
-    def get_filtered_backup_stats(self, outlet=None, date_from=None, date_to=None):
+    def get_backup_stat_changes(self, since=None):
+        """Latest-scan rows inserted or updated after since (a decoded change token).
+
+        Returns the 'normal'/'advancedDate' groups plus 'scanDate', 'token'
+        (pass back as since) and 'reset' (True when the groups hold the whole
+        scan date rather than a delta), or None on a database error.
+        """
+        try:
+            conn = self.get_db_connection()
+            if not conn:
+                return None
+            with conn:
+                rows, scan_date, token, reset = read_stat_changes(
+                    conn, 'IB_Storage_Backup_Stat', self.STATS_COLUMNS, since
+                )
+                normal, advanced_date = self._categorize_results(rows)
+                return {
+                    'normal': normal,
+                    'advancedDate': advanced_date,
+                    'scanDate': scan_date.isoformat() if scan_date else None,
+                    'token': token,
+                    'reset': reset,
+                }
+        except Exception as e:
+            self.logger.error(f"[IB] Stats changes error: {str(e)}")
+            self.logger.error(traceback.format_exc())
+            return None
+
+    def get_stats_snapshot(self, build):
+        """(etag, body) of the latest-stats payload, served from the snapshot cache.
+
+        build() returns the payload dict and only runs when Stats_Version has
+        moved since the cached copy. Returns None while Stats_Version is
+        unavailable, so the caller reads the table directly.
+        """
+        conn = self.get_db_connection()
+        if not conn:
+            return None
+        with conn:
+            version = read_stats_version(conn, self.scan_type)
+        if version is None:
+            return None
+        return get_snapshot_cache().get(self.scan_type, version, build)
+
+    def get_filtered_backup_stats(self, outlet=None, date_from=None, date_to=None, page=None):
+        if page is not None:
+            return self._get_stats_page(page, latest=False, outlet=outlet, date_from=date_from, date_to=date_to)
         try:
             conn = self.get_db_connection()
             if not conn:
                 return {'normal': [], 'advancedDate': []}
             with conn:
                 cursor = conn.cursor()
-                query = """
-                    SELECT b.OutletServer, o.IPAddress, b.Status, b.LastBackupTaken,
-                           b.BackupFile, b.BackupFileSize, b.ScanDate, b.ErrorDetails,
-                           b.DriveLetter
+                query = f"""
+                    SELECT {self.STATS_COLUMNS}
                     FROM [dbo].[IB_Storage_Backup_Stat] b
                     LEFT JOIN [dbo].[Outlets] o ON b.OutletServer = o.OutletCode
                     WHERE 1=1
@@ -386,25 +481,128 @@ class IBStorageMonitor:
             self.logger.error(traceback.format_exc())
             return {'normal': [], 'advancedDate': []}
 
-    def get_daily_summary(self, limit=30):
+    def _get_stats_page(self, page, latest, outlet=None, date_from=None, date_to=None):
+        """One keyset page (see stats_page.parse_page_args) of IB_Storage_Backup_Stat.
+
+        Returns the 'normal'/'advancedDate' groups of the page rows plus
+        'nextCursor' (None on the last page).
+        """
         try:
             conn = self.get_db_connection()
             if not conn:
-                return []
+                return {'normal': [], 'advancedDate': [], 'nextCursor': None}
             with conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT
-                        ScanDate,
-                        COUNT(*) AS Total,
-                        SUM(CASE WHEN Status = 'Successful' THEN 1 ELSE 0 END) AS Successful,
-                        SUM(CASE WHEN Status != 'Successful' THEN 1 ELSE 0 END) AS Failed
-                    FROM [dbo].[IB_Storage_Backup_Stat]
-                    GROUP BY ScanDate
-                    ORDER BY ScanDate DESC
-                    OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY
-                """, (limit,))
+                query, params = build_page_query(
+                    'IB_Storage_Backup_Stat', self.STATS_COLUMNS, page, latest, outlet, date_from, date_to
+                )
+                cursor.execute(query, params)
                 rows = cursor.fetchall()
+                next_cursor = encode_cursor(rows[page['limit'] - 1], page) if len(rows) > page['limit'] else None
+                normal, advanced_date = self._categorize_results(rows[:page['limit']])
+                return {'normal': normal, 'advancedDate': advanced_date, 'nextCursor': next_cursor}
+        except Exception as e:
+            self.logger.error(f"[IB] Stats page error: {str(e)}")
+            self.logger.error(traceback.format_exc())
+            return {'normal': [], 'advancedDate': [], 'nextCursor': None}
+
+    def count_backup_stats(self, filters, outlet=None, date_from=None, date_to=None):
+        """Row count behind the paged stats reads (latest scan date when no outlet/date filter).
+
+        Returns None on error.
+        """
+        try:
+            conn = self.get_db_connection()
+            if not conn:
+                return None
+            with conn:
+                cursor = conn.cursor()
+                latest = not (outlet or date_from or date_to)
+                query, params = build_count_query(
+                    'IB_Storage_Backup_Stat', filters, latest, outlet, date_from, date_to
+                )
+                cursor.execute(query, params)
+                return cursor.fetchone()[0]
+        except Exception as e:
+            self.logger.error(f"[IB] Stats count error: {str(e)}")
+            self.logger.error(traceback.format_exc())
+            return None
+
+    def iter_backup_stats(self, filters, outlet=None, date_from=None, date_to=None, chunk_size=None):
+        """Yield the matching IB_Storage_Backup_Stat rows as lists of export records.
+
+        Rows are read with fetchmany(chunk_size) (STATS_EXPORT_CHUNK_SIZE by
+        default) so no more than one chunk is in memory; the pooled connection
+        is held until the generator is exhausted or closed. Unlike the other
+        reads, database errors are raised to the caller.
+        """
+        latest = not (outlet or date_from or date_to)
+        query, params = build_export_query(
+            'IB_Storage_Backup_Stat', self.STATS_COLUMNS, filters, latest, outlet, date_from, date_to
+        )
+        with get_local_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size or Config.STATS_EXPORT_CHUNK_SIZE)
+                if not rows:
+                    break
+                records = []
+                for row in rows:
+                    record = self._parse_row(row)
+                    record['advancedDate'] = bool(row[10])
+                    records.append(record)
+                yield records
+
+    def refresh_rollups(self):
+        """Recompute the weekly/monthly rollups of this scan date (called when a scan finishes)."""
+        try:
+            conn = self.get_db_connection()
+            if not conn:
+                return
+            with conn:
+                refresh_rollups(conn, self.scan_type, self.scan_date or date.today())
+                conn.commit()
+        except Exception as e:
+            self.logger.error(f"[IB] Rollup refresh error: {str(e)}")
+            self.logger.error(traceback.format_exc())
+
+    def get_rollups(self, granularity, date_from=None, date_to=None, outlet=None):
+        """Per-outlet rollups ('week' or 'month') from Backup_Outlet_Rollup, newest period first."""
+        try:
+            conn = self.get_db_connection()
+            if not conn:
+                return []
+            with conn:
+                return read_rollups(conn, self.scan_type, granularity, date_from, date_to, outlet)
+        except Exception as e:
+            self.logger.error(f"[IB] Rollup read error: {str(e)}")
+            self.logger.error(traceback.format_exc())
+            return []
+
+    def get_daily_summary(self, limit=30):
+        try:
+            conn = self.get_db_connection()
+            if not conn:
+                return []
+            with conn:
+                # Maintained by save_backup_status; aggregate the history only
+                # until migration_add_daily_summary.sql has run
+                rows = read_daily_summary(conn, self.scan_type, limit)
+                if rows is None:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        SELECT
+                            ScanDate,
+                            COUNT(*) AS Total,
+                            SUM(CASE WHEN Status = 'Successful' THEN 1 ELSE 0 END) AS Successful,
+                            SUM(CASE WHEN Status != 'Successful' THEN 1 ELSE 0 END) AS Failed
+                        FROM [dbo].[IB_Storage_Backup_Stat]
+                        GROUP BY ScanDate
+                        ORDER BY ScanDate DESC
+                        OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY
+                    """, (limit,))
+                    rows = cursor.fetchall()
                 return [
                     {
                         'scanDate': row[0].isoformat() if isinstance(row[0], date) else row[0],
@@ -0,0 +1,152 @@
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from statistics import median
+from app.config import Config
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for the SMB stage of the scan engine.
+
+    Every completed outlet check is recorded with its latency and whether it
+    failed in a way that points at congestion (SMB protocol errors, timeouts).
+    After each window of samples:
+    - error rate above the threshold, or median latency more than
+      latency_factor x the baseline median  -> limit *= decrease_factor
+    - otherwise                             -> limit += 1
+
+    The limiter lives for the whole process, so what one scan learns about
+    the network carries over to the next. It also counts the checks in
+    flight (try_acquire/release), so concurrent scans of the same type share
+    one limit instead of each getting all of it.
+    """
+
+    HISTORY_SIZE = 50
+
+    def __init__(self, name, initial, minimum, maximum, window=None,
+                 error_threshold=None, latency_factor=None, decrease_factor=None):
+        self.name = name
+        self.min_limit = max(1, minimum)
+        self.max_limit = max(self.min_limit, maximum)
+        self.window = window or Config.SCAN_AIMD_WINDOW
+        self.error_threshold = error_threshold if error_threshold is not None else Config.SCAN_AIMD_ERROR_THRESHOLD
+        self.latency_factor = latency_factor or Config.SCAN_AIMD_LATENCY_FACTOR
+        self.decrease_factor = decrease_factor or Config.SCAN_AIMD_DECREASE_FACTOR
+
+        self._lock = threading.Lock()
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self._baseline_latency = None
+        self._latencies = []
+        self._errors = 0
+        self._samples = 0
+        self._in_flight = 0
+        self._history = deque(maxlen=self.HISTORY_SIZE)
+
+    @property
+    def limit(self):
+        """Current whole-number concurrency limit."""
+        with self._lock:
+            return int(self._limit)
+
+    def try_acquire(self):
+        """Take a slot for one check; False when limit checks are already in flight."""
+        with self._lock:
+            if self._in_flight >= int(self._limit):
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        """Give back a slot taken with try_acquire (thread-safe)."""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+
+    def record(self, latency, error):
+        """Record one completed check (latency in seconds)."""
+        with self._lock:
+            self._samples += 1
+            if error:
+                self._errors += 1
+            else:
+                self._latencies.append(latency)
+            if self._samples >= self.window:
+                self._adjust()
+
+    def _adjust(self):
+        error_rate = self._errors / self._samples
+        median_latency = median(self._latencies) if self._latencies else None
+
+        # Baseline follows improvements immediately and degradations slowly, so a
+        # permanently slower network does not pin the limit at its minimum
+        if median_latency is not None:
+            if self._baseline_latency is None or median_latency < self._baseline_latency:
+                self._baseline_latency = median_latency
+            else:
+                self._baseline_latency += (median_latency - self._baseline_latency) * 0.05
+
+        latency_spike = (
+            median_latency is not None and bool(self._baseline_latency)
+            and median_latency > self._baseline_latency * self.latency_factor
+        )
+
+        previous = self._limit
+        if error_rate > self.error_threshold:
+            self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+            reason = 'errors'
+        elif latency_spike:
+            self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+            reason = 'latency'
+        else:
+            self._limit = min(self.max_limit, self._limit + 1)
+            reason = 'increase'
+
+        if int(previous) != int(self._limit):
+            self._history.append({
+                'at': datetime.now(timezone.utc).isoformat(),
+                'limit': int(self._limit),
+                'previous': int(previous),
+                'reason': reason,
+                'errorRate': round(error_rate, 3),
+                'medianLatencyMs': round(median_latency * 1000) if median_latency is not None else None,
+            })
+
+        self._latencies = []
+        self._errors = 0
+        self._samples = 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'limit': int(self._limit),
+                'inFlight': self._in_flight,
+                'min': self.min_limit,
+                'max': self.max_limit,
+                'baselineLatencyMs': round(self._baseline_latency * 1000) if self._baseline_latency else None,
+                'history': list(self._history),
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name):
+    """Return the process-wide limiter for a scan type, creating it on first use."""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = AdaptiveLimiter(
+                name,
+                initial=Config.SCAN_SMB_WORKERS,
+                minimum=Config.SCAN_SMB_MIN_WORKERS,
+                maximum=Config.SCAN_SMB_MAX_WORKERS,
+            )
+            _limiters[name] = limiter
+        return limiter
+
+
+def get_limiter_snapshots():
+    """Current limit and adjustment history of every limiter in this worker process."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.snapshot() for name, limiter in limiters.items()}
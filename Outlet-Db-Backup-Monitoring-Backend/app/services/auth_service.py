@@ -3,6 +3,7 @@ import jwt
 import bcrypt
 from datetime import datetime, timezone, timedelta
 from app.config import Config
+from app.db_pool import get_local_connection
 
 
 class AuthService:
@@ -10,16 +11,8 @@ class AuthService:
         self.config = Config()
 
     def get_db_connection(self):
-        """Establish database connection (same pattern as BackupMonitor)."""
-        conn_str = (
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER={self.config.DB_SERVER};"
-            f"DATABASE={self.config.DB_DATABASE};"
-            f"UID={self.config.DB_USERNAME};"
-            f"PWD={self.config.DB_PASSWORD};"
-            "Encrypt=no;TrustServerCertificate=yes;"
-        )
-        return pyodbc.connect(conn_str)
+        """Check out a pooled database connection (same pattern as BackupMonitor)."""
+        return get_local_connection()
 
     def authenticate_user(self, user_id, password):
         """Verify user credentials against UserManager table.
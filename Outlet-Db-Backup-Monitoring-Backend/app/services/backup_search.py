@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+from fnmatch import fnmatch
+from smbclient import scandir
+from smbprotocol.file_info import FileAttributes
+
+MIN_BACKUP_SIZE = 1024  # Minimum backup file size (1KB)
+
+
+def format_backup_size(size_bytes):
+    """Legacy display form of a backup size, e.g. '2.45 GB' (BackupFileSize column)."""
+    return f"{round(size_bytes / (1024 * 1024 * 1024), 2)} GB"
+
+
+def find_latest_backup(smb_path, patterns, cutoff_date=None, counters=None):
+    """Return (name, last_write_time, size_bytes) of the newest valid backup in smb_path.
+
+    Each pattern (e.g. '*.bak') is sent to the SMB server as the scandir()
+    search pattern, so non-matching files never cross the WAN. Entries are
+    consumed as they arrive, keeping only the running newest file; size and
+    last write time come from the directory listing (entry.smb_info), so no
+    per-file stat() is issued.
+
+    Names are re-checked against the patterns locally because Windows also
+    matches wildcards against 8.3 short names (FILE~1.BAK for 'x.bakup').
+
+    When cutoff_date (a date object) is provided, only files modified on or
+    before that date are considered. Each enumeration is counted in
+    counters['smbRoundTrips'] when a counters dict is passed.
+    Returns (None, None, None) when nothing qualifies.
+    """
+    cutoff_dt = None
+    if cutoff_date:
+        cutoff_dt = datetime.combine(cutoff_date, datetime.max.time()).replace(tzinfo=timezone.utc)
+
+    patterns = [p.lower() for p in patterns]
+    latest = (None, None, None)
+
+    for pattern in patterns:
+        if counters is not None:
+            counters['smbRoundTrips'] = counters.get('smbRoundTrips', 0) + 1
+
+        for entry in scandir(smb_path, search_pattern=pattern):
+            name = entry.name
+            if not any(fnmatch(name.lower(), p) for p in patterns):
+                continue
+
+            info = entry.smb_info
+            if info.file_attributes & FileAttributes.FILE_ATTRIBUTE_DIRECTORY:
+                continue
+            if info.end_of_file < MIN_BACKUP_SIZE:
+                continue
+
+            # smbclient returns timestamps in UTC
+            mod_time = info.last_write_time
+            if mod_time.tzinfo is None:
+                mod_time = mod_time.replace(tzinfo=timezone.utc)
+
+            # Skip files newer than the cutoff for back-date scans
+            if cutoff_dt and mod_time > cutoff_dt:
+                continue
+
+            if latest[1] is None or mod_time > latest[1]:
+                latest = (name, mod_time, info.end_of_file)
+
+    return latest
@@ -2,14 +2,35 @@ import os
 import time
 import pyodbc
 import traceback
-from smbprotocol.exceptions import SMBConnectionClosed, SMBException
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime, date, timezone
-from smbclient import register_session, delete_session, listdir, stat
+from smbprotocol.exceptions import SMBConnectionClosed, SMBException, SMBOSError
+from datetime import datetime, date
 from app.config import Config
+from app.db_pool import get_local_connection
 from app.logging_config import get_d_drive_logger
+from app.services.backup_search import find_latest_backup, format_backup_size
+from app.services.backup_stat_writer import merge_backup_stats
+from app.services.daily_summary_service import read_daily_summary
+from app.services.rollup_service import read_rollups, refresh_rollups
+from app.services.smb_session_pool import get_session_pool
+from app.services.stats_changes import read_stat_changes
+from app.services.stats_page import build_count_query, build_export_query, build_page_query, encode_cursor
+from app.services.stats_snapshot import get_snapshot_cache, read_stats_version
 
 class BackupMonitor:
+    scan_type = 'D_Drive'  # matches Scheduler_Status.ScanType
+
+    # Columns read by the stats endpoints, in _parse_row order; the backup
+    # time and the advanced-date flag come from the typed DATETIME2 column
+    STATS_COLUMNS = (
+        "b.OutletServer, o.IPAddress, b.Status, b.LastBackupTakenUtc, "
+        "b.BackupFile, b.BackupFileSize, b.ScanDate, b.ErrorDetails, b.BackupFileSizeBytes, "
+        "CASE WHEN YEAR(b.LastBackupTakenUtc) > YEAR(GETDATE()) THEN 1 ELSE 0 END"
+    )
+
+    # Export record keys (_parse_row + advancedDate), also the CSV column order
+    EXPORT_FIELDS = ('outletCode', 'server', 'status', 'lastModified', 'file', 'backupsize',
+                     'backupSizeBytes', 'scanDate', 'errorDetails', 'advancedDate')
+
     def __init__(self):
         self.config = Config()
         self.debug_mode = True
@@ -25,16 +46,8 @@ class BackupMonitor:
 
     def get_db_connection(self):
         """Establish a secure database connection"""
-        conn_str = (
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER={self.config.DB_SERVER};"
-            f"DATABASE={self.config.DB_DATABASE};"
-            f"UID={self.config.DB_USERNAME};"
-            f"PWD={self.config.DB_PASSWORD};"
-            "Encrypt=no;TrustServerCertificate=yes;"
-        )
         try:
-            return pyodbc.connect(conn_str)
+            return get_local_connection()
         except pyodbc.Error as e:
             self.logger.error(f"Database connection error: {e}")
             return None
@@ -81,75 +94,109 @@ class BackupMonitor:
             self.logger.error(f"Database Error fetching unscanned outlets: {str(e)}")
             return []
 
-    def check_server(self, outlet):
-        """Check server status with retry logic"""
+    def new_result(self, outlet):
+        """Build the default (failed) result dict for an outlet."""
         outlet_code, server_ip = outlet
-        result = {
+        return {
             'outletCode': outlet_code,
             'server': server_ip,
             'lastModified': None,
             'status': 'Error',
             'errorDetails': None,
-            'backupsize': None
+            'backupsize': None,
+            'backupSizeBytes': None,
+            'smbRoundTrips': 0
         }
 
+    def error_result(self, outlet, details):
+        """Build a failed result carrying the given error details."""
+        result = self.new_result(outlet)
+        result['errorDetails'] = details
+        return result
+
+    def exception_result(self, outlet, error):
+        """Build a failed result from an exception raised while talking SMB."""
+        server_name = outlet[1]
+        if isinstance(error, SMBConnectionClosed):
+            get_session_pool().invalidate(server_name)
+        if isinstance(error, (SMBConnectionClosed, SMBException)):
+            self.logger.error(f"SMB Protocol Error for {server_name}: {str(error)}")
+            return self.error_result(outlet, f"SMB Protocol Error: {str(error)}")
+        self.logger.error(f"Unexpected Error for {server_name}: {str(error)}")
+        return self.error_result(outlet, f"Error: {str(error)}")
+
+    def check_server(self, outlet):
+        """Check server status with retry logic"""
+        outlet_code, server_ip = outlet
+
         # Step 1: Ping check
         self.logger.info(f"Checking server: {server_ip} (Outlet: {outlet_code})")
         if not self.ping_with_retry(server_ip):
             self.logger.error(f"Ping failed for {server_ip}")
-            result['errorDetails'] = 'Server not Reachable'
-            return result
+            return self.error_result(outlet, 'Server not Reachable')
         self.logger.info(f"Ping successful for {server_ip}")
 
+        return self.check_share(outlet)
+
+    def check_share(self, outlet):
+        """Inspect the backup share of a server that is known to be reachable.
+
+        This is the blocking SMB half of check_server(); the scan engine calls it
+        directly after its own non-blocking reachability probe.
+        """
         # Step 2: Network share connection
-        server_name = server_ip
-        
+        server_name = outlet[1]
+
         try:
             self.logger.info(f"Attempting SMB connection to {server_name} as {self.config.SHARE_USERNAME}")
-            register_session(
-                server_name, 
-                username=self.config.SHARE_USERNAME, 
+            with get_session_pool().session(
+                server_name,
+                username=self.config.SHARE_USERNAME,
                 password=self.config.SHARE_PASSWORD
-            )
-            self.logger.info(f"SMB session registered for {server_name}")
-            
+            ):
+                self.logger.info(f"SMB session ready for {server_name}")
+                return self.inspect_share(outlet)
+        except Exception as e:
+            return self.exception_result(outlet, e)
+
+    def inspect_share(self, outlet):
+        """Check the D-drive backup folder over an already registered SMB session.
+
+        Shared by check_share() and the combined scan, which inspects the
+        D-drive and IBSTORAGE locations of an outlet in one session.
+        """
+        result = self.new_result(outlet)
+        server_name = outlet[1]
+
+        try:
             # smbclient path format: \\server\share\folder
             smb_base_path = f"\\\\{server_name}\\{self.config.SHARE_NAME}\\{self.config.FOLDER_PATH}"
             self.logger.info(f"Checking path: {smb_base_path}")
-            
-            # Step 3: Check backup folder
+
+            # Step 3: Get latest backup with validation (one enumeration per file pattern)
             try:
-                files = listdir(smb_base_path)
-                self.logger.info(f"Found {len(files)} files in {smb_base_path}")
-            except Exception as e:
-                self.logger.error(f"Listdir failed for {smb_base_path}: {str(e)}")
+                latest_file, mod_time, backup_size = self.get_validated_backup(
+                    smb_base_path, cutoff_date=self.scan_date, counters=result
+                )
+            except SMBOSError as e:
+                self.logger.error(f"Scandir failed for {smb_base_path}: {str(e)}")
                 result['errorDetails'] = f"Folder not found or inaccessible: {smb_base_path}"
                 return result
 
-            # Step 4: Get latest backup with validation
-            latest_file, mod_time, backup_size = self.get_validated_backup(smb_base_path, cutoff_date=self.scan_date)
+            self.logger.info(f"{server_name}: backup search took {result['smbRoundTrips']} SMB round trip(s)")
             if latest_file:
-                self.logger.info(f"Found valid backup: {latest_file} ({backup_size} GB)")
+                result['backupsize'] = format_backup_size(backup_size)
+                self.logger.info(f"Found valid backup: {latest_file} ({result['backupsize']})")
                 result['lastModified'] = mod_time.isoformat()
                 result['status'] = 'Successful'
                 result['file'] = os.path.basename(latest_file)
-                result['backupsize'] = f"{backup_size} GB"
+                result['backupSizeBytes'] = backup_size
             else:
                 self.logger.warning(f"No valid backup files found in {smb_base_path}")
                 result['errorDetails'] = 'No Valid Backup Files Found'
 
-        except (SMBConnectionClosed, SMBException) as smb_e:
-            self.logger.error(f"SMB Protocol Error for {server_name}: {str(smb_e)}")
-            result['errorDetails'] = f"SMB Protocol Error: {str(smb_e)}"
         except Exception as e:
-            self.logger.error(f"Unexpected Error for {server_name}: {str(e)}")
-            result['errorDetails'] = f"Error: {str(e)}"
-        finally:
-            try:
-                self.logger.info(f"Cleaning up SMB session for {server_name}")
-                delete_session(server_name)
-            except Exception as cleanup_e:
-                self.logger.debug(f"Session cleanup failed for {server_name}: {str(cleanup_e)}")
+            return self.exception_result(outlet, e)
 
         return result
 
@@ -174,52 +221,28 @@ class BackupMonitor:
             self.logger.error(f"TCP check failed for {server_ip}: {str(e)}")
             return False
 
-    def get_validated_backup(self, smb_path, cutoff_date=None):
-        """Find the latest valid backup file and its size using smbclient.
+    def get_validated_backup(self, smb_path, cutoff_date=None, counters=None):
+        """Find the latest valid backup file and its size in bytes using smbclient.
+
+        The SMB server filters the folder by BACKUP_FILE_PATTERNS and the
+        listing is streamed once, keeping only the newest file (see
+        find_latest_backup). SMB calls made here are counted in
+        counters['smbRoundTrips'] when a counters dict is passed.
 
         When cutoff_date (a date object) is provided, only files modified on or
         before that date are considered. This enables back-date scanning.
         """
         try:
-            latest_file = None
-            latest_time = None
-            min_size = 1024  # Minimum backup file size (1KB)
-
-            # For back-date scans, compute end-of-day cutoff in UTC
-            cutoff_dt = None
-            if cutoff_date:
-                cutoff_dt = datetime.combine(cutoff_date, datetime.max.time()).replace(tzinfo=timezone.utc)
-
-            # Use smbclient.listdir to get files
-            for file in listdir(smb_path):
-                if file.lower().endswith('.bak'):
-                    file_full_path = f"{smb_path}\\{file}"
-
-                    # Use smbclient.stat to get metadata
-                    file_info = stat(file_full_path)
-
-                    if file_info.st_size < min_size:
-                        continue
-
-                    # smbclient returns timestamps in UTC
-                    mod_time = datetime.fromtimestamp(file_info.st_mtime, tz=timezone.utc)
-
-                    # Skip files newer than the cutoff for back-date scans
-                    if cutoff_dt and mod_time > cutoff_dt:
-                        continue
-
-                    if not latest_time or mod_time > latest_time:
-                        latest_file = file
-                        latest_time = mod_time
-
+            latest_file, latest_time, latest_size = find_latest_backup(
+                smb_path, self.config.BACKUP_FILE_PATTERNS, cutoff_date=cutoff_date, counters=counters
+            )
             if latest_file:
-                file_full_path = f"{smb_path}\\{latest_file}"
-                file_size_bytes = stat(file_full_path).st_size
-                file_size_gb = round(file_size_bytes / (1024 * 1024 * 1024), 2)
-                return (latest_file, latest_time, file_size_gb)
+                return (latest_file, latest_time, latest_size)
             else:
                 return None, None, None
 
+        except SMBOSError:
+            raise  # Folder missing or inaccessible; reported by inspect_share
         except (SMBConnectionClosed, SMBException) as smb_e:
             self.logger.error(f"SMB Protocol Error during backup search: {str(smb_e)}")
             raise  # Re-raise to be caught by check_server
@@ -233,68 +256,53 @@ class BackupMonitor:
         Logic:
         - Same outlet + same day (ScanDate) → UPDATE only if values changed, skip if identical
         - Same outlet + new day → INSERT a new record (previous days' records stay untouched)
+
+        All results go to SQL Server in one batch and one MERGE (see
+        merge_backup_stats). Returns the inserted/updated/unchanged counts,
+        or None if the batch could not be saved.
         """
         self.logger.info(f"Starting save_backup_status for {len(results)} results")
-        today = self.scan_date if self.scan_date else date.today()
-
         try:
             conn = self.get_db_connection()
             if not conn:
                 self.logger.error("Failed to get DB connection for saving status")
-                return
+                return None
 
-            updated = inserted = skipped = 0
             with conn:
-                cursor = conn.cursor()
-                for res in results:
-                    outlet_code = res['outletCode']
-                    status = res['status'] # 'Successful' or 'Error'
-                    last_backup = res.get('lastModified')
-                    backup_file = res.get('file', 'N/A')
-                    storage_used = res.get('backupsize', 'N/A')
-                    error_details = res.get('errorDetails')
-
-                    try:
-                        # Fetch existing record for comparison
-                        cursor.execute(
-                            "SELECT Status, BackupFile, BackupFileSize, ErrorDetails FROM [dbo].[D_Drive_Backup_Stat] WHERE OutletServer = ? AND ScanDate = ?",
-                            (outlet_code, today)
-                        )
-                        existing = cursor.fetchone()
-
-                        if existing:
-                            # Skip update if key fields are unchanged
-                            if (existing[0] == status and
-                                    (existing[1] or '') == (backup_file or '') and
-                                    (existing[2] or '') == (storage_used or '') and
-                                    (existing[3] or '') == (error_details or '')):
-                                skipped += 1
-                                continue
-
-                            cursor.execute("""
-                                UPDATE [dbo].[D_Drive_Backup_Stat]
-                                SET Status = ?, LastBackupTaken = ?, BackupFile = ?, Duration = ?, BackupFileSize = ?, ErrorDetails = ?
-                                WHERE OutletServer = ? AND ScanDate = ?
-                            """, (status, last_backup, backup_file, None, storage_used, error_details, outlet_code, today))
-                            updated += 1
-                        else:
-                            cursor.execute("""
-                                INSERT INTO [dbo].[D_Drive_Backup_Stat]
-                                (OutletServer, Status, LastBackupTaken, BackupFile, Duration, BackupFileSize, ScanDate, ErrorDetails)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                            """, (outlet_code, status, last_backup, backup_file, None, storage_used, today, error_details))
-                            inserted += 1
-                    except Exception as sql_e:
-                        self.logger.error(f"SQL Error for outlet {outlet_code}: {str(sql_e)}")
-
+                counts = self.merge_backup_status(conn, results)
                 conn.commit()
-                self.logger.info(f"D_Drive_Backup_Stat ScanDate={today}: {inserted} inserted, {updated} updated, {skipped} unchanged")
+            return counts
         except Exception as e:
             self.logger.error(f"Database Persistence Error: {str(e)}")
             self.logger.error(traceback.format_exc())
+            return None
+
+    def merge_backup_status(self, conn, results):
+        """MERGE results into D_Drive_Backup_Stat on conn; the caller commits. Returns the counts."""
+        today = self.scan_date if self.scan_date else date.today()
+
+        rows = [
+            {
+                'OutletServer': res['outletCode'],
+                'Status': res['status'],  # 'Successful' or 'Error'
+                'LastBackupTaken': res.get('lastModified'),
+                'BackupFile': res.get('file', 'N/A'),
+                'BackupFileSize': res.get('backupsize', 'N/A'),
+                'BackupFileSizeBytes': res.get('backupSizeBytes'),
+                'ErrorDetails': res.get('errorDetails'),
+            }
+            for res in results
+        ]
+
+        counts = merge_backup_stats(conn, 'D_Drive_Backup_Stat', today, rows, scan_type=self.scan_type)
+        self.logger.info(
+            f"D_Drive_Backup_Stat ScanDate={today}: {counts['inserted']} inserted, "
+            f"{counts['updated']} updated, {counts['unchanged']} unchanged"
+        )
+        return counts
 
     def _parse_row(self, row):
-        """Parse a database row into a result dict."""
+        """Parse a database row (see STATS_COLUMNS) into a result dict."""
         return {
             'outletCode': row[0],
             'server': row[1] or '',
@@ -303,53 +311,56 @@ class BackupMonitor:
             'file': row[4],
             'backupsize': row[5],
             'scanDate': row[6].isoformat() if isinstance(row[6], date) else row[6],
-            'errorDetails': row[7]
+            'errorDetails': row[7],
+            'backupSizeBytes': row[8]
         }
 
-    def _is_advanced_date(self, last_modified):
-        """Check if a backup's LastBackupTaken year is beyond the current year."""
-        if not last_modified:
-            return False
-        try:
-            if isinstance(last_modified, str):
-                last_modified = datetime.fromisoformat(last_modified)
-            return last_modified.year > date.today().year
-        except (ValueError, AttributeError):
-            return False
-
     def _categorize_results(self, rows):
-        """Split rows into normal and advancedDate groups."""
+        """Split rows into normal and advancedDate groups (backup year beyond the current year)."""
         normal = []
         advanced_date = []
         for row in rows:
             record = self._parse_row(row)
-            if self._is_advanced_date(row[3]):
+            if row[9]:
                 advanced_date.append(record)
             else:
                 normal.append(record)
         return normal, advanced_date
 
-    def get_all_backup_stats(self):
+    def get_all_backup_stats(self, page=None, raise_errors=False):
         """Fetch the latest scan date's backup stats from D_Drive_Backup_Stat.
 
+        The latest ScanDate is a TOP (1) seek on IX_D_Drive_Backup_Stat_ScanDate,
+        which also covers the rows of that date (migration_add_stats_indexes.sql).
+
         Returns a dict with two groups:
         - 'normal': outlets with backup dates in current year or past
         - 'advancedDate': outlets with backup dates beyond the current year
+
+        With page (stats_page.parse_page_args) only that keyset page is read
+        and the dict also carries 'nextCursor'. With raise_errors, database
+        errors are raised instead of returning empty groups.
         """
+        if page is not None:
+            return self._get_stats_page(page, latest=True)
         self.logger.info("Starting get_all_backup_stats")
         try:
             conn = self.get_db_connection()
             if not conn:
+                if raise_errors:
+                    raise pyodbc.Error("No database connection")
                 self.logger.error("Failed to get DB connection for reading stats")
                 return {'normal': [], 'advancedDate': []}
             with conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT b.OutletServer, o.IPAddress, b.Status, b.LastBackupTaken,
-                           b.BackupFile, b.BackupFileSize, b.ScanDate, b.ErrorDetails
-                    FROM [dbo].[D_Drive_Backup_Stat] b
+                cursor.execute(f"""
+                    WITH latest AS (
+                        SELECT TOP (1) ScanDate FROM [dbo].[D_Drive_Backup_Stat] ORDER BY ScanDate DESC
+                    )
+                    SELECT {self.STATS_COLUMNS}
+                    FROM latest
+                    INNER JOIN [dbo].[D_Drive_Backup_Stat] b ON b.ScanDate = latest.ScanDate
                     LEFT JOIN [dbo].[Outlets] o ON b.OutletServer = o.OutletCode
-                    WHERE b.ScanDate = (SELECT MAX(ScanDate) FROM [dbo].[D_Drive_Backup_Stat])
                     ORDER BY b.OutletServer
                 """)
                 rows = cursor.fetchall()
@@ -359,8 +370,54 @@ class BackupMonitor:
         except Exception as e:
             self.logger.error(f"Database Read Error: {str(e)}")
             self.logger.error(traceback.format_exc())
+            if raise_errors:
+                raise
             return {'normal': [], 'advancedDate': []}
 
+    def get_backup_stat_changes(self, since=None):
+        """Latest-scan rows inserted or updated after since (a decoded change token).
+
+        Returns the 'normal'/'advancedDate' groups plus 'scanDate', 'token'
+        (pass back as since) and 'reset' (True when the groups hold the whole
+        scan date rather than a delta), or None on a database error.
+        """
+        try:
+            conn = self.get_db_connection()
+            if not conn:
+                return None
+            with conn:
+                rows, scan_date, token, reset = read_stat_changes(
+                    conn, 'D_Drive_Backup_Stat', self.STATS_COLUMNS, since
+                )
+                normal, advanced_date = self._categorize_results(rows)
+                return {
+                    'normal': normal,
+                    'advancedDate': advanced_date,
+                    'scanDate': scan_date.isoformat() if scan_date else None,
+                    'token': token,
+                    'reset': reset,
+                }
+        except Exception as e:
+            self.logger.error(f"Stats changes error: {str(e)}")
+            self.logger.error(traceback.format_exc())
+            return None
+
+    def get_stats_snapshot(self, build):
+        """(etag, body) of the latest-stats payload, served from the snapshot cache.
+
+        build() returns the payload dict and only runs when Stats_Version has
+        moved since the cached copy. Returns None while Stats_Version is
+        unavailable, so the caller reads the table directly.
+        """
+        conn = self.get_db_connection()
+        if not conn:
+            return None
+        with conn:
+            version = read_stats_version(conn, self.scan_type)
+        if version is None:
+            return None
+        return get_snapshot_cache().get(self.scan_type, version, build)
+
     def get_outlets_by_codes(self, codes):
         """Fetch specific outlets by their codes for selective re-scanning."""
         try:
@@ -393,21 +450,23 @@ class BackupMonitor:
             self.logger.error(f"Outlet list error: {str(e)}")
             return []
 
-    def get_filtered_backup_stats(self, outlet=None, date_from=None, date_to=None):
+    def get_filtered_backup_stats(self, outlet=None, date_from=None, date_to=None, page=None):
         """Fetch backup stats with optional filters.
 
         Returns a dict with 'normal' and 'advancedDate' groups,
-        filtered by ScanDate range.
+        filtered by ScanDate range (one keyset page plus 'nextCursor'
+        when page is given).
         """
+        if page is not None:
+            return self._get_stats_page(page, latest=False, outlet=outlet, date_from=date_from, date_to=date_to)
         try:
             conn = self.get_db_connection()
             if not conn:
                 return {'normal': [], 'advancedDate': []}
             with conn:
                 cursor = conn.cursor()
-                query = """
-                    SELECT b.OutletServer, o.IPAddress, b.Status, b.LastBackupTaken,
-                           b.BackupFile, b.BackupFileSize, b.ScanDate, b.ErrorDetails
+                query = f"""
+                    SELECT {self.STATS_COLUMNS}
                     FROM [dbo].[D_Drive_Backup_Stat] b
                     LEFT JOIN [dbo].[Outlets] o ON b.OutletServer = o.OutletCode
                     WHERE 1=1
@@ -433,6 +492,105 @@ class BackupMonitor:
             self.logger.error(traceback.format_exc())
             return {'normal': [], 'advancedDate': []}
 
+    def _get_stats_page(self, page, latest, outlet=None, date_from=None, date_to=None):
+        """One keyset page (see stats_page.parse_page_args) of D_Drive_Backup_Stat.
+
+        Returns the 'normal'/'advancedDate' groups of the page rows plus
+        'nextCursor' (None on the last page).
+        """
+        try:
+            conn = self.get_db_connection()
+            if not conn:
+                return {'normal': [], 'advancedDate': [], 'nextCursor': None}
+            with conn:
+                cursor = conn.cursor()
+                query, params = build_page_query(
+                    'D_Drive_Backup_Stat', self.STATS_COLUMNS, page, latest, outlet, date_from, date_to
+                )
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                next_cursor = encode_cursor(rows[page['limit'] - 1], page) if len(rows) > page['limit'] else None
+                normal, advanced_date = self._categorize_results(rows[:page['limit']])
+                return {'normal': normal, 'advancedDate': advanced_date, 'nextCursor': next_cursor}
+        except Exception as e:
+            self.logger.error(f"Stats page error: {str(e)}")
+            self.logger.error(traceback.format_exc())
+            return {'normal': [], 'advancedDate': [], 'nextCursor': None}
+
+    def count_backup_stats(self, filters, outlet=None, date_from=None, date_to=None):
+        """Row count behind the paged stats reads (latest scan date when no outlet/date filter).
+
+        Returns None on error.
+        """
+        try:
+            conn = self.get_db_connection()
+            if not conn:
+                return None
+            with conn:
+                cursor = conn.cursor()
+                latest = not (outlet or date_from or date_to)
+                query, params = build_count_query(
+                    'D_Drive_Backup_Stat', filters, latest, outlet, date_from, date_to
+                )
+                cursor.execute(query, params)
+                return cursor.fetchone()[0]
+        except Exception as e:
+            self.logger.error(f"Stats count error: {str(e)}")
+            self.logger.error(traceback.format_exc())
+            return None
+
+    def iter_backup_stats(self, filters, outlet=None, date_from=None, date_to=None, chunk_size=None):
+        """Yield the matching D_Drive_Backup_Stat rows as lists of export records.
+
+        Rows are read with fetchmany(chunk_size) (STATS_EXPORT_CHUNK_SIZE by
+        default) so no more than one chunk is in memory; the pooled connection
+        is held until the generator is exhausted or closed. Unlike the other
+        reads, database errors are raised to the caller.
+        """
+        latest = not (outlet or date_from or date_to)
+        query, params = build_export_query(
+            'D_Drive_Backup_Stat', self.STATS_COLUMNS, filters, latest, outlet, date_from, date_to
+        )
+        with get_local_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size or Config.STATS_EXPORT_CHUNK_SIZE)
+                if not rows:
+                    break
+                records = []
+                for row in rows:
+                    record = self._parse_row(row)
+                    record['advancedDate'] = bool(row[9])
+                    records.append(record)
+                yield records
+
+    def refresh_rollups(self):
+        """Recompute the weekly/monthly rollups of this scan date (called when a scan finishes)."""
+        try:
+            conn = self.get_db_connection()
+            if not conn:
+                return
+            with conn:
+                refresh_rollups(conn, self.scan_type, self.scan_date or date.today())
+                conn.commit()
+        except Exception as e:
+            self.logger.error(f"Rollup refresh error: {str(e)}")
+            self.logger.error(traceback.format_exc())
+
+    def get_rollups(self, granularity, date_from=None, date_to=None, outlet=None):
+        """Per-outlet rollups ('week' or 'month') from Backup_Outlet_Rollup, newest period first."""
+        try:
+            conn = self.get_db_connection()
+            if not conn:
+                return []
+            with conn:
+                return read_rollups(conn, self.scan_type, granularity, date_from, date_to, outlet)
+        except Exception as e:
+            self.logger.error(f"Rollup read error: {str(e)}")
+            self.logger.error(traceback.format_exc())
+            return []
+
     def get_daily_summary(self, limit=30):
         """Return per-day aggregated backup counts.
 
@@ -444,19 +602,23 @@ class BackupMonitor:
             if not conn:
                 return []
             with conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT
-                        ScanDate,
-                        COUNT(*) AS Total,
-                        SUM(CASE WHEN Status = 'Successful' THEN 1 ELSE 0 END) AS Successful,
-                        SUM(CASE WHEN Status != 'Successful' THEN 1 ELSE 0 END) AS Failed
-                    FROM [dbo].[D_Drive_Backup_Stat]
-                    GROUP BY ScanDate
-                    ORDER BY ScanDate DESC
-                    OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY
-                """, (limit,))
-                rows = cursor.fetchall()
+                # Maintained by save_backup_status; aggregate the history only
+                # until migration_add_daily_summary.sql has run
+                rows = read_daily_summary(conn, self.scan_type, limit)
+                if rows is None:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        SELECT
+                            ScanDate,
+                            COUNT(*) AS Total,
+                            SUM(CASE WHEN Status = 'Successful' THEN 1 ELSE 0 END) AS Successful,
+                            SUM(CASE WHEN Status != 'Successful' THEN 1 ELSE 0 END) AS Failed
+                        FROM [dbo].[D_Drive_Backup_Stat]
+                        GROUP BY ScanDate
+                        ORDER BY ScanDate DESC
+                        OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY
+                    """, (limit,))
+                    rows = cursor.fetchall()
                 return [
                     {
                         'scanDate': row[0].isoformat() if isinstance(row[0], date) else row[0],
@@ -0,0 +1,154 @@
+import pyodbc
+from datetime import datetime, timezone
+from app.services.daily_summary_service import apply_status_deltas
+from app.services.stats_snapshot import bump_stats_version
+
+# Column sizes of D_Drive_Backup_Stat / IB_Storage_Backup_Stat; values are
+# clipped so one oversized error message cannot fail the whole batch
+_MAX_LENGTHS = {
+    'OutletServer': 50,
+    'Status': 50,
+    'BackupFile': 255,
+    'BackupFileSize': 50,
+    'ErrorDetails': 500,
+    'DriveLetter': 10,
+}
+
+# Non-text columns and their SQL types; LastBackupTakenUtc repeats
+# LastBackupTaken as DATETIME2 for SQL-side date logic
+_SQL_TYPES = {
+    'LastBackupTaken': 'DATETIME',
+    'LastBackupTakenUtc': 'DATETIME2(3)',
+    'BackupFileSizeBytes': 'BIGINT',
+}
+_INPUT_SIZES = {
+    'LastBackupTaken': (pyodbc.SQL_TYPE_TIMESTAMP, 0, 0),
+    'LastBackupTakenUtc': (pyodbc.SQL_TYPE_TIMESTAMP, 23, 3),
+    'BackupFileSizeBytes': (pyodbc.SQL_BIGINT, 0, 0),
+}
+
+# Fields compared to decide whether an existing row changed (the backup time
+# is written but, as before, does not on its own trigger an update)
+_COMPARED = ('Status', 'BackupFile', 'BackupFileSize', 'BackupFileSizeBytes', 'ErrorDetails')
+
+
+def to_sql_datetime(value):
+    """Convert an ISO timestamp (or datetime) to a naive UTC datetime for SQL Server."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.replace(tzinfo=None)
+
+
+def _stage_value(column, row):
+    if column in ('LastBackupTaken', 'LastBackupTakenUtc'):
+        return to_sql_datetime(row.get('LastBackupTaken'))
+    if column == 'BackupFileSizeBytes':
+        value = row.get(column)
+        return int(value) if value is not None else None
+    return _clip(column, row.get(column))
+
+
+def _column_def(column):
+    # COLLATE DATABASE_DEFAULT: #temp columns otherwise take tempdb's collation
+    if column in _SQL_TYPES:
+        return f"{column} {_SQL_TYPES[column]} NULL"
+    return (f"{column} NVARCHAR({_MAX_LENGTHS[column]}) COLLATE DATABASE_DEFAULT "
+            f"{'NOT NULL PRIMARY KEY' if column == 'OutletServer' else 'NULL'}")
+
+
+def _differs(column):
+    blank = '-1' if column == 'BackupFileSizeBytes' else "''"
+    return f"ISNULL(t.{column}, {blank}) <> ISNULL(s.{column}, {blank})"
+
+
+def _clip(column, value):
+    if value is None:
+        return None
+    value = str(value)
+    limit = _MAX_LENGTHS[column]
+    return value if len(value) <= limit else value[:limit]
+
+
+def merge_backup_stats(conn, table, scan_date, rows, with_drive_letter=False, scan_type=None):
+    """Upsert one scan's results into a backup stats table in a single batch.
+
+    rows are dicts with OutletServer, Status, LastBackupTaken, BackupFile,
+    BackupFileSize, BackupFileSizeBytes, ErrorDetails (and DriveLetter when
+    with_drive_letter). LastBackupTaken (ISO string or datetime) is written
+    to both the legacy LastBackupTaken and the LastBackupTakenUtc column.
+    They are bulk-loaded into a #temp staging table with fast_executemany,
+    then applied with one MERGE keyed on (OutletServer, ScanDate):
+    - no row for the scan date              -> INSERT
+    - row exists and a compared field differs -> UPDATE
+    - row exists and nothing changed         -> left alone
+    With scan_type, the status transitions reported by the MERGE are applied
+    to Backup_Daily_Summary on the same cursor (apply_status_deltas), and
+    Stats_Version is bumped when any row changed.
+    The caller commits. Returns {'inserted', 'updated', 'unchanged'}.
+    """
+    columns = ['OutletServer', 'Status', 'LastBackupTaken', 'LastBackupTakenUtc',
+               'BackupFile', 'BackupFileSize', 'BackupFileSizeBytes', 'ErrorDetails']
+    compared = list(_COMPARED)
+    if with_drive_letter:
+        columns.append('DriveLetter')
+        compared.append('DriveLetter')
+
+    # One staged row per outlet; a later result for the same outlet wins
+    staged = {}
+    for row in rows:
+        staged[row['OutletServer']] = tuple(_stage_value(col, row) for col in columns)
+    if not staged:
+        return {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+    column_defs = ',\n'.join(_column_def(col) for col in columns)
+    input_sizes = [_INPUT_SIZES.get(col, (pyodbc.SQL_WVARCHAR, _MAX_LENGTHS.get(col), 0)) for col in columns]
+    changed = ' OR '.join(_differs(col) for col in compared)
+    value_columns = [col for col in columns if col != 'OutletServer']
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        IF OBJECT_ID('tempdb..#BackupStatStage') IS NOT NULL DROP TABLE #BackupStatStage;
+        CREATE TABLE #BackupStatStage ({column_defs});
+    """)
+    try:
+        cursor.fast_executemany = True
+        cursor.setinputsizes(input_sizes)
+        cursor.executemany(
+            f"INSERT INTO #BackupStatStage ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            list(staged.values())
+        )
+        # setinputsizes sticks to the cursor; clear it so the MERGE, the
+        # summary deltas and the version bump bind their own parameter types
+        cursor.fast_executemany = False
+        cursor.setinputsizes(None)
+
+        cursor.execute(f"""
+            MERGE [dbo].[{table}] WITH (HOLDLOCK) AS t
+            USING #BackupStatStage AS s
+                ON t.OutletServer = s.OutletServer AND t.ScanDate = ?
+            WHEN MATCHED AND ({changed}) THEN
+                UPDATE SET {', '.join(f'{col} = s.{col}' for col in value_columns)}, Duration = NULL
+            WHEN NOT MATCHED BY TARGET THEN
+                INSERT (OutletServer, ScanDate, Duration, {', '.join(value_columns)})
+                VALUES (s.OutletServer, ?, NULL, {', '.join(f's.{col}' for col in value_columns)})
+            OUTPUT $action, deleted.Status, inserted.Status;
+        """, (scan_date, scan_date))
+        transitions = [tuple(r) for r in cursor.fetchall()]
+        actions = [t[0] for t in transitions]
+        if scan_type:
+            apply_status_deltas(cursor, scan_type, scan_date, transitions)
+            if transitions:
+                bump_stats_version(cursor, [scan_type])
+    finally:
+        try:
+            cursor.execute("DROP TABLE #BackupStatStage")
+        except Exception:
+            pass  # already gone with a rolled-back transaction
+
+    inserted = actions.count('INSERT')
+    updated = actions.count('UPDATE')
+    return {'inserted': inserted, 'updated': updated, 'unchanged': len(staged) - inserted - updated}
@@ -0,0 +1,171 @@
+import pyodbc
+import traceback
+from datetime import date
+from app.config import Config
+from app.logging_config import get_combined_logger
+from app.services.backup_service import BackupMonitor
+from app.services.Ib_Storage_backup_service import IBStorageMonitor
+from app.services.smb_session_pool import get_session_pool
+
+
+class CombinedMonitor:
+    """Check D-drive and IBSTORAGE backups of an outlet in a single visit.
+
+    One reachability probe and one SMB session per outlet serve both checks,
+    instead of the two separate scans each doing their own probe and
+    session checkout. Results are written to both
+    D_Drive_Backup_Stat and IB_Storage_Backup_Stat.
+
+    A combined result looks like:
+        { outletCode, server, status, errorDetails,
+          dDrive: <BackupMonitor result>, ibStorage: <IBStorageMonitor result> }
+    where status is 'Successful' only if both checks succeeded.
+    """
+
+    scan_type = 'Combined'  # matches Scheduler_Status.ScanType
+
+    def __init__(self):
+        self.config = Config()
+        self.logger = get_combined_logger()
+        self.d_drive = BackupMonitor()
+        self.ib_storage = IBStorageMonitor()
+        self._scan_date = None
+
+    @property
+    def scan_date(self):
+        return self._scan_date
+
+    @scan_date.setter
+    def scan_date(self, value):
+        # None = today; date object = back-date scan
+        self._scan_date = value
+        self.d_drive.scan_date = value
+        self.ib_storage.scan_date = value
+
+    def log_error(self, message, severity="ERROR"):
+        if severity == "CRITICAL":
+            self.logger.critical(message)
+        else:
+            self.logger.error(message)
+
+    # ------------------------------------------------------------------
+    # Result helpers
+    # ------------------------------------------------------------------
+
+    def _combine(self, outlet, d_result, ib_result):
+        outlet_code, server_ip = outlet
+        success = d_result['status'] == 'Successful' and ib_result['status'] == 'Successful'
+        return {
+            'outletCode': outlet_code,
+            'server': server_ip,
+            'status': 'Successful' if success else 'Error',
+            'errorDetails': d_result.get('errorDetails') or ib_result.get('errorDetails'),
+            'dDrive': d_result,
+            'ibStorage': ib_result,
+        }
+
+    def new_result(self, outlet):
+        return self._combine(outlet, self.d_drive.new_result(outlet), self.ib_storage.new_result(outlet))
+
+    def error_result(self, outlet, details):
+        return self._combine(
+            outlet,
+            self.d_drive.error_result(outlet, details),
+            self.ib_storage.error_result(outlet, details)
+        )
+
+    # ------------------------------------------------------------------
+    # Server scanning
+    # ------------------------------------------------------------------
+
+    def check_server(self, outlet):
+        """Probe the outlet once and run both checks (blocking, no scan engine)."""
+        if not self.d_drive.ping_with_retry(outlet[1]):
+            self.logger.error(f"[Combined] Ping failed for {outlet[1]}")
+            return self.error_result(outlet, 'Server not Reachable')
+        return self.check_share(outlet)
+
+    def check_share(self, outlet):
+        """Run the D-drive and IBSTORAGE checks over one SMB session."""
+        server_ip = outlet[1]
+        try:
+            with get_session_pool().session(
+                server_ip,
+                username=self.config.SHARE_USERNAME,
+                password=self.config.SHARE_PASSWORD
+            ):
+                d_result = self.d_drive.inspect_share(outlet)
+                ib_result = self.ib_storage.inspect_share(outlet)
+                return self._combine(outlet, d_result, ib_result)
+        except Exception as e:
+            return self._combine(
+                outlet,
+                self.d_drive.exception_result(outlet, e),
+                self.ib_storage.exception_result(outlet, e)
+            )
+
+    # ------------------------------------------------------------------
+    # Database operations
+    # ------------------------------------------------------------------
+
+    def save_backup_status(self, results):
+        """Write the D-drive half to D_Drive_Backup_Stat and the IBSTORAGE half to IB_Storage_Backup_Stat.
+
+        Both halves are merged on one connection and committed together, so
+        a batch is saved completely or not at all. Returns None, like the
+        single-type monitors, when it could not be saved, so ResultBatcher
+        counts the batch as a save failure.
+        """
+        results = list(results)
+        try:
+            conn = self.d_drive.get_db_connection()
+            if not conn:
+                self.logger.error("[Combined] Failed to get DB connection for saving status")
+                return None
+
+            with conn:
+                counts = {
+                    'dDrive': self.d_drive.merge_backup_status(conn, [r['dDrive'] for r in results]),
+                    'ibStorage': self.ib_storage.merge_backup_status(conn, [r['ibStorage'] for r in results]),
+                }
+                conn.commit()
+            return counts
+        except Exception as e:
+            self.logger.error(f"[Combined] Database Persistence Error: {str(e)}")
+            self.logger.error(traceback.format_exc())
+            return None
+
+    def refresh_rollups(self):
+        self.d_drive.refresh_rollups()
+        self.ib_storage.refresh_rollups()
+
+    def get_unscanned_outlets(self):
+        """Active outlets missing a record for the scan date in either stats table."""
+        try:
+            conn = self.d_drive.get_db_connection()
+            if not conn:
+                return []
+            with conn:
+                cursor = conn.cursor()
+                today = self.scan_date if self.scan_date else date.today()
+                cursor.execute("""
+                    SELECT o.OutletCode, o.IPAddress
+                    FROM Outlets o
+                    WHERE o.ActiveDepot = 'Y'
+                    AND (
+                        NOT EXISTS (
+                            SELECT 1 FROM D_Drive_Backup_Stat b
+                            WHERE b.OutletServer = o.OutletCode AND b.ScanDate = ?
+                        )
+                        OR NOT EXISTS (
+                            SELECT 1 FROM IB_Storage_Backup_Stat b
+                            WHERE b.OutletServer = o.OutletCode AND b.ScanDate = ?
+                        )
+                    )
+                """, (today, today))
+                outlets = cursor.fetchall()
+                self.logger.info(f"[Combined] Unscanned outlets for {today}: {len(outlets)} found")
+                return outlets
+        except pyodbc.Error as e:
+            self.logger.error(f"[Combined] Database Error fetching unscanned outlets: {str(e)}")
+            return []
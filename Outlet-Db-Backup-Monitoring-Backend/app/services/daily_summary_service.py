@@ -0,0 +1,113 @@
+import pyodbc
+from app.db_pool import get_local_connection
+
+# Backup_Daily_Summary.ScanType -> stats table it summarizes
+SUMMARY_TABLES = {
+    'D_Drive': 'D_Drive_Backup_Stat',
+    'IB_Storage': 'IB_Storage_Backup_Stat',
+}
+
+
+def _bucket(status):
+    """Summary column a stats row counts towards (None counts as neither, like the old GROUP BY)."""
+    if status is None:
+        return None
+    return 'successful' if status == 'Successful' else 'failed'
+
+
+def apply_status_deltas(cursor, scan_type, scan_date, transitions):
+    """Fold stats-table changes into Backup_Daily_Summary without recounting.
+
+    transitions are (action, old_status, new_status) tuples from a MERGE
+    OUTPUT clause (old_status is NULL for inserts): an INSERT adds a row to
+    the day's total, an UPDATE moves it between Successful and Failed when
+    its status changed. Runs on the caller's cursor, so the summary commits
+    (or rolls back) together with the stats rows. No-op until
+    migration_add_daily_summary.sql has run.
+    """
+    delta = {'total': 0, 'successful': 0, 'failed': 0}
+    for action, old_status, new_status in transitions:
+        old_bucket = _bucket(old_status)
+        new_bucket = _bucket(new_status)
+        if action == 'INSERT':
+            delta['total'] += 1
+        if old_bucket != new_bucket:
+            if old_bucket:
+                delta[old_bucket] -= 1
+            if new_bucket:
+                delta[new_bucket] += 1
+
+    if not any(delta.values()):
+        return delta
+
+    cursor.execute("""
+        IF OBJECT_ID('dbo.Backup_Daily_Summary') IS NOT NULL
+        MERGE [dbo].[Backup_Daily_Summary] WITH (HOLDLOCK) AS t
+        USING (SELECT ? AS ScanType, ? AS ScanDate) AS s
+            ON t.ScanType = s.ScanType AND t.ScanDate = s.ScanDate
+        WHEN MATCHED THEN
+            UPDATE SET Total = t.Total + ?, Successful = t.Successful + ?, Failed = t.Failed + ?,
+                       UpdatedAt = GETDATE()
+        WHEN NOT MATCHED THEN
+            INSERT (ScanType, ScanDate, Total, Successful, Failed, UpdatedAt)
+            VALUES (s.ScanType, s.ScanDate, ?, ?, ?, GETDATE());
+    """, (
+        scan_type, scan_date,
+        delta['total'], delta['successful'], delta['failed'],
+        delta['total'], delta['successful'], delta['failed'],
+    ))
+    return delta
+
+
+def read_daily_summary(conn, scan_type, limit):
+    """Latest `limit` days for scan_type as (ScanDate, Total, Successful, Failed) rows.
+
+    A primary-key range read; returns None when Backup_Daily_Summary does not
+    exist yet, so the caller can fall back to aggregating the stats table.
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT TOP (?) ScanDate, Total, Successful, Failed
+            FROM [dbo].[Backup_Daily_Summary]
+            WHERE ScanType = ?
+            ORDER BY ScanDate DESC
+        """, (limit, scan_type))
+        return cursor.fetchall()
+    except pyodbc.Error:
+        return None
+
+
+def rebuild_daily_summary(scan_types=None, logger=None):
+    """Recompute Backup_Daily_Summary from the stats tables.
+
+    Each scan type is rebuilt in its own transaction. The stats table is
+    share-locked first (the same order saves take their locks in), so no save
+    can slip in between the recount and the commit.
+    Returns {scan_type: days written}.
+    """
+    scan_types = scan_types or list(SUMMARY_TABLES)
+    rebuilt = {}
+    for scan_type in scan_types:
+        table = SUMMARY_TABLES[scan_type]
+        conn = get_local_connection()
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM [dbo].[{table}] WITH (TABLOCK, HOLDLOCK)")
+            cursor.fetchone()
+            cursor.execute("DELETE FROM [dbo].[Backup_Daily_Summary] WHERE ScanType = ?", (scan_type,))
+            cursor.execute(f"""
+                INSERT INTO [dbo].[Backup_Daily_Summary] (ScanType, ScanDate, Total, Successful, Failed, UpdatedAt)
+                SELECT ?, ScanDate,
+                       COUNT(*),
+                       SUM(CASE WHEN Status = 'Successful' THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN Status != 'Successful' THEN 1 ELSE 0 END),
+                       GETDATE()
+                FROM [dbo].[{table}]
+                GROUP BY ScanDate
+            """, (scan_type,))
+            rebuilt[scan_type] = cursor.rowcount
+            conn.commit()
+        if logger:
+            logger.info(f"Backup_Daily_Summary rebuilt for {scan_type}: {rebuilt[scan_type]} days")
+    return rebuilt
@@ -0,0 +1,122 @@
+import threading
+import pyodbc
+from app.config import Config
+from app.db_pool import get_local_connection
+from app.logging_config import get_ib_storage_logger
+
+
+def format_dialect(dialect):
+    """Render an SMB dialect code (e.g. 0x0311) as '3.1.1'."""
+    if not dialect:
+        return None
+    return f"{(dialect >> 8) & 0xF}.{(dialect >> 4) & 0xF}.{dialect & 0xF}"
+
+
+class HostProfileStore:
+    """Per-outlet SMB capability profile, persisted in Outlet_Host_Profile.
+
+    Remembers where IBSTORAGE was last found on each outlet (drive letter and
+    folder on that share) and the SMB dialect negotiated, so a scan can go
+    straight to the known path and only falls back to probing every candidate
+    drive on a miss. Profiles are loaded once per store and written back only when they
+    change.
+
+    A profile is dropped when its cached path fails, or when OutletSyncService
+    sees the outlet's IP address change (forget_outlets).
+    """
+
+    def __init__(self):
+        self.config = Config()
+        self.logger = get_ib_storage_logger()
+        self._lock = threading.Lock()
+        self._profiles = None
+        self.available = True
+
+    def get_db_connection(self):
+        return get_local_connection()
+
+    def _load(self):
+        """Load every profile on first use (caller holds _lock)."""
+        if self._profiles is not None:
+            return
+        self._profiles = {}
+        try:
+            conn = self.get_db_connection()
+            with conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT OutletCode, IBStorageDrive, IBStoragePath, SMBDialect FROM [dbo].[Outlet_Host_Profile]"
+                )
+                for row in cursor.fetchall():
+                    self._profiles[row[0]] = {
+                        'drive': row[1],
+                        'path': row[2],
+                        'dialect': row[3],
+                    }
+            self.logger.info(f"[IB] Loaded {len(self._profiles)} host profiles")
+        except pyodbc.Error as e:
+            # Missing table (migration not run) or DB trouble: scan without the cache
+            self.available = False
+            self.logger.warning(f"[IB] Host profiles unavailable, probing every drive: {e}")
+
+    def get(self, outlet_code):
+        with self._lock:
+            self._load()
+            profile = self._profiles.get(outlet_code)
+            return dict(profile) if profile else None
+
+    def record(self, outlet_code, drive, path, dialect=None):
+        """Remember where IBSTORAGE was found for an outlet (no-op if unchanged)."""
+        profile = {'drive': drive, 'path': path, 'dialect': format_dialect(dialect)}
+        with self._lock:
+            self._load()
+            if self._profiles.get(outlet_code) == profile:
+                return
+            self._profiles[outlet_code] = profile
+            if not self.available:
+                return
+        try:
+            conn = self.get_db_connection()
+            with conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    MERGE [dbo].[Outlet_Host_Profile] AS t
+                    USING (SELECT ? AS OutletCode) AS s ON t.OutletCode = s.OutletCode
+                    WHEN MATCHED THEN
+                        UPDATE SET IBStorageDrive = ?, IBStoragePath = ?, SMBDialect = ?, UpdatedAt = GETDATE()
+                    WHEN NOT MATCHED THEN
+                        INSERT (OutletCode, IBStorageDrive, IBStoragePath, SMBDialect, UpdatedAt)
+                        VALUES (?, ?, ?, ?, GETDATE());
+                """, (outlet_code, drive, path, profile['dialect'],
+                      outlet_code, drive, path, profile['dialect']))
+                conn.commit()
+        except pyodbc.Error as e:
+            self.logger.warning(f"[IB] Could not save host profile for {outlet_code}: {e}")
+
+    def invalidate(self, outlet_code):
+        """Forget the profile of one outlet (its cached path failed)."""
+        with self._lock:
+            if self._profiles is not None:
+                self._profiles.pop(outlet_code, None)
+            if not self.available:
+                return
+        forget_outlets([outlet_code], logger=self.logger)
+
+
+def forget_outlets(outlet_codes, logger=None):
+    """Delete persisted host profiles, e.g. after an outlet's IP address changed."""
+    if not outlet_codes:
+        return
+    logger = logger or get_ib_storage_logger()
+    store = HostProfileStore()
+    try:
+        conn = store.get_db_connection()
+        with conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "DELETE FROM [dbo].[Outlet_Host_Profile] WHERE OutletCode = ?",
+                [(code,) for code in outlet_codes]
+            )
+            conn.commit()
+    except pyodbc.Error as e:
+        logger.warning(f"[IB] Could not clear host profiles for {outlet_codes}: {e}")
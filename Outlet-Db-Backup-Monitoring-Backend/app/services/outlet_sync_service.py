@@ -1,6 +1,12 @@
+import time
+from datetime import datetime
 import pyodbc
 from app.config import Config
+from app.db_pool import app_lock, get_central_connection, get_local_connection
 from app.logging_config import get_d_drive_logger
+from app.services.host_profile_service import forget_outlets
+from app.services.smb_session_pool import get_session_pool
+from app.services.stats_snapshot import SNAPSHOT_SCAN_TYPES, bump_stats_version
 
 
 class OutletSyncService:
@@ -20,27 +26,11 @@ class OutletSyncService:
 
     def _get_central_connection(self):
         """Connect to the central EPSMirror database (read-only)."""
-        conn_str = (
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER={self.config.CENTRAL_DB_SERVER};"
-            f"DATABASE={self.config.CENTRAL_DB_DATABASE};"
-            f"UID={self.config.CENTRAL_DB_USERNAME};"
-            f"PWD={self.config.CENTRAL_DB_PASSWORD};"
-            "Encrypt=no;TrustServerCertificate=yes;"
-        )
-        return pyodbc.connect(conn_str)
+        return get_central_connection()
 
     def _get_local_connection(self):
         """Connect to the local DBBAK database."""
-        conn_str = (
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER={self.config.DB_SERVER};"
-            f"DATABASE={self.config.DB_DATABASE};"
-            f"UID={self.config.DB_USERNAME};"
-            f"PWD={self.config.DB_PASSWORD};"
-            "Encrypt=no;TrustServerCertificate=yes;"
-        )
-        return pyodbc.connect(conn_str)
+        return get_local_connection()
 
     # ------------------------------------------------------------------
     # Fetch helpers
@@ -68,105 +58,252 @@ class OutletSyncService:
             for row in rows
         }
 
-    def _fetch_local_outlets(self, conn):
-        """Fetch all outlets from the local Outlets table."""
+    def _fetch_central_fingerprint(self, conn):
+        """Row count + CHECKSUM_AGG of the central outlet rows (one cheap aggregate query)."""
         cursor = conn.cursor()
-        cursor.execute("SELECT OutletCode, IPAddress, OutletName, ActiveDepot FROM Outlets")
-        rows = cursor.fetchall()
-        return {
-            row[0]: {
-                'OutletCode': row[0],
-                'IPAddress': row[1],
-                'OutletName': row[2],
-                'ActiveDepot': row[3],
-            }
-            for row in rows
-        }
+        cursor.execute("""
+            SELECT COUNT_BIG(*),
+                   CHECKSUM_AGG(CHECKSUM(D.DepotCode, DI.IPAddress, D.DepotName, D.ActiveDepot))
+            FROM Depot D
+            INNER JOIN DepotIP DI ON D.DepotCode = DI.DepotCode
+        """)
+        row = cursor.fetchone()
+        return (int(row[0]), row[1])
+
+    def _load_last_fingerprint(self, conn):
+        """Fingerprint stored by the last successful sync, or None."""
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT CentralRowCount, CentralChecksum FROM [dbo].[Outlet_Sync_State] WHERE Id = 1")
+            row = cursor.fetchone()
+            return (int(row[0]), row[1]) if row else None
+        except pyodbc.Error as e:
+            self.logger.warning(f"Outlet sync state unavailable, running full sync: {e}")
+            return None
+
+    def _save_fingerprint(self, cursor, fingerprint):
+        cursor.execute("""
+            IF OBJECT_ID('dbo.Outlet_Sync_State') IS NOT NULL
+            MERGE [dbo].[Outlet_Sync_State] AS t
+            USING (SELECT 1 AS Id) AS s ON t.Id = s.Id
+            WHEN MATCHED THEN
+                UPDATE SET CentralRowCount = ?, CentralChecksum = ?, LastSyncedAt = GETDATE()
+            WHEN NOT MATCHED THEN
+                INSERT (Id, CentralRowCount, CentralChecksum, LastSyncedAt) VALUES (1, ?, ?, GETDATE());
+        """, (fingerprint[0], fingerprint[1], fingerprint[0], fingerprint[1]))
+
+    def _merge_outlets(self, cursor, central_outlets):
+        """Reconcile Outlets with the central snapshot in one MERGE.
+
+        Returns the MERGE OUTPUT rows:
+        (action, source OutletCode, OutletCode, old IPAddress, new IPAddress).
+        """
+        cursor.execute("""
+            IF OBJECT_ID('tempdb..#OutletSyncStage') IS NOT NULL DROP TABLE #OutletSyncStage;
+            CREATE TABLE #OutletSyncStage (
+                OutletCode  NVARCHAR(50)  COLLATE DATABASE_DEFAULT NOT NULL PRIMARY KEY,
+                IPAddress   NVARCHAR(50)  COLLATE DATABASE_DEFAULT NULL,
+                OutletName  NVARCHAR(255) COLLATE DATABASE_DEFAULT NULL,
+                ActiveDepot NVARCHAR(10)  COLLATE DATABASE_DEFAULT NULL
+            );
+        """)
+        try:
+            if central_outlets:
+                cursor.fast_executemany = True
+                cursor.executemany(
+                    "INSERT INTO #OutletSyncStage (OutletCode, IPAddress, OutletName, ActiveDepot) VALUES (?, ?, ?, ?)",
+                    [
+                        (o['OutletCode'], o['IPAddress'], o['OutletName'], o['ActiveDepot'])
+                        for o in central_outlets.values()
+                    ]
+                )
+                cursor.fast_executemany = False
+
+            # EXCEPT gives a NULL-safe "any column differs" test
+            cursor.execute("""
+                MERGE [dbo].[Outlets] WITH (HOLDLOCK) AS t
+                USING #OutletSyncStage AS s ON t.OutletCode = s.OutletCode
+                WHEN MATCHED AND EXISTS (
+                    SELECT t.IPAddress, t.OutletName, t.ActiveDepot
+                    EXCEPT
+                    SELECT s.IPAddress, s.OutletName, s.ActiveDepot
+                ) THEN
+                    UPDATE SET IPAddress = s.IPAddress, OutletName = s.OutletName, ActiveDepot = s.ActiveDepot
+                WHEN NOT MATCHED BY TARGET THEN
+                    INSERT (OutletCode, IPAddress, OutletName, ActiveDepot)
+                    VALUES (s.OutletCode, s.IPAddress, s.OutletName, s.ActiveDepot)
+                WHEN NOT MATCHED BY SOURCE AND t.ActiveDepot = 'Y' THEN
+                    UPDATE SET ActiveDepot = 'N'
+                OUTPUT $action, s.OutletCode, inserted.OutletCode, deleted.IPAddress, inserted.IPAddress;
+            """)
+            return cursor.fetchall()
+        finally:
+            try:
+                cursor.execute("DROP TABLE #OutletSyncStage")
+            except Exception:
+                pass  # already gone with a rolled-back transaction
+
+    # ------------------------------------------------------------------
+    # Watermark, lock and history
+    # ------------------------------------------------------------------
+
+    def _watermark_age_seconds(self, conn):
+        """Seconds since the last completed sync (DB clock), or None if unknown."""
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT DATEDIFF(second, LastCheckedAt, GETDATE()) FROM [dbo].[Outlet_Sync_State] WHERE Id = 1"
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+        except pyodbc.Error as e:
+            self.logger.warning(f"Outlet sync watermark unavailable: {e}")
+            return None
+
+    def _touch_watermark(self, cursor):
+        # Dynamic SQL so the batch still compiles before the history migration has run
+        cursor.execute("""
+            IF COL_LENGTH('dbo.Outlet_Sync_State', 'LastCheckedAt') IS NOT NULL
+                EXEC('UPDATE [dbo].[Outlet_Sync_State] SET LastCheckedAt = GETDATE() WHERE Id = 1');
+        """)
+
+    def _record_history(self, cursor, trigger, started_at, started, status,
+                        central_rows=None, counts=None, error=None):
+        counts = counts or {}
+        cursor.execute("""
+            IF OBJECT_ID('dbo.Outlet_Sync_History') IS NOT NULL
+            INSERT INTO [dbo].[Outlet_Sync_History]
+                (StartedAt, DurationMs, TriggeredBy, Status, CentralRows, Inserted, Updated, Deactivated, ErrorMessage)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            started_at, int((time.monotonic() - started) * 1000), trigger, status, central_rows,
+            counts.get('inserted', 0), counts.get('updated', 0), counts.get('deactivated', 0),
+            error[:500] if error else None,
+        ))
+
+    def _record_failure(self, trigger, started_at, started, error):
+        """Log a failed run on its own connection (the sync transaction is rolled back)."""
+        try:
+            conn = self._get_local_connection()
+            with conn:
+                self._record_history(conn.cursor(), trigger, started_at, started, 'Failed', error=error)
+                conn.commit()
+        except pyodbc.Error as e:
+            self.logger.warning(f"Could not record outlet sync history: {e}")
 
     # ------------------------------------------------------------------
     # Main sync
     # ------------------------------------------------------------------
 
-    def sync_outlets(self):
+    def sync_outlets(self, force=False, trigger='manual', max_age_minutes=None):
         """Sync outlets from central to local.
 
-        Returns a dict with counts: { inserted, updated, deactivated }
-        or None if the sync could not run (e.g. central unreachable).
+        The central rows are fingerprinted first (row count + CHECKSUM_AGG);
+        if the fingerprint matches the last successful sync nothing is
+        fetched or written. Otherwise the central snapshot is bulk-loaded
+        into a staging table and applied with a single MERGE. force=True
+        skips the fingerprint check.
+
+        Runs under an application lock, so only one worker syncs at a time;
+        a sync that finds the lock taken is skipped. With max_age_minutes the
+        watermark is re-checked under the lock and a sync completed that
+        recently by someone else is not repeated. Every run that reaches
+        central is logged in Outlet_Sync_History.
+
+        Returns a dict with counts: { inserted, updated, deactivated, skipped }
+        or None if no sync ran (e.g. central unreachable, already running).
         """
         if not self.config.CENTRAL_DB_SERVER:
             self.logger.warning("Central DB not configured — skipping outlet sync")
             return None
 
-        try:
-            central_conn = self._get_central_connection()
-        except Exception as e:
-            self.logger.error(f"Cannot connect to central server: {e}")
-            return None
-
-        try:
-            central_outlets = self._fetch_central_outlets(central_conn)
-            self.logger.info(f"Fetched {len(central_outlets)} outlets from central server")
-        except Exception as e:
-            self.logger.error(f"Error fetching central outlets: {e}")
-            central_conn.close()
-            return None
-        finally:
-            central_conn.close()
-
+        started_at = datetime.now()
+        started = time.monotonic()
         try:
             local_conn = self._get_local_connection()
         except Exception as e:
             self.logger.error(f"Cannot connect to local DB for sync: {e}")
             return None
 
-        inserted = 0
-        updated = 0
-        deactivated = 0
-
         try:
-            local_outlets = self._fetch_local_outlets(local_conn)
             cursor = local_conn.cursor()
+            with app_lock(local_conn, 'OutletSync') as locked:
+                if not locked:
+                    self.logger.info("Outlet sync already running in another worker — skipping")
+                    return None
+                if max_age_minutes is not None:
+                    age = self._watermark_age_seconds(local_conn)
+                    if age is not None and age < max_age_minutes * 60:
+                        self.logger.info(f"Outlet sync skipped — last sync {age}s ago")
+                        return None
 
-            # 1. Insert new outlets & update changed outlets
-            for code, central in central_outlets.items():
-                local = local_outlets.get(code)
+                try:
+                    central_conn = self._get_central_connection()
+                except Exception as e:
+                    self.logger.error(f"Cannot connect to central server: {e}")
+                    self._record_failure(trigger, started_at, started, f"Cannot connect to central server: {e}")
+                    return None
 
-                if not local:
-                    # New outlet — INSERT
-                    cursor.execute(
-                        "INSERT INTO Outlets (OutletCode, IPAddress, OutletName, ActiveDepot) VALUES (?, ?, ?, ?)",
-                        (central['OutletCode'], central['IPAddress'], central['OutletName'], central['ActiveDepot'])
-                    )
-                    inserted += 1
-                elif (local['IPAddress'] != central['IPAddress'] or
-                      local['OutletName'] != central['OutletName'] or
-                      local['ActiveDepot'] != central['ActiveDepot']):
-                    # Changed — UPDATE
-                    cursor.execute(
-                        "UPDATE Outlets SET IPAddress = ?, OutletName = ?, ActiveDepot = ? WHERE OutletCode = ?",
-                        (central['IPAddress'], central['OutletName'], central['ActiveDepot'], code)
-                    )
-                    updated += 1
-
-            # 2. Deactivate local outlets that no longer exist in central
-            for code, local in local_outlets.items():
-                if local['ActiveDepot'] == 'Y' and code not in central_outlets:
-                    cursor.execute(
-                        "UPDATE Outlets SET ActiveDepot = 'N' WHERE OutletCode = ?",
-                        (code,)
-                    )
-                    deactivated += 1
+                try:
+                    fingerprint = self._fetch_central_fingerprint(central_conn)
+                    if not force and fingerprint == self._load_last_fingerprint(local_conn):
+                        self._touch_watermark(cursor)
+                        self._record_history(cursor, trigger, started_at, started, 'Unchanged',
+                                             central_rows=fingerprint[0])
+                        local_conn.commit()
+                        self.logger.info("Outlet sync skipped — central outlets unchanged since last sync")
+                        return {'inserted': 0, 'updated': 0, 'deactivated': 0, 'skipped': True}
 
-            local_conn.commit()
+                    central_outlets = self._fetch_central_outlets(central_conn)
+                    self.logger.info(f"Fetched {len(central_outlets)} outlets from central server")
+                except Exception as e:
+                    self.logger.error(f"Error fetching central outlets: {e}")
+                    local_conn.rollback()
+                    self._record_failure(trigger, started_at, started, f"Error fetching central outlets: {e}")
+                    return None
+                finally:
+                    central_conn.close()
 
-            if inserted or updated or deactivated:
-                self.logger.info(
-                    f"Outlet sync complete — inserted: {inserted}, updated: {updated}, deactivated: {deactivated}"
-                )
-            else:
-                self.logger.info("Outlet sync complete — no changes detected")
+                changes = self._merge_outlets(cursor, central_outlets)
 
-            return {'inserted': inserted, 'updated': updated, 'deactivated': deactivated}
+                inserted = updated = deactivated = 0
+                moved_ips = []
+                moved_codes = []
+                for action, source_code, code, old_ip, new_ip in changes:
+                    if action == 'INSERT':
+                        inserted += 1
+                    elif source_code is None:
+                        deactivated += 1  # no longer in central
+                    else:
+                        updated += 1
+                        if old_ip != new_ip:
+                            moved_ips.append(old_ip)
+                            moved_codes.append(code)
+                counts = {'inserted': inserted, 'updated': updated, 'deactivated': deactivated}
+
+                if moved_codes:
+                    # The latest-stats snapshots show each outlet's IP address
+                    bump_stats_version(cursor, SNAPSHOT_SCAN_TYPES)
+                self._save_fingerprint(cursor, fingerprint)
+                self._touch_watermark(cursor)
+                self._record_history(cursor, trigger, started_at, started, 'Applied',
+                                     central_rows=len(central_outlets), counts=counts)
+                local_conn.commit()
+
+                # Pooled SMB sessions and host profiles of an outlet's old address are no longer valid
+                session_pool = get_session_pool()
+                for ip in moved_ips:
+                    session_pool.invalidate(ip)
+                forget_outlets(moved_codes, logger=self.logger)
+
+                if inserted or updated or deactivated:
+                    self.logger.info(
+                        f"Outlet sync complete — inserted: {inserted}, updated: {updated}, deactivated: {deactivated}"
+                    )
+                else:
+                    self.logger.info("Outlet sync complete — no changes detected")
+
+                return {**counts, 'skipped': False}
 
         except Exception as e:
             self.logger.error(f"Outlet sync error: {e}")
@@ -174,6 +311,67 @@ class OutletSyncService:
                 local_conn.rollback()
             except Exception:
                 pass
+            self._record_failure(trigger, started_at, started, f"Outlet sync error: {e}")
             return None
         finally:
             local_conn.close()
+
+    def sync_if_stale(self, trigger='on_demand', max_age_minutes=None):
+        """Sync only when the watermark is older than max_age_minutes (default OUTLET_SYNC_TTL_MINUTES).
+
+        Scans call this instead of sync_outlets(): normally the scheduled job
+        keeps Outlets fresh and this returns None after one cheap query.
+        """
+        if max_age_minutes is None:
+            max_age_minutes = self.config.OUTLET_SYNC_TTL_MINUTES
+        try:
+            conn = self._get_local_connection()
+        except Exception as e:
+            self.logger.error(f"Cannot connect to local DB for sync: {e}")
+            return None
+        try:
+            age = self._watermark_age_seconds(conn)
+        finally:
+            conn.close()
+        if age is not None and age < max_age_minutes * 60:
+            return None
+        return self.sync_outlets(trigger=trigger, max_age_minutes=max_age_minutes)
+
+    def get_sync_status(self):
+        """Watermark and most recent history row, for the scheduler status API."""
+        status = {
+            'ttlMinutes': self.config.OUTLET_SYNC_TTL_MINUTES,
+            'lastSyncedAt': None,
+            'lastCheckedAt': None,
+            'lastRun': None,
+        }
+        try:
+            conn = self._get_local_connection()
+            with conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT LastSyncedAt, LastCheckedAt FROM [dbo].[Outlet_Sync_State] WHERE Id = 1")
+                row = cursor.fetchone()
+                if row:
+                    status['lastSyncedAt'] = row[0].isoformat() if row[0] else None
+                    status['lastCheckedAt'] = row[1].isoformat() if row[1] else None
+                cursor.execute(
+                    "SELECT TOP 1 StartedAt, DurationMs, TriggeredBy, Status, CentralRows, "
+                    "Inserted, Updated, Deactivated, ErrorMessage "
+                    "FROM [dbo].[Outlet_Sync_History] ORDER BY StartedAt DESC"
+                )
+                row = cursor.fetchone()
+                if row:
+                    status['lastRun'] = {
+                        'startedAt': row[0].isoformat() if row[0] else None,
+                        'durationMs': row[1],
+                        'trigger': row[2],
+                        'status': row[3],
+                        'centralRows': row[4],
+                        'inserted': row[5],
+                        'updated': row[6],
+                        'deactivated': row[7],
+                        'errorMessage': row[8],
+                    }
+        except pyodbc.Error as e:
+            self.logger.warning(f"Outlet sync status unavailable: {e}")
+        return status
@@ -0,0 +1,179 @@
+import errno
+import heapq
+import itertools
+import selectors
+import socket
+import threading
+import time
+
+# connect_ex() codes that mean "connection in progress" on a non-blocking socket
+# (10035 = WSAEWOULDBLOCK on Windows)
+_IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN, errno.EALREADY, 10035}
+
+
+class StageStats:
+    """Queue depth and throughput counters for one scan pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.peak_queued = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def enqueue(self, count=1):
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = time.monotonic()
+            self.queued += count
+            self.peak_queued = max(self.peak_queued, self.queued)
+
+    def start(self):
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+
+    def retry(self):
+        """An in-flight item went back to the queue (e.g. probe retry)."""
+        with self._lock:
+            self.in_flight -= 1
+            self.queued += 1
+
+    def done(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def finish(self):
+        with self._lock:
+            self.finished_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = 0.0
+            if self.started_at is not None:
+                elapsed = (self.finished_at or time.monotonic()) - self.started_at
+            return {
+                'stage': self.name,
+                'queued': self.queued,
+                'inFlight': self.in_flight,
+                'completed': self.completed,
+                'peakQueued': self.peak_queued,
+                'elapsedSeconds': round(elapsed, 2),
+                'throughputPerSecond': round(self.completed / elapsed, 2) if elapsed > 0 else 0.0,
+            }
+
+
+class PortSweeper:
+    """Sweep one TCP port across many hosts with non-blocking sockets and a single selector.
+
+    Up to max_open connects are outstanding at once; each gets `timeout`
+    seconds to complete and failed hosts are retried after `retry_delay`
+    seconds, up to `attempts` tries in total (same policy as ping_with_retry).
+    Results are reported through callbacks as soon as each host is decided,
+    so a downstream stage can start before the sweep finishes.
+    """
+
+    def __init__(self, port, timeout, attempts, retry_delay, max_open, stats=None):
+        self.port = port
+        self.timeout = timeout
+        self.attempts = max(1, attempts)
+        self.retry_delay = retry_delay
+        self.max_open = max(1, max_open)
+        self.stats = stats or StageStats('probe')
+
+    def sweep(self, targets, on_reachable, on_unreachable, stop_event=None):
+        """Probe every (item, host) in targets; call on_reachable(item) / on_unreachable(item)."""
+        seq = itertools.count()
+        # (not_before, seq, item, host, attempt)
+        waiting = [(0.0, next(seq), item, host, 0) for item, host in targets]
+        heapq.heapify(waiting)
+        self.stats.enqueue(len(waiting))
+
+        selector = selectors.DefaultSelector()
+        open_socks = {}  # sock -> (item, host, attempt, deadline)
+
+        def failed(item, host, attempt):
+            if attempt + 1 < self.attempts:
+                self.stats.retry()
+                heapq.heappush(waiting, (time.monotonic() + self.retry_delay, next(seq), item, host, attempt + 1))
+            else:
+                self.stats.done()
+                on_unreachable(item)
+
+        def close(sock):
+            try:
+                selector.unregister(sock)
+            except (KeyError, ValueError):
+                pass
+            sock.close()
+
+        try:
+            while waiting or open_socks:
+                if stop_event is not None and stop_event.is_set():
+                    break
+
+                now = time.monotonic()
+
+                # Open new connects while we have capacity
+                while waiting and len(open_socks) < self.max_open and waiting[0][0] <= now:
+                    _, _, item, host, attempt = heapq.heappop(waiting)
+                    self.stats.start()
+                    sock = None
+                    try:
+                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                        sock.setblocking(False)
+                        err = sock.connect_ex((host, self.port))
+                    except Exception:
+                        if sock is not None:
+                            sock.close()
+                        failed(item, host, attempt)
+                        continue
+                    if err == 0:
+                        sock.close()
+                        self.stats.done()
+                        on_reachable(item)
+                    elif err in _IN_PROGRESS:
+                        selector.register(sock, selectors.EVENT_WRITE)
+                        open_socks[sock] = (item, host, attempt, now + self.timeout)
+                    else:
+                        sock.close()
+                        failed(item, host, attempt)
+
+                # Sleep until a socket is ready, the next deadline expires,
+                # or the next retry becomes due
+                wake_at = [deadline for _, _, _, deadline in open_socks.values()]
+                if waiting and len(open_socks) < self.max_open:
+                    wake_at.append(waiting[0][0])
+                wait = max(0.0, min(wake_at) - time.monotonic()) if wake_at else 0.0
+
+                if open_socks:
+                    events = selector.select(timeout=min(wait, 1.0))
+                else:
+                    time.sleep(min(wait, 1.0))
+                    events = []
+
+                for key, _ in events:
+                    sock = key.fileobj
+                    item, host, attempt, _ = open_socks.pop(sock)
+                    err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    close(sock)
+                    if err == 0:
+                        self.stats.done()
+                        on_reachable(item)
+                    else:
+                        failed(item, host, attempt)
+
+                now = time.monotonic()
+                for sock in [s for s, (_, _, _, deadline) in open_socks.items() if deadline <= now]:
+                    item, host, attempt, _ = open_socks.pop(sock)
+                    close(sock)
+                    failed(item, host, attempt)
+        finally:
+            for sock in list(open_socks):
+                close(sock)
+            selector.close()
+            self.stats.finish()
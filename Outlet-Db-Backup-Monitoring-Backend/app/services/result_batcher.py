@@ -0,0 +1,117 @@
+import threading
+import time
+from app.config import Config
+from app.services.stats_stream import get_event_hub
+
+
+def _accumulate(totals, counts):
+    """Add save_backup_status counts (possibly nested, e.g. combined scans) into totals."""
+    for key, value in counts.items():
+        if isinstance(value, dict):
+            _accumulate(totals.setdefault(key, {}), value)
+        elif isinstance(value, int):
+            totals[key] = totals.get(key, 0) + value
+
+
+class ResultBatcher:
+    """Persist scan results in micro-batches while a scan is still running.
+
+    Results are buffered and handed to monitor.save_backup_status() whenever
+    SCAN_SAVE_BATCH_SIZE of them are waiting or the oldest one has waited
+    SCAN_SAVE_FLUSH_SECONDS; a timer enforces the latter even while no
+    further result arrives (the remaining outlets sit in SMB timeouts). Only
+    counters survive a flush, so memory stays bounded for any sweep size, a
+    worker restart loses at most one batch, and /backup-stats already shows
+    the outlets scanned so far.
+
+    Use as a context manager (or call close()) so the last batch is written;
+    closing also refreshes the monitor's weekly/monthly rollups once. With a
+    registration (scan_registry.claim_scan) the counters are also reported to
+    Scan_Registry for clients attached to the scan.
+    """
+
+    def __init__(self, monitor, batch_size=None, flush_seconds=None, registration=None):
+        self.monitor = monitor
+        self.registration = registration
+        self.logger = monitor.logger
+        self.batch_size = max(1, batch_size or Config.SCAN_SAVE_BATCH_SIZE)
+        self.flush_seconds = flush_seconds if flush_seconds is not None else Config.SCAN_SAVE_FLUSH_SECONDS
+        self._buffer = []
+        self._oldest = None
+        self._lock = threading.RLock()  # add/flush vs. the flush timer
+        self._timer = None
+        self.completed = 0
+        self.success = 0
+        self.failed = 0
+        self.batches = 0
+        self.save_failures = 0
+        self.saved = {}
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def add(self, result):
+        """Buffer one result; flushes when the batch is full or old enough."""
+        with self._lock:
+            self.completed += 1
+            if result['status'] == 'Successful':
+                self.success += 1
+            else:
+                self.failed += 1
+            if self.registration:
+                self.registration.report(self.completed, self.success, self.failed, result.get('outletCode'))
+
+            if not self._buffer:
+                self._oldest = time.monotonic()
+                self._start_timer()
+            self._buffer.append(result)
+
+            if len(self._buffer) >= self.batch_size or time.monotonic() - self._oldest >= self.flush_seconds:
+                self.flush()
+
+    def _start_timer(self):
+        if self._closed or self.flush_seconds <= 0:
+            return
+        self._timer = threading.Timer(self.flush_seconds, self._flush_if_due)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_if_due(self):
+        with self._lock:
+            if self._buffer and time.monotonic() - self._oldest >= self.flush_seconds:
+                try:
+                    self.flush()
+                except Exception as e:
+                    self.logger.error(f"Timed flush of scan results failed: {str(e)}")
+
+    def flush(self):
+        """Write buffered results now."""
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            counts = self.monitor.save_backup_status(batch)
+            self.batches += 1
+            if counts is None:
+                self.save_failures += 1
+                self.logger.error(f"Saving a batch of {len(batch)} scan results failed")
+            else:
+                _accumulate(self.saved, counts)
+                get_event_hub().notify()  # push the saved rows to open dashboards
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            if self._closed:
+                return
+            self._closed = True
+        if self.batches > self.save_failures:
+            self.monitor.refresh_rollups()
@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+from app.services.daily_summary_service import SUMMARY_TABLES
+
+# Report granularity -> Backup_Outlet_Rollup.Granularity
+GRANULARITIES = {'week': 'W', 'month': 'M'}
+
+
+def period_bounds(day, granularity):
+    """[start, end) of the ISO week (Monday-based) or calendar month containing day."""
+    if granularity == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    start = day.replace(day=1)
+    end = date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+    return start, end
+
+
+def refresh_rollups(conn, scan_type, scan_date):
+    """Recompute the week and month rollups that contain scan_date for every outlet.
+
+    Called once a scan has saved its results. Each period is re-aggregated
+    from the stats table (at most 31 days, read through the ScanDate index)
+    and merged into Backup_Outlet_Rollup, so results re-scanned later the
+    same day are reflected too; rows of the period for outlets with no stats
+    rows left in it are deleted. The caller commits. No-op until
+    migration_add_outlet_rollups.sql has run.
+    """
+    table = SUMMARY_TABLES[scan_type]
+    cursor = conn.cursor()
+    for granularity, code in GRANULARITIES.items():
+        start, end = period_bounds(scan_date, granularity)
+        cursor.execute(f"""
+            IF OBJECT_ID('dbo.Backup_Outlet_Rollup') IS NOT NULL
+            MERGE [dbo].[Backup_Outlet_Rollup] WITH (HOLDLOCK) AS t
+            USING (
+                SELECT OutletServer,
+                       SUM(CASE WHEN Status = 'Successful' THEN 1 ELSE 0 END) AS SuccessDays,
+                       SUM(CASE WHEN Status != 'Successful' THEN 1 ELSE 0 END) AS FailureDays,
+                       MIN(CASE WHEN Status != 'Successful' THEN ScanDate END) AS FirstFailure,
+                       MAX(CASE WHEN Status != 'Successful' THEN ScanDate END) AS LastFailure,
+                       AVG(CASE WHEN Status = 'Successful' THEN BackupFileSizeBytes END) AS AvgBackupSizeBytes
+                FROM [dbo].[{table}]
+                WHERE ScanDate >= ? AND ScanDate < ?
+                GROUP BY OutletServer
+            ) AS s
+                ON t.ScanType = ? AND t.Granularity = ? AND t.PeriodStart = ? AND t.OutletServer = s.OutletServer
+            WHEN MATCHED THEN
+                UPDATE SET SuccessDays = s.SuccessDays, FailureDays = s.FailureDays,
+                           FirstFailure = s.FirstFailure, LastFailure = s.LastFailure,
+                           AvgBackupSizeBytes = s.AvgBackupSizeBytes, UpdatedAt = GETDATE()
+            WHEN NOT MATCHED THEN
+                INSERT (ScanType, Granularity, PeriodStart, OutletServer, SuccessDays, FailureDays,
+                        FirstFailure, LastFailure, AvgBackupSizeBytes, UpdatedAt)
+                VALUES (?, ?, ?, s.OutletServer, s.SuccessDays, s.FailureDays,
+                        s.FirstFailure, s.LastFailure, s.AvgBackupSizeBytes, GETDATE())
+            WHEN NOT MATCHED BY SOURCE AND t.ScanType = ? AND t.Granularity = ? AND t.PeriodStart = ? THEN
+                DELETE;
+        """, (start, end, scan_type, code, start, scan_type, code, start, scan_type, code, start))
+
+
+def read_rollups(conn, scan_type, granularity, date_from=None, date_to=None, outlet=None):
+    """Rollup rows of one granularity whose period starts within [date_from, date_to].
+
+    Dates may be date objects or 'YYYY-MM-DD' strings; date_from is moved back
+    to the start of its period so a partial first week/month is included.
+    """
+    query = """
+        SELECT r.PeriodStart, r.OutletServer, r.SuccessDays, r.FailureDays,
+               r.FirstFailure, r.LastFailure, r.AvgBackupSizeBytes
+        FROM [dbo].[Backup_Outlet_Rollup] r
+        WHERE r.ScanType = ? AND r.Granularity = ?
+    """
+    params = [scan_type, GRANULARITIES[granularity]]
+    if date_from:
+        if isinstance(date_from, str):
+            date_from = date.fromisoformat(date_from)
+        query += " AND r.PeriodStart >= ?"
+        params.append(period_bounds(date_from, granularity)[0])
+    if date_to:
+        query += " AND r.PeriodStart <= ?"
+        params.append(date_to)
+    if outlet:
+        query += " AND r.OutletServer = ?"
+        params.append(outlet)
+    query += " ORDER BY r.PeriodStart DESC, r.OutletServer"
+
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    return [
+        {
+            'periodStart': row[0].isoformat(),
+            'outletCode': row[1],
+            'successDays': row[2],
+            'failureDays': row[3],
+            'firstFailure': row[4].isoformat() if row[4] else None,
+            'lastFailure': row[5].isoformat() if row[5] else None,
+            'avgBackupSizeBytes': row[6],
+        }
+        for row in cursor.fetchall()
+    ]
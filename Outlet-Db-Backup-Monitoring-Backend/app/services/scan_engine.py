@@ -0,0 +1,266 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from app.services.adaptive_limiter import get_limiter
+from app.services.port_sweep import PortSweeper, StageStats
+from app.services.result_batcher import ResultBatcher
+
+SMB_PORT = 445
+
+_DONE = object()
+
+# How often a worker waiting for an SMB slot rechecks the limiter, to see
+# slots freed by another scan of the same type
+SLOT_POLL_SECONDS = 0.5
+
+
+class ScanEngine:
+    """Two-stage scan pipeline driven by an asyncio event loop.
+
+    Stage 1 (probe): a PortSweeper thread checks TCP/445 on every outlet with
+    non-blocking sockets and a single selector. Unreachable outlets are
+    reported as 'Server not Reachable' straight away; reachable ones are
+    handed to stage 2 as soon as they answer.
+
+    Stage 2 (smb): worker coroutines pull reachable outlets off an asyncio
+    queue and run the blocking smbclient work (monitor.check_share) in a
+    bounded executor, so a dead host never occupies an SMB slot. How many
+    checks run at once is set by the scan type's AdaptiveLimiter, which
+    grows the limit while latency stays flat and halves it when SMB errors
+    or timeouts spike.
+
+    Works with any monitor exposing scan_type, error_result(outlet, details),
+    check_share(outlet) and a logger (BackupMonitor, IBStorageMonitor,
+    CombinedMonitor).
+
+    wait_for_stragglers makes the scan wait, for up to another task timeout,
+    for SMB calls that outlived their timeout instead of leaving their
+    threads behind straight away; detached scan jobs (scan_jobs) use it
+    since no HTTP request is waiting on them. A call still hung after that
+    is left behind, so one dead host cannot keep a job Running forever.
+    """
+
+    def __init__(self, monitor, wait_for_stragglers=False):
+        self.monitor = monitor
+        self.config = monitor.config
+        self.logger = monitor.logger
+        self.task_timeout = self.config.TIMEOUT * 2
+        self.probe_stats = StageStats('probe')
+        self.smb_stats = StageStats('smb')
+        self.limiter = get_limiter(monitor.scan_type)
+        self.wait_for_stragglers = wait_for_stragglers
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def run(self, outlets):
+        """Scan all outlets and return the list of result dicts."""
+        return list(self.iter_results(outlets))
+
+    def run_and_save(self, outlets, registration=None):
+        """Scan all outlets, saving results in micro-batches as they complete.
+
+        Progress is reported to registration when given, and a cancel
+        requested through it stops outlets that have not started yet. Returns
+        the ResultBatcher, which carries the success/failed counts.
+        """
+        with ResultBatcher(self.monitor, registration=registration) as batcher:
+            for result in self.iter_results(outlets):
+                batcher.add(result)
+                if registration and registration.cancel_requested:
+                    self.stop()
+        return batcher
+
+    def iter_results(self, outlets):
+        """Yield one result dict per outlet, in completion order.
+
+        The event loop runs in a background thread so this generator can be
+        consumed from plain synchronous code (scheduler jobs, SSE generators).
+        Closing the generator early stops outlets that have not started yet.
+        """
+        outlets = list(outlets)
+        if not outlets:
+            return
+
+        results = queue.Queue()
+        runner = threading.Thread(
+            target=self._run_loop, args=(outlets, results),
+            name='scan-engine', daemon=True
+        )
+        runner.start()
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            self._stop.set()
+
+    def stop(self):
+        """Ask the engine not to start any further outlets."""
+        self._stop.set()
+
+    def stage_snapshot(self):
+        """Queue depth and throughput for each pipeline stage."""
+        return [self.probe_stats.snapshot(), self.smb_stats.snapshot()]
+
+    # ------------------------------------------------------------------
+    # Pipeline
+    # ------------------------------------------------------------------
+
+    def _run_loop(self, outlets, results):
+        try:
+            asyncio.run(self._scan_all(outlets, results))
+        except Exception as e:
+            self.logger.error(f"Scan engine failure: {str(e)}")
+        finally:
+            for stage in self.stage_snapshot():
+                self.logger.info(
+                    f"Scan stage {stage['stage']}: {stage['completed']} done in {stage['elapsedSeconds']}s "
+                    f"({stage['throughputPerSecond']}/s, peak queue {stage['peakQueued']})"
+                )
+            results.put(_DONE)
+
+    async def _scan_all(self, outlets, results):
+        loop = asyncio.get_running_loop()
+        smb_queue = asyncio.Queue()
+        smb_workers = self.limiter.max_limit
+        executor = ThreadPoolExecutor(max_workers=smb_workers, thread_name_prefix='scan-smb')
+        self._slot_freed = asyncio.Event()
+        self._futures = []
+
+        self.logger.info(
+            f"Scan engine started: {len(outlets)} outlets, "
+            f"probe concurrency {self.config.SCAN_PROBE_CONCURRENCY}, "
+            f"SMB concurrency {self.limiter.limit} (adaptive {self.limiter.min_limit}-{smb_workers})"
+        )
+
+        def on_reachable(outlet):
+            loop.call_soon_threadsafe(self._enqueue_smb, smb_queue, outlet)
+
+        def on_unreachable(outlet):
+            self.logger.error(f"Ping failed for {outlet[1]} (Outlet: {outlet[0]})")
+            results.put(self.monitor.error_result(outlet, 'Server not Reachable'))
+
+        sweeper = PortSweeper(
+            port=SMB_PORT,
+            timeout=self.config.PROBE_TIMEOUT,
+            attempts=self.config.MAX_RETRIES,
+            retry_delay=self.config.PROBE_RETRY_DELAY,
+            max_open=self.config.SCAN_PROBE_CONCURRENCY,
+            stats=self.probe_stats,
+        )
+        workers = [
+            asyncio.create_task(self._smb_worker(smb_queue, executor, results))
+            for _ in range(smb_workers)
+        ]
+        try:
+            await loop.run_in_executor(
+                None, sweeper.sweep, [(o, o[1]) for o in outlets],
+                on_reachable, on_unreachable, self._stop
+            )
+            # Every on_reachable callback was scheduled before the sweep returned,
+            # so the shutdown markers land behind the last reachable outlet.
+            for _ in workers:
+                smb_queue.put_nowait(None)
+            await asyncio.gather(*workers)
+        finally:
+            self.smb_stats.finish()
+            # Timed-out SMB calls cannot be interrupted; let them finish in the
+            # background instead of blocking the caller on them, after a
+            # bounded wait when asked to wait for stragglers.
+            executor.shutdown(wait=False, cancel_futures=True)
+            if self.wait_for_stragglers:
+                self._wait_for_stragglers()
+
+    def _wait_for_stragglers(self):
+        running = [future for future in self._futures if not future.done()]
+        if not running:
+            return
+        _, still_running = wait(running, timeout=self.task_timeout)
+        if still_running:
+            self.logger.warning(
+                f"Scan engine finished with {len(still_running)} SMB checks still hung "
+                f"after {self.task_timeout * 2} seconds; leaving them behind"
+            )
+
+    def _enqueue_smb(self, smb_queue, outlet):
+        self.smb_stats.enqueue()
+        smb_queue.put_nowait(outlet)
+
+    async def _smb_worker(self, smb_queue, executor, results):
+        while True:
+            outlet = await smb_queue.get()
+            if outlet is None:
+                return
+            self.smb_stats.start()
+            if self._stop.is_set():
+                self.smb_stats.done()
+                continue
+            while True:
+                self._slot_freed.clear()
+                if self.limiter.try_acquire():
+                    break
+                try:
+                    await asyncio.wait_for(self._slot_freed.wait(), SLOT_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            run = {}
+            try:
+                result = await self._check_share(outlet, executor, run)
+            except Exception as e:
+                self.logger.error(f"Scan task failed for outlet {outlet[0]} ({outlet[1]}): {str(e)}")
+                result = self.monitor.error_result(outlet, f"Scan task failure: {str(e)}")
+            # A check that timed out before a thread picked it up says nothing
+            # about the network; only checks that ran are samples
+            if 'started' in run:
+                self.limiter.record(time.monotonic() - run['started'], self._is_congestion_error(result))
+            self.smb_stats.done()
+            results.put(result)
+
+    def _release_slot(self, loop):
+        # Runs in the executor thread once the check is over, even after the
+        # scan's loop has closed; the limiter is shared with other scans
+        self.limiter.release()
+        self._call_in_loop(loop, self._slot_freed.set)
+
+    async def _check_share(self, outlet, executor, run):
+        loop = asyncio.get_running_loop()
+
+        def check():
+            run['started'] = time.monotonic()
+            return self.monitor.check_share(outlet)
+
+        try:
+            future = executor.submit(check)
+        except RuntimeError:
+            self._release_slot(loop)  # executor already shut down
+            raise
+        self._futures.append(future)
+        # The slot stays taken until the thread is free again, not just until
+        # the timeout below gives up on it; otherwise the next outlets would
+        # queue behind a hung check and time out without being contacted
+        future.add_done_callback(lambda _: self._release_slot(loop))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.task_timeout)
+        except asyncio.TimeoutError:
+            self.logger.error(f"Scan task for {outlet[0]} ({outlet[1]}) timed out after {self.task_timeout} seconds")
+            return self.monitor.error_result(outlet, f"Scan task timed out after {self.task_timeout} seconds")
+
+    @staticmethod
+    def _call_in_loop(loop, callback):
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            pass  # the scan is over and its loop closed
+
+    @staticmethod
+    def _is_congestion_error(result):
+        """SMB protocol errors and timeouts suggest we are pushing the network too hard."""
+        details = result.get('errorDetails') or ''
+        return details.startswith(('SMB Protocol Error', 'Scan task timed out', 'Scan task failure'))
@@ -0,0 +1,283 @@
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+from app.config import Config
+from app.services.outlet_sync_service import OutletSyncService
+from app.services.result_batcher import ResultBatcher
+from app.services.scan_engine import ScanEngine
+from app.services.scan_registry import SCAN_OVERLAPS, claim_scan, read_scan, request_cancel, watch_scan
+
+SCAN_TYPES = tuple(SCAN_OVERLAPS)
+
+
+def _create_monitor(scan_type):
+    if scan_type == 'D_Drive':
+        from app.services.backup_service import BackupMonitor
+        return BackupMonitor()
+    if scan_type == 'IB_Storage':
+        from app.services.Ib_Storage_backup_service import IBStorageMonitor
+        return IBStorageMonitor()
+    from app.services.combined_scan_service import CombinedMonitor
+    return CombinedMonitor()
+
+
+class ScanJob:
+    """A scan running in a background thread of this worker, detached from any HTTP request.
+
+    Closing the browser tab or hitting the gunicorn request timeout no longer
+    abandons the scan: the SSE scan endpoints only subscribe to the job.
+    Progress is kept here for subscribers in this worker and written to
+    Scan_Registry (through the registration) for the other worker. cancel()
+    stops outlets that have not started; the ones in flight finish and are
+    saved, and the job waits a bounded time for their SMB threads before it
+    ends (ScanEngine wait_for_stragglers).
+    """
+
+    def __init__(self, scan_id, monitor, registration, triggered_by):
+        self.scan_id = scan_id
+        self.monitor = monitor
+        self.registration = registration
+        self.scan_type = monitor.scan_type
+        self.scan_date = monitor.scan_date or date.today()
+        self.triggered_by = triggered_by
+        self.engine = ScanEngine(monitor, wait_for_stragglers=True)
+        if registration:
+            registration.stage_source = self.engine.stage_snapshot
+        self.status = 'Running'
+        self.total = None
+        self.completed = self.success = self.failed = 0
+        self.current = None
+        self.message = None
+        self.sync = None
+        self.error = None
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at = None
+        self.version = 0
+        self._changed = threading.Condition()
+        self._cancel = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f'scan-job-{self.scan_type}', daemon=True)
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set() or bool(self.registration and self.registration.cancel_requested)
+
+    def cancel(self):
+        """Stop starting new outlets; results already in flight are still saved."""
+        self._cancel.set()
+        self.engine.stop()
+
+    def _set(self, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def _run(self):
+        batcher = None
+        try:
+            # Outlets are kept in sync by the scheduler; only sync here if that
+            # has not happened within OUTLET_SYNC_TTL_MINUTES
+            sync_result = OutletSyncService().sync_if_stale()
+            if sync_result and (sync_result['inserted'] or sync_result['updated'] or sync_result['deactivated']):
+                self._set(sync={key: sync_result[key] for key in ('inserted', 'updated', 'deactivated')})
+
+            outlets = self.monitor.get_unscanned_outlets()
+            if not outlets:
+                self._set(total=0, message='All outlets already scanned for today')
+            else:
+                self._set(total=len(outlets))
+                if self.registration:
+                    self.registration.start(len(outlets))
+                with ResultBatcher(self.monitor, registration=self.registration) as batcher:
+                    for result in self.engine.iter_results(outlets):
+                        batcher.add(result)
+                        self._set(completed=batcher.completed, success=batcher.success,
+                                  failed=batcher.failed, current=result['outletCode'])
+                        if self.cancel_requested:
+                            self.engine.stop()
+            self._finish('Cancelled' if self.cancel_requested else 'Completed', batcher)
+        except Exception as e:
+            self.monitor.log_error(f"{self.scan_type} scan job error: {str(e)}", severity="CRITICAL")
+            self._finish('Failed', batcher, str(e))
+
+    def _finish(self, status, batcher, error=None):
+        if self.registration:
+            if batcher:
+                self.registration.finish(status, batcher.completed, batcher.success, batcher.failed, error)
+            else:
+                self.registration.finish(status, error=error)
+        self._set(status=status, error=error, finished_at=datetime.now(timezone.utc))
+
+    def snapshot(self):
+        """Progress and per-stage timing, in the shape of scan_registry.read_scan()."""
+        with self._changed:
+            return {
+                'scanId': self.scan_id,
+                'scanType': self.scan_type,
+                'scanDate': self.scan_date.isoformat(),
+                'status': self.status,
+                'triggeredBy': self.triggered_by,
+                'startedAt': self.started_at.isoformat(),
+                'finishedAt': self.finished_at.isoformat() if self.finished_at else None,
+                'total': self.total,
+                'completed': self.completed,
+                'success': self.success,
+                'failed': self.failed,
+                'current': self.current,
+                'errorMessage': self.error,
+                'cancelRequested': self.cancel_requested,
+                'stages': self.engine.stage_snapshot(),
+            }
+
+    def events(self):
+        """SSE event dicts for a subscriber ('sync', 'info', 'start', 'progress', 'complete'/'error').
+
+        Yields None when nothing changed for STATS_STREAM_HEARTBEAT_SECONDS so
+        the caller can send a keep-alive. Subscribers never affect the job.
+        """
+        version = -1
+        sent_sync = sent_message = started = False
+        last = None
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self.version != version, timeout=Config.STATS_STREAM_HEARTBEAT_SECONDS)
+                if self.version == version:
+                    changed = False
+                else:
+                    changed = True
+                    version = self.version
+                    sync, message = self.sync, self.message
+            if not changed:
+                yield None
+                continue
+            scan = self.snapshot()
+            if sync and not sent_sync:
+                sent_sync = True
+                yield {'type': 'sync', **sync}
+            if message and not sent_message:
+                sent_message = True
+                yield {'type': 'info', 'message': message}
+            if scan['total'] and not started:
+                started = True
+                yield {'type': 'start', 'total': scan['total'], 'scanId': self.scan_id}
+            progress = (scan['completed'], scan['success'], scan['failed'])
+            if started and scan['completed'] and progress != last:
+                last = progress
+                yield {'type': 'progress', 'completed': scan['completed'], 'total': scan['total'],
+                       'success': scan['success'], 'failed': scan['failed'], 'current': scan['current']}
+            if scan['status'] == 'Completed':
+                yield {'type': 'complete', 'total': scan['total'] or 0, 'success': scan['success'],
+                       'failed': scan['failed'], 'stages': scan['stages'], 'scanId': self.scan_id}
+                return
+            if scan['status'] == 'Cancelled':
+                yield {'type': 'error', 'message': 'Scan cancelled'}
+                return
+            if scan['status'] != 'Running':
+                yield {'type': 'error', 'message': 'Internal Server Error'}
+                return
+
+
+_jobs = {}  # scan_id -> ScanJob started by this worker (running and recent)
+_jobs_lock = threading.Lock()
+
+
+def _prune_jobs():
+    """Forget all but the SCAN_JOB_HISTORY most recent finished jobs. Caller holds _jobs_lock."""
+    finished = [job for job in _jobs.values() if job.status != 'Running']
+    finished.sort(key=lambda job: job.finished_at)
+    for job in finished[:max(0, len(finished) - Config.SCAN_JOB_HISTORY)]:
+        del _jobs[job.scan_id]
+
+
+def start_scan_job(scan_type, scan_date=None, triggered_by='manual'):
+    """Start a detached scan, or find the one already running for scan_type and date.
+
+    Returns (scan_id, started). At most one scan per type and date runs
+    across all workers (scan_registry.claim_scan); without Scan_Registry the
+    check only covers this worker's own jobs.
+    """
+    monitor = _create_monitor(scan_type)
+    monitor.scan_date = scan_date
+    registration = claim_scan(scan_type, scan_date or date.today(), triggered_by, monitor.logger)
+    if registration and not registration.owned:
+        return registration.scan_id, False
+
+    with _jobs_lock:
+        if registration is None:
+            for job in _jobs.values():
+                if (job.status == 'Running' and job.scan_type in SCAN_OVERLAPS[scan_type]
+                        and job.scan_date == (scan_date or date.today())):
+                    return job.scan_id, False
+        job = ScanJob(registration.scan_id if registration else str(uuid.uuid4()),
+                      monitor, registration, triggered_by)
+        _prune_jobs()
+        _jobs[job.scan_id] = job
+    job.thread.start()
+    return job.scan_id, True
+
+
+def get_scan_job(scan_id):
+    """The ScanJob of scan_id if this worker runs (or recently ran) it, else None."""
+    with _jobs_lock:
+        return _jobs.get(scan_id)
+
+
+def get_scan_status(scan_id):
+    """Progress of scan_id from this worker's job or from Scan_Registry; None when unknown."""
+    job = get_scan_job(scan_id)
+    if job:
+        return job.snapshot()
+    scan = read_scan(scan_id)
+    if scan:
+        scan.pop('stale')
+    return scan
+
+
+def cancel_scan_job(scan_id):
+    """Ask scan_id to stop cooperatively, wherever it runs.
+
+    Returns its status dict, where cancelRequested tells whether the request
+    was recorded, or None when the scan is unknown. A scan in the other
+    worker is flagged in Scan_Registry and stops at its next progress write.
+    """
+    job = get_scan_job(scan_id)
+    if job:
+        if job.status == 'Running':
+            job.cancel()
+        return job.snapshot()
+    scan = read_scan(scan_id)
+    if scan is None:
+        return None
+    if scan.pop('stale') or scan['status'] != 'Running':
+        return scan
+    scan['cancelRequested'] = request_cancel(scan_id)
+    return scan
+
+
+def wait_for_scan(scan_id, timeout):
+    """Block up to timeout seconds for scan_id to finish; returns its final status, or None if still running."""
+    job = get_scan_job(scan_id)
+    if job:
+        job.thread.join(timeout)
+        return None if job.thread.is_alive() else job.snapshot()
+    deadline = time.monotonic() + timeout
+    while True:
+        scan = read_scan(scan_id)
+        if scan is None or scan['status'] != 'Running' or scan['stale']:
+            return scan
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(Config.SCAN_REGISTRY_POLL_SECONDS)
+
+
+def scan_events(scan_id, attached):
+    """SSE event dicts for scan_id (None = keep-alive), from this worker's job or Scan_Registry."""
+    if attached:
+        yield {'type': 'attached', 'scanId': scan_id}
+    job = get_scan_job(scan_id)
+    if job:
+        yield from job.events()
+    else:
+        yield from watch_scan(scan_id)
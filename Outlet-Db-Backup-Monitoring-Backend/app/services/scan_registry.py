@@ -0,0 +1,265 @@
+import json
+import os
+import socket
+import time
+import uuid
+import pyodbc
+from app.config import Config
+from app.db_pool import app_lock, get_local_connection
+
+# A scan of one type also blocks the types it saves results for
+SCAN_OVERLAPS = {
+    'D_Drive': ('D_Drive', 'Combined'),
+    'IB_Storage': ('IB_Storage', 'Combined'),
+    'Combined': ('D_Drive', 'IB_Storage', 'Combined'),
+}
+
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ScanRegistration:
+    """One scan's row in Scan_Registry, as seen by the process that claimed or found it.
+
+    The owner (owned=True) reports progress, which also serves as its
+    heartbeat, and finishes the row; other clients attach with watch_scan().
+    With migration_add_scan_jobs.sql (job_columns) each write also saves the
+    stage timing of stage_source() and picks up a DELETE /scans/<id> from any
+    worker as cancel_requested. Database errors are logged and never
+    interrupt the scan itself.
+    """
+
+    def __init__(self, scan_id, scan_type, scan_date, owned, logger=None, job_columns=False):
+        self.scan_id = scan_id
+        self.scan_type = scan_type
+        self.scan_date = scan_date
+        self.owned = owned
+        self.logger = logger
+        self.job_columns = job_columns
+        self.stage_source = None
+        self.cancel_requested = False
+        self.finished = False
+        self._last_report = 0.0
+
+    def _update(self, sql, params):
+        try:
+            with get_local_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                row = cursor.fetchone() if cursor.description else None
+                conn.commit()
+            if row and row[0]:
+                self.cancel_requested = True
+        except pyodbc.Error as e:
+            if self.logger:
+                self.logger.error(f"Scan registry update failed for {self.scan_type}: {e}")
+
+    def _job_fields(self):
+        """Extra SET and OUTPUT SQL (and SET params) for the migration_add_scan_jobs.sql columns."""
+        if not self.job_columns:
+            return "", "", ()
+        stages = json.dumps(self.stage_source()) if self.stage_source else None
+        return ", Stages = ISNULL(?, Stages)", " OUTPUT inserted.CancelRequested", (stages,)
+
+    def start(self, total):
+        """Record the number of outlets this scan will visit."""
+        self._update(
+            "UPDATE [dbo].[Scan_Registry] SET Total = ?, HeartbeatAt = GETDATE() WHERE ScanId = ?",
+            (total, self.scan_id)
+        )
+
+    def report(self, completed, success, failed, current=None, force=False):
+        """Save progress (at most every SCAN_REGISTRY_PROGRESS_SECONDS unless forced)."""
+        now = time.monotonic()
+        if not force and now - self._last_report < Config.SCAN_REGISTRY_PROGRESS_SECONDS:
+            return
+        self._last_report = now
+        job_set, job_output, job_params = self._job_fields()
+        self._update(
+            "UPDATE [dbo].[Scan_Registry] "
+            f"SET Completed = ?, Successful = ?, Failed = ?, CurrentOutlet = ?, HeartbeatAt = GETDATE(){job_set}"
+            f"{job_output} WHERE ScanId = ? AND Status = 'Running'",
+            (completed, success, failed, current, *job_params, self.scan_id)
+        )
+
+    def finish(self, status, completed=None, success=None, failed=None, error=None):
+        """Close the row as Completed, Failed or Cancelled (only the first call counts)."""
+        if self.finished:
+            return
+        self.finished = True
+        job_set, job_output, job_params = self._job_fields()
+        self._update(
+            "UPDATE [dbo].[Scan_Registry] "
+            "SET Status = ?, FinishedAt = GETDATE(), HeartbeatAt = GETDATE(), "
+            "Completed = ISNULL(?, Completed), Successful = ISNULL(?, Successful), "
+            f"Failed = ISNULL(?, Failed), ErrorMessage = ?{job_set}"
+            f"{job_output} WHERE ScanId = ? AND Status = 'Running'",
+            (status, completed, success, failed, error[:500] if error else None, *job_params, self.scan_id)
+        )
+
+
+def finish_from(registration, batcher, error=None):
+    """Finish registration with a ResultBatcher's counts: Failed on error, else Cancelled or Completed."""
+    if error:
+        status = 'Failed'
+    else:
+        status = 'Cancelled' if registration.cancel_requested else 'Completed'
+    if batcher:
+        registration.finish(status, batcher.completed, batcher.success, batcher.failed, error)
+    else:
+        registration.finish(status, error=error)
+
+
+def claim_scan(scan_type, scan_date, triggered_by, logger=None):
+    """Claim the one active scan slot for (scan_type, scan_date) across all workers.
+
+    Under an exclusive app lock, a live Running row of the same or an
+    overlapping type (SCAN_OVERLAPS) for that date wins: the result is a
+    registration with owned=False to attach to. Otherwise the row is
+    (re)written as a new Running scan owned by the caller. A Running row whose
+    heartbeat is older than SCAN_REGISTRY_STALE_SECONDS (a dead worker) is
+    taken over. Returns None when Scan_Registry is unavailable (migration not
+    run), in which case the caller scans unregistered as before.
+    """
+    overlaps = SCAN_OVERLAPS[scan_type]
+    try:
+        with get_local_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT OBJECT_ID('dbo.Scan_Registry'), COL_LENGTH('dbo.Scan_Registry', 'CancelRequested')")
+            table_id, cancel_column = cursor.fetchone()
+            if table_id is None:
+                return None
+            job_columns = cancel_column is not None
+
+            with app_lock(conn, 'ScanRegistry', timeout_ms=10000) as locked:
+                if not locked:
+                    raise pyodbc.Error('HYT00', 'Timed out waiting for the scan registry lock')
+
+                cursor.execute(f"""
+                    SELECT TOP (1) ScanId, ScanType
+                    FROM [dbo].[Scan_Registry]
+                    WHERE ScanDate = ? AND ScanType IN ({', '.join('?' for _ in overlaps)})
+                      AND Status = 'Running'
+                      AND HeartbeatAt >= DATEADD(second, -?, GETDATE())
+                    ORDER BY StartedAt
+                """, (scan_date, *overlaps, Config.SCAN_REGISTRY_STALE_SECONDS))
+                running = cursor.fetchone()
+                if running:
+                    conn.commit()
+                    return ScanRegistration(str(running[0]), running[1], scan_date, False, logger, job_columns)
+
+                scan_id = str(uuid.uuid4())
+                reset_job = ", CancelRequested = 0, Stages = NULL" if job_columns else ""
+                cursor.execute(f"""
+                    MERGE [dbo].[Scan_Registry] WITH (HOLDLOCK) AS t
+                    USING (SELECT ? AS ScanType, ? AS ScanDate) AS s
+                        ON t.ScanType = s.ScanType AND t.ScanDate = s.ScanDate
+                    WHEN MATCHED THEN
+                        UPDATE SET ScanId = ?, Status = 'Running', TriggeredBy = ?, Owner = ?,
+                                   StartedAt = GETDATE(), HeartbeatAt = GETDATE(), FinishedAt = NULL,
+                                   Total = NULL, Completed = 0, Successful = 0, Failed = 0,
+                                   CurrentOutlet = NULL, ErrorMessage = NULL{reset_job}
+                    WHEN NOT MATCHED THEN
+                        INSERT (ScanType, ScanDate, ScanId, Status, TriggeredBy, Owner, StartedAt, HeartbeatAt)
+                        VALUES (s.ScanType, s.ScanDate, ?, 'Running', ?, ?, GETDATE(), GETDATE());
+                """, (scan_type, scan_date, scan_id, triggered_by, _OWNER, scan_id, triggered_by, _OWNER))
+                conn.commit()
+                return ScanRegistration(scan_id, scan_type, scan_date, True, logger, job_columns)
+    except pyodbc.Error as e:
+        if logger:
+            logger.error(f"Scan registry claim failed for {scan_type}: {e}")
+        return None
+
+
+def read_scan(scan_id):
+    """Scan_Registry row of scan_id as a dict, or None when it is gone."""
+    with get_local_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COL_LENGTH('dbo.Scan_Registry', 'CancelRequested')")
+        job_columns = cursor.fetchone()[0] is not None
+        cursor.execute(f"""
+            SELECT ScanId, ScanType, ScanDate, Status, TriggeredBy, StartedAt, FinishedAt,
+                   Total, Completed, Successful, Failed, CurrentOutlet, ErrorMessage,
+                   CASE WHEN HeartbeatAt < DATEADD(second, -?, GETDATE()) THEN 1 ELSE 0 END,
+                   {'CancelRequested, Stages' if job_columns else 'CAST(0 AS BIT), NULL'}
+            FROM [dbo].[Scan_Registry]
+            WHERE ScanId = ?
+        """, (Config.SCAN_REGISTRY_STALE_SECONDS, scan_id))
+        row = cursor.fetchone()
+    if not row:
+        return None
+    return {
+        'scanId': str(row[0]),
+        'scanType': row[1],
+        'scanDate': row[2].isoformat() if row[2] else None,
+        'status': row[3],
+        'triggeredBy': row[4],
+        'startedAt': row[5].isoformat() if row[5] else None,
+        'finishedAt': row[6].isoformat() if row[6] else None,
+        'total': row[7],
+        'completed': row[8],
+        'success': row[9],
+        'failed': row[10],
+        'current': row[11],
+        'errorMessage': row[12],
+        'stale': bool(row[13]),
+        'cancelRequested': bool(row[14]),
+        'stages': json.loads(row[15]) if row[15] else [],
+    }
+
+
+def request_cancel(scan_id):
+    """Flag a Running scan for cooperative cancellation by whichever worker runs it.
+
+    Returns False when the scan is not Running or Scan_Registry has no
+    CancelRequested column yet (migration_add_scan_jobs.sql).
+    """
+    with get_local_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COL_LENGTH('dbo.Scan_Registry', 'CancelRequested')")
+        if cursor.fetchone()[0] is None:
+            return False
+        cursor.execute(
+            "UPDATE [dbo].[Scan_Registry] SET CancelRequested = 1 WHERE ScanId = ? AND Status = 'Running'",
+            (scan_id,)
+        )
+        flagged = cursor.rowcount == 1
+        conn.commit()
+    return flagged
+
+
+def watch_scan(scan_id):
+    """Progress events of a scan run by another worker.
+
+    Yields the same event dicts a scan in this worker streams ('start',
+    'progress', then 'complete' or 'error') by polling Scan_Registry every
+    SCAN_REGISTRY_POLL_SECONDS.
+    """
+    started = False
+    last = None
+    while True:
+        scan = read_scan(scan_id)
+        if scan is None:
+            yield {'type': 'error', 'message': 'Scan is no longer registered'}
+            return
+        if scan['total'] is not None and not started:
+            started = True
+            yield {'type': 'start', 'total': scan['total'], 'scanId': scan['scanId']}
+        progress = (scan['completed'], scan['success'], scan['failed'])
+        if started and progress != last:
+            last = progress
+            yield {'type': 'progress', 'completed': scan['completed'], 'total': scan['total'],
+                   'success': scan['success'], 'failed': scan['failed'], 'current': scan['current']}
+        if scan['status'] == 'Completed':
+            yield {'type': 'complete', 'total': scan['total'] or 0, 'success': scan['success'],
+                   'failed': scan['failed'], 'stages': scan['stages'], 'scanId': scan['scanId']}
+            return
+        if scan['status'] == 'Cancelled':
+            yield {'type': 'error', 'message': 'Scan cancelled'}
+            return
+        if scan['status'] != 'Running':
+            yield {'type': 'error', 'message': 'Internal Server Error'}
+            return
+        if scan['stale']:
+            yield {'type': 'error', 'message': 'Scan stopped reporting progress'}
+            return
+        time.sleep(Config.SCAN_REGISTRY_POLL_SECONDS)
@@ -1,11 +1,17 @@
-import pyodbc
 import traceback
-from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
-from datetime import datetime, timezone
+from datetime import date, datetime
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from app.config import Config
+from app.db_pool import get_local_connection, get_pool_snapshots
 from app.logging_config import get_scheduler_logger
+from app.services.adaptive_limiter import get_limiter_snapshots
+from app.services.outlet_sync_service import OutletSyncService
+from app.services.scan_engine import ScanEngine
+from app.services.scan_registry import claim_scan
+from app.services.smb_session_pool import get_session_pool
+from app.services.stats_stream import get_event_hub
 
 logger = get_scheduler_logger()
 _scheduler = None
@@ -14,18 +20,11 @@ _applied_config = None  # tracks last applied schedule to detect DB config chang
 # Day mapping: frontend label → APScheduler cron value
 DAY_MAP = {'Mon': 'mon', 'Tue': 'tue', 'Wed': 'wed', 'Thu': 'thu', 'Fri': 'fri', 'Sat': 'sat', 'Sun': 'sun'}
 
+SCAN_JOB_IDS = ('d_drive_scan', 'ib_storage_scan', 'combined_scan')
+
 
 def _get_db_connection():
-    config = Config()
-    conn_str = (
-        f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-        f"SERVER={config.DB_SERVER};"
-        f"DATABASE={config.DB_DATABASE};"
-        f"UID={config.DB_USERNAME};"
-        f"PWD={config.DB_PASSWORD};"
-        "Encrypt=no;TrustServerCertificate=yes;"
-    )
-    return pyodbc.connect(conn_str)
+    return get_local_connection()
 
 
 # ------------------------------------------------------------------
@@ -57,7 +56,9 @@ def ensure_status_table():
                     );
                     INSERT INTO [dbo].[Scheduler_Status] (ScanType, Status) VALUES ('D_Drive', 'Idle');
                     INSERT INTO [dbo].[Scheduler_Status] (ScanType, Status) VALUES ('IB_Storage', 'Idle');
-                END
+                END;
+                IF NOT EXISTS (SELECT 1 FROM [dbo].[Scheduler_Status] WHERE ScanType = 'Combined')
+                    INSERT INTO [dbo].[Scheduler_Status] (ScanType, Status) VALUES ('Combined', 'Idle');
             """)
             conn.commit()
         logger.info("[Scheduler] Status table verified")
@@ -223,22 +224,21 @@ def cleanup_stale_scheduler_status():
 # Dynamic reschedule
 # ------------------------------------------------------------------
 
-def reschedule_jobs(interval_minutes, start_hour, end_hour, active_days):
-    """Remove and re-add scheduler jobs with new cron config."""
-    global _scheduler, _applied_config
-    if not _scheduler or not _scheduler.running:
-        logger.warning("[Scheduler] Cannot reschedule — scheduler not running")
-        return
-
-    cron_hours = _build_cron_hours(start_hour, end_hour)
-    cron_days = _build_cron_days(active_days)
+def _add_scan_jobs(cron_hours, cron_days, interval_minutes):
+    """Register the scan jobs for the configured scan mode.
 
-    # Remove existing jobs
-    for job_id in ('d_drive_scan', 'ib_storage_scan'):
-        try:
-            _scheduler.remove_job(job_id)
-        except Exception:
-            pass
+    'separate' runs the D-drive and IBSTORAGE scans as two jobs five minutes
+    apart; 'combined' visits each outlet once and checks both in one job.
+    """
+    if Config.SCHEDULER_SCAN_MODE == 'combined':
+        _scheduler.add_job(
+            run_combined_scan,
+            trigger=_build_trigger(cron_hours, cron_days, 0, interval_minutes),
+            id='combined_scan',
+            name='Combined D Drive + IBSTORAGE Auto-Scan',
+            misfire_grace_time=300, coalesce=True, max_instances=1,
+        )
+        return
 
     _scheduler.add_job(
         run_d_drive_scan,
@@ -256,6 +256,38 @@ def reschedule_jobs(interval_minutes, start_hour, end_hour, active_days):
         misfire_grace_time=300, coalesce=True, max_instances=1,
     )
 
+
+def _add_outlet_sync_job():
+    """Keep the Outlets table synced from central, independent of the scan schedule."""
+    _scheduler.add_job(
+        run_outlet_sync,
+        trigger=IntervalTrigger(minutes=Config.OUTLET_SYNC_INTERVAL_MINUTES),
+        id='outlet_sync',
+        name='Outlet Sync from Central',
+        next_run_time=datetime.now(),
+        misfire_grace_time=300, coalesce=True, max_instances=1,
+    )
+
+
+def reschedule_jobs(interval_minutes, start_hour, end_hour, active_days):
+    """Remove and re-add scheduler jobs with new cron config."""
+    global _scheduler, _applied_config
+    if not _scheduler or not _scheduler.running:
+        logger.warning("[Scheduler] Cannot reschedule — scheduler not running")
+        return
+
+    cron_hours = _build_cron_hours(start_hour, end_hour)
+    cron_days = _build_cron_days(active_days)
+
+    # Remove existing jobs
+    for job_id in SCAN_JOB_IDS:
+        try:
+            _scheduler.remove_job(job_id)
+        except Exception:
+            pass
+
+    _add_scan_jobs(cron_hours, cron_days, interval_minutes)
+
     _applied_config = (interval_minutes, start_hour, end_hour, tuple(sorted(active_days)))
     logger.info(f"[Scheduler] Rescheduled — hours={cron_hours}, days={cron_days}, interval={interval_minutes}min")
 
@@ -282,28 +314,60 @@ def _sync_schedule_from_db():
 # ------------------------------------------------------------------
 
 def _acquire_lock(scan_type):
-    """Try to acquire the run lock for a scan type. Returns True if acquired."""
+    """Try to acquire the run lock for a scan type. Returns (acquired, registration).
+
+    The lock is the shared scan registry (scan_registry.claim_scan), the same
+    one manual scans use, so a scheduled scan never starts while a manual or
+    overlapping scan of that date runs in any worker. Scheduler_Status is
+    still marked Running for the dashboard. Without Scan_Registry (migration
+    not run) registration is None and Scheduler_Status alone is the lock.
+    """
     _clear_stale_running_statuses(Config.SCHEDULER_STALE_RUNNING_TIMEOUT_MINUTES)
+    registration = claim_scan(scan_type, date.today(), 'scheduler', logger)
+    if registration and not registration.owned:
+        return False, None
     try:
         conn = _get_db_connection()
         with conn:
             cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE [dbo].[Scheduler_Status] "
-                "SET Status = 'Running', LastScanStart = GETDATE() "
-                "WHERE ScanType = ? AND Status != 'Running'",
-                (scan_type,)
-            )
+            if registration:
+                cursor.execute(
+                    "UPDATE [dbo].[Scheduler_Status] "
+                    "SET Status = 'Running', LastScanStart = GETDATE() "
+                    "WHERE ScanType = ?",
+                    (scan_type,)
+                )
+            else:
+                cursor.execute(
+                    "UPDATE [dbo].[Scheduler_Status] "
+                    "SET Status = 'Running', LastScanStart = GETDATE() "
+                    "WHERE ScanType = ? AND Status != 'Running'",
+                    (scan_type,)
+                )
             conn.commit()
-            return cursor.rowcount == 1
+            acquired = registration is not None or cursor.rowcount == 1
+        if acquired:
+            get_event_hub().notify()
+        return acquired, registration
     except Exception as e:
         logger.error(f"[Scheduler] Lock acquire failed for {scan_type}: {e}")
-        return False
+        if registration:
+            registration.finish('Failed', error=str(e))
+        return False, None
 
 
-def _release_lock(scan_type, total, success, failed, error_msg=None):
-    """Release the run lock and save scan results."""
+def _release_lock(scan_type, total, success, failed, error_msg=None, registration=None, completed=None):
+    """Release the run lock and save scan results.
+
+    completed is how many outlets were actually scanned (None keeps what the
+    registration last reported). A scan stopped with DELETE /scans/<id> (see
+    ScanEngine.run_and_save) is recorded as Cancelled in both tables.
+    """
     status = 'Failed' if error_msg else 'Completed'
+    if registration:
+        if registration.cancel_requested and not error_msg:
+            status = 'Cancelled'
+        registration.finish(status, completed, success, failed, error_msg)
     try:
         conn = _get_db_connection()
         with conn:
@@ -316,6 +380,7 @@ def _release_lock(scan_type, total, success, failed, error_msg=None):
                 (status, total, success, failed, error_msg, scan_type)
             )
             conn.commit()
+        get_event_hub().notify()
     except Exception as e:
         logger.error(f"[Scheduler] Lock release failed for {scan_type}: {e}")
 
@@ -324,180 +389,88 @@ def _release_lock(scan_type, total, success, failed, error_msg=None):
 # Scan jobs
 # ------------------------------------------------------------------
 
-def run_d_drive_scan():
-    """Background job: scan all outlets for D Drive backups."""
-    scan_type = 'D_Drive'
-
-    if not _acquire_lock(scan_type):
+def _run_scan(scan_type, monitor_factory):
+    """Run one scheduled scan under the scan registry lock for scan_type."""
+    acquired, registration = _acquire_lock(scan_type)
+    if not acquired:
         logger.info(f"[Scheduler] {scan_type} scan already running, skipping")
         return
 
     logger.info(f"[Scheduler] Starting {scan_type} auto-scan")
     total = success = failed = 0
     try:
-        from app.services.backup_service import BackupMonitor
-        monitor = BackupMonitor()
+        monitor = monitor_factory()
         outlets = monitor.get_unscanned_outlets()
         if not outlets:
             logger.info(f"[Scheduler] All outlets already scanned for today ({scan_type})")
-            _release_lock(scan_type, 0, 0, 0)
+            _release_lock(scan_type, 0, 0, 0, registration=registration, completed=0)
             return
 
         total = len(outlets)
-        results = []
-        executor = ThreadPoolExecutor(max_workers=monitor.config.MAX_WORKERS)
-        try:
-            futures = {executor.submit(monitor.check_server, outlet): outlet for outlet in outlets}
-            pending = set(futures)
-            task_timeout = monitor.config.TIMEOUT * 2
-
-            while pending:
-                done, pending = wait(pending, timeout=task_timeout, return_when=FIRST_COMPLETED)
-                if not done:
-                    logger.error(f"[Scheduler] Scan stalled: no worker completed in {task_timeout} seconds; marking {len(pending)} pending tasks as timed out.")
-                    for future in list(pending):
-                        outlet = futures[future]
-                        results.append({
-                            'outletCode': outlet[0],
-                            'server': outlet[1],
-                            'lastModified': None,
-                            'status': 'Error',
-                            'errorDetails': f"Scan task timed out after {task_timeout} seconds",
-                            'backupsize': None
-                        })
-                    break
-
-                for future in done:
-                    outlet = futures[future]
-                    try:
-                        result = future.result()
-                    except Exception as e:
-                        logger.error(f"[Scheduler] Scan task failed for {outlet[0]} ({outlet[1]}): {e}")
-                        result = {
-                            'outletCode': outlet[0],
-                            'server': outlet[1],
-                            'lastModified': None,
-                            'status': 'Error',
-                            'errorDetails': str(e),
-                            'backupsize': None
-                        }
-                    results.append(result)
-        finally:
-            executor.shutdown(wait=False)
-
-        success = sum(1 for r in results if r['status'] == 'Successful')
-        failed = total - success
-
-        monitor.save_backup_status(results)
+        if registration:
+            registration.start(total)
+        batcher = ScanEngine(monitor).run_and_save(outlets, registration)
+        success = batcher.success
+        failed = batcher.failed
+
         logger.info(f"[Scheduler] {scan_type} auto-scan complete: {success}/{total} successful")
-        _release_lock(scan_type, total, success, failed)
+        _release_lock(scan_type, total, success, failed, registration=registration, completed=batcher.completed)
 
     except Exception as e:
         logger.error(f"[Scheduler] {scan_type} auto-scan error: {e}")
         logger.error(traceback.format_exc())
-        _release_lock(scan_type, total, success, failed, str(e)[:500])
+        _release_lock(scan_type, total, success, failed, str(e)[:500], registration)
+
+
+def run_d_drive_scan():
+    """Background job: scan all outlets for D Drive backups."""
+    from app.services.backup_service import BackupMonitor
+    _run_scan('D_Drive', BackupMonitor)
 
 
 def run_ib_storage_scan():
     """Background job: scan all outlets for IBSTORAGE backups."""
-    scan_type = 'IB_Storage'
+    from app.services.Ib_Storage_backup_service import IBStorageMonitor
+    _run_scan('IB_Storage', IBStorageMonitor)
 
-    if not _acquire_lock(scan_type):
-        logger.info(f"[Scheduler] {scan_type} scan already running, skipping")
-        return
 
-    logger.info(f"[Scheduler] Starting {scan_type} auto-scan")
-    total = success = failed = 0
-    try:
-        from app.services.Ib_Storage_backup_service import IBStorageMonitor
-        monitor = IBStorageMonitor()
-        outlets = monitor.get_unscanned_outlets()
-        if not outlets:
-            logger.info(f"[Scheduler] All outlets already scanned for today ({scan_type})")
-            _release_lock(scan_type, 0, 0, 0)
-            return
+def run_combined_scan():
+    """Background job: visit each outlet once and check D Drive and IBSTORAGE backups.
+
+    Reported as a single 'Combined' run; an outlet counts as successful only
+    when both of its backups are.
+    """
+    from app.services.combined_scan_service import CombinedMonitor
+    _run_scan('Combined', CombinedMonitor)
 
-        total = len(outlets)
-        results = []
-        executor = ThreadPoolExecutor(max_workers=monitor.config.MAX_WORKERS)
-        try:
-            futures = {executor.submit(monitor.check_server, outlet): outlet for outlet in outlets}
-            pending = set(futures)
-            task_timeout = monitor.config.TIMEOUT * 2
-
-            while pending:
-                done, pending = wait(pending, timeout=task_timeout, return_when=FIRST_COMPLETED)
-                if not done:
-                    logger.error(f"[Scheduler] Scan stalled: no worker completed in {task_timeout} seconds; marking {len(pending)} pending tasks as timed out.")
-                    for future in list(pending):
-                        outlet = futures[future]
-                        results.append({
-                            'outletCode': outlet[0],
-                            'server': outlet[1],
-                            'lastModified': None,
-                            'status': 'Error',
-                            'errorDetails': f"Scan task timed out after {task_timeout} seconds",
-                            'backupsize': None
-                        })
-                    break
-
-                for future in done:
-                    outlet = futures[future]
-                    try:
-                        result = future.result()
-                    except Exception as e:
-                        logger.error(f"[Scheduler] Scan task failed for {outlet[0]} ({outlet[1]}): {e}")
-                        result = {
-                            'outletCode': outlet[0],
-                            'server': outlet[1],
-                            'lastModified': None,
-                            'status': 'Error',
-                            'errorDetails': str(e),
-                            'backupsize': None
-                        }
-                    results.append(result)
-        finally:
-            executor.shutdown(wait=False)
-
-        success = sum(1 for r in results if r['status'] == 'Successful')
-        failed = total - success
-
-        monitor.save_backup_status(results)
-        logger.info(f"[Scheduler] {scan_type} auto-scan complete: {success}/{total} successful")
-        _release_lock(scan_type, total, success, failed)
 
+def run_outlet_sync():
+    """Background job: sync outlets from central unless another worker just did.
+
+    Every gunicorn worker runs this job; the watermark check (half an
+    interval) and the sync lock make sure only one of them does the work.
+    """
+    try:
+        OutletSyncService().sync_if_stale(
+            trigger='scheduler',
+            max_age_minutes=max(1, Config.OUTLET_SYNC_INTERVAL_MINUTES // 2),
+        )
     except Exception as e:
-        logger.error(f"[Scheduler] {scan_type} auto-scan error: {e}")
+        logger.error(f"[Scheduler] Outlet sync error: {e}")
         logger.error(traceback.format_exc())
-        _release_lock(scan_type, total, success, failed, str(e)[:500])
 
 
 # ------------------------------------------------------------------
 # Status API
 # ------------------------------------------------------------------
 
-def get_scheduler_status():
-    """Return current scheduler status for both scan types + config."""
-    global _scheduler
-
-    # Sync this worker's schedule if another worker updated the DB config
-    _sync_schedule_from_db()
-    stale_reset_count = _clear_stale_running_statuses(Config.SCHEDULER_STALE_RUNNING_TIMEOUT_MINUTES)
-
-    cfg = get_scheduler_config()
-    result = {
-        'd_drive': None,
-        'ib_storage': None,
-        'schedulerEnabled': Config.SCHEDULER_ENABLED,
-        'schedulerRunning': bool(_scheduler and _scheduler.running),
-        'intervalMinutes': cfg['intervalMinutes'],
-        'activeHours': f"{cfg['startHour']}:00 - {cfg['endHour']}:00",
-        'activeDays': cfg['activeDays'],
-        'nextDDriveRun': None,
-        'nextIBStorageRun': None,
-        'staleStatusResetCount': stale_reset_count,
-    }
+def read_scan_statuses():
+    """Scheduler_Status rows as {'d_drive', 'ib_storage', 'combined'} entries.
 
+    A plain read (no stale-status cleanup or schedule resync), also used by
+    the stats event stream to detect state transitions.
+    """
+    result = {'d_drive': None, 'ib_storage': None, 'combined': None}
     try:
         conn = _get_db_connection()
         with conn:
@@ -517,10 +490,21 @@ def get_scheduler_status():
                     result['d_drive'] = entry
                 elif row[0] == 'IB_Storage':
                     result['ib_storage'] = entry
+                elif row[0] == 'Combined':
+                    result['combined'] = entry
     except Exception as e:
         logger.error(f"[Scheduler] Status read error: {e}")
+    return result
 
-    # Next run times from APScheduler
+
+def next_run_times():
+    """Next run time of each job in this worker's APScheduler (ISO strings or None)."""
+    result = {
+        'nextDDriveRun': None,
+        'nextIBStorageRun': None,
+        'nextCombinedRun': None,
+        'nextOutletSyncRun': None,
+    }
     if _scheduler and _scheduler.running:
         for job in _scheduler.get_jobs():
             next_run = job.next_run_time
@@ -530,7 +514,46 @@ def get_scheduler_status():
                     result['nextDDriveRun'] = next_run_str
                 elif job.id == 'ib_storage_scan':
                     result['nextIBStorageRun'] = next_run_str
+                elif job.id == 'combined_scan':
+                    result['nextCombinedRun'] = next_run_str
+                elif job.id == 'outlet_sync':
+                    result['nextOutletSyncRun'] = next_run_str
+    return result
 
+
+def get_scheduler_status():
+    """Return current scheduler status for both scan types + config."""
+    global _scheduler
+
+    # Sync this worker's schedule if another worker updated the DB config
+    _sync_schedule_from_db()
+    stale_reset_count = _clear_stale_running_statuses(Config.SCHEDULER_STALE_RUNNING_TIMEOUT_MINUTES)
+
+    cfg = get_scheduler_config()
+    result = {
+        'd_drive': None,
+        'ib_storage': None,
+        'combined': None,
+        'scanMode': Config.SCHEDULER_SCAN_MODE,
+        'schedulerEnabled': Config.SCHEDULER_ENABLED,
+        'schedulerRunning': bool(_scheduler and _scheduler.running),
+        'intervalMinutes': cfg['intervalMinutes'],
+        'activeHours': f"{cfg['startHour']}:00 - {cfg['endHour']}:00",
+        'activeDays': cfg['activeDays'],
+        'nextDDriveRun': None,
+        'nextIBStorageRun': None,
+        'nextCombinedRun': None,
+        'nextOutletSyncRun': None,
+        'staleStatusResetCount': stale_reset_count,
+        # Adaptive SMB concurrency of this worker process, per scan type
+        'scanConcurrency': get_limiter_snapshots(),
+        'smbPool': get_session_pool().snapshot(),
+        'dbPool': get_pool_snapshots(),
+        'outletSync': OutletSyncService().get_sync_status(),
+    }
+
+    result.update(read_scan_statuses())
+    result.update(next_run_times())
     return result
 
 
@@ -563,21 +586,8 @@ def init_scheduler(app):
 
     _scheduler = BackgroundScheduler(daemon=True)
 
-    _scheduler.add_job(
-        run_d_drive_scan,
-        trigger=_build_trigger(cron_hours, cron_days, 0, interval),
-        id='d_drive_scan',
-        name='D Drive Auto-Scan',
-        misfire_grace_time=300, coalesce=True, max_instances=1,
-    )
-
-    _scheduler.add_job(
-        run_ib_storage_scan,
-        trigger=_build_trigger(cron_hours, cron_days, 5, interval),
-        id='ib_storage_scan',
-        name='IBSTORAGE Auto-Scan',
-        misfire_grace_time=300, coalesce=True, max_instances=1,
-    )
+    _add_scan_jobs(cron_hours, cron_days, interval)
+    _add_outlet_sync_job()
 
     _applied_config = (interval, start_h, end_h, tuple(sorted(active_days)))
     _scheduler.start()
@@ -0,0 +1,256 @@
+import threading
+import time
+from contextlib import contextmanager
+from smbclient import register_session, delete_session
+from app.config import Config
+from app.logging_config import get_scheduler_logger
+
+
+class _PooledSession:
+    def __init__(self):
+        self.setup_lock = threading.Lock()
+        self.session = None
+        self.dialect = None
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.closing = False  # being evicted/invalidated; acquire must not reuse it
+        self.retired = False  # its close has started (runs once)
+        self.closed = threading.Event()  # set once its connection is deleted
+
+    def is_connected(self):
+        try:
+            return self.session is not None and self.session.connection.transport.connected
+        except AttributeError:
+            return False
+
+
+class SMBSessionPool:
+    """Keeps authenticated SMB sessions warm across checks and scans.
+
+    Before the pool, every check_server called register_session and then
+    delete_session, paying a full TCP connect + NTLM negotiate + session setup
+    per outlet per scan. Sessions are now kept in smbclient's connection cache
+    and only torn down when:
+    - they have been idle longer than SMB_SESSION_IDLE_TTL_SECONDS (checked
+      every EVICTION_INTERVAL by a daemon thread, so sessions left after a
+      scan do not stay open until the next one),
+    - a check hits SMBConnectionClosed (or session setup fails), or
+    - OutletSyncService sees the outlet's IP address change.
+    An invalidated session still checked out by another thread is closed
+    once its last user releases it.
+    """
+
+    EVICTION_INTERVAL = 30  # seconds between idle sweeps
+
+    def __init__(self, idle_ttl):
+        self.idle_ttl = idle_ttl
+        self.logger = get_scheduler_logger()
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._last_eviction = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._setup_seconds_total = 0.0
+        self._last_setup_seconds = None
+
+    @staticmethod
+    def _key(server):
+        return server.lower()
+
+    # ------------------------------------------------------------------
+    # Checkout
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def session(self, server, username=None, password=None):
+        """Context manager yielding a ready SMB session for server."""
+        entry, session = self.acquire(server, username, password)
+        try:
+            yield session
+        finally:
+            self.release(server, entry)
+
+    def acquire(self, server, username=None, password=None):
+        """Check out server's pool entry with a registered session, reusing a warm one when possible.
+
+        Returns (entry, session); hand the entry back with release().
+        """
+        self.evict_idle()
+        key = self._key(server)
+        retiring = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.closing:
+                retiring, entry = entry, None
+            if entry is None:
+                entry = _PooledSession()
+                self._entries[key] = entry
+            entry.in_use += 1
+
+        try:
+            if retiring is not None:
+                # Wait until the old connection is closed; register_session
+                # would otherwise hand back the cached one being torn down
+                retiring.closed.wait()
+            with entry.setup_lock:
+                warm = entry.is_connected()
+                started = time.monotonic()
+                # Cheap cache lookup when warm; full negotiate + auth when not
+                session = register_session(server, username=username, password=password)
+                elapsed = time.monotonic() - started
+                entry.session = session
+                try:
+                    entry.dialect = session.connection.dialect
+                except AttributeError:
+                    entry.dialect = None
+        except Exception:
+            if self._drop_use(entry):
+                self._retire(key, entry)
+            else:
+                self.invalidate(server)
+            raise
+
+        with self._lock:
+            if warm:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._setup_seconds_total += elapsed
+                self._last_setup_seconds = elapsed
+        return entry, session
+
+    def release(self, server, entry):
+        if self._drop_use(entry):
+            self._retire(self._key(server), entry)
+
+    def _drop_use(self, entry):
+        """Give back one checkout of entry; True when it was the last use of a closing entry."""
+        with self._lock:
+            if entry.in_use > 0:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+            if entry.closing and entry.in_use == 0 and not entry.retired:
+                entry.retired = True
+                return True
+            return False
+
+    def dialect(self, server):
+        """SMB dialect negotiated with server, if a session is pooled."""
+        with self._lock:
+            entry = self._entries.get(self._key(server))
+            return entry.dialect if entry else None
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+
+    def invalidate(self, server):
+        """Drop the pooled session for server and close its connection.
+
+        While other threads still have the session checked out the close is
+        left to the last release(), so it is not torn down under them.
+        """
+        if not server:
+            return
+        key = self._key(server)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.closing:
+                    return  # already being closed
+                entry.closing = True
+                self.invalidations += 1
+                if entry.in_use:
+                    return
+                entry.retired = True
+        if entry is None:
+            self._close(server)
+        else:
+            self._retire(key, entry)
+
+    def evict_idle(self, force=False):
+        """Close sessions idle longer than idle_ttl (at most every EVICTION_INTERVAL seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_eviction < self.EVICTION_INTERVAL:
+                return 0
+            self._last_eviction = now
+            expired = [
+                (key, entry) for key, entry in self._entries.items()
+                if not entry.closing and entry.in_use == 0 and now - entry.last_used > self.idle_ttl
+            ]
+            for _, entry in expired:
+                entry.closing = True
+                entry.retired = True
+            self.evictions += len(expired)
+        for key, entry in expired:
+            self._retire(key, entry)
+        return len(expired)
+
+    def start_evictor(self):
+        """Run evict_idle every EVICTION_INTERVAL seconds in a daemon thread."""
+        threading.Thread(target=self._evict_periodically, name='smb-session-evictor', daemon=True).start()
+
+    def _evict_periodically(self):
+        while True:
+            time.sleep(self.EVICTION_INTERVAL)
+            try:
+                self.evict_idle(force=True)
+            except Exception as e:
+                self.logger.warning(f"[SMBPool] Idle session eviction failed: {str(e)}")
+
+    def _retire(self, key, entry):
+        """Close a closing entry's connection, then drop it from the pool.
+
+        The entry stays registered (marked closing) until delete_session has
+        returned, so a concurrent acquire for the same server waits for the
+        close instead of getting the connection that is being torn down.
+        """
+        with entry.setup_lock:
+            self._close(key)
+        entry.closed.set()
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def _close(self, server):
+        try:
+            delete_session(server)
+        except Exception as e:
+            self.logger.debug(f"[SMBPool] Session cleanup failed for {server}: {str(e)}")
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'inUse': sum(1 for e in self._entries.values() if e.in_use),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'avgSetupMs': round(self._setup_seconds_total / self.misses * 1000) if self.misses else None,
+                'lastSetupMs': round(self._last_setup_seconds * 1000) if self._last_setup_seconds is not None else None,
+                'idleTtlSeconds': self.idle_ttl,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_session_pool():
+    """Process-wide SMB session pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMBSessionPool(Config.SMB_SESSION_IDLE_TTL_SECONDS)
+            _pool.start_evictor()
+        return _pool
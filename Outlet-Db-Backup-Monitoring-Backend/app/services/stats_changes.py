@@ -0,0 +1,67 @@
+import base64
+import json
+from datetime import date
+
+
+def encode_change_token(scan_date, high_water):
+    """Opaque ?since= token: the scan date and ROWVERSION bound a client is synced to."""
+    payload = {'d': scan_date.isoformat(), 'v': high_water.hex()}
+    token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode())
+    return token.decode().rstrip('=')
+
+
+def decode_change_token(token):
+    """(scan_date, high_water bytes) from a token; raises ValueError when invalid."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        high_water = bytes.fromhex(payload['v'])
+        if len(high_water) != 8:
+            raise ValueError
+        return date.fromisoformat(payload['d']), high_water
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid since token")
+
+
+def read_stat_changes(conn, table, stats_columns, since=None):
+    """Rows of the latest scan date changed after the since token.
+
+    Returns (rows, scan_date, token, reset). Every insert or update of a
+    stats row (save_backup_status) stamps its RowVer; the upper bound is
+    MIN_ACTIVE_ROWVERSION(), read before the rows, so a save still in flight
+    with a lower RowVer is picked up by the next call instead of being
+    skipped. reset is True when the whole latest scan date is returned: no
+    or stale token (the latest ScanDate moved on), or RowVer not there yet
+    (migration_add_stats_rowversion.sql), in which case token is None.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT MIN_ACTIVE_ROWVERSION(),
+               (SELECT TOP (1) ScanDate FROM [dbo].[{table}] ORDER BY ScanDate DESC),
+               COL_LENGTH('dbo.{table}', 'RowVer')
+    """)
+    high_water, scan_date, has_rowver = cursor.fetchone()
+    if scan_date is None:
+        return [], None, None, True
+    if isinstance(scan_date, str):
+        scan_date = date.fromisoformat(scan_date[:10])
+
+    query = f"""
+        SELECT {stats_columns}
+        FROM [dbo].[{table}] b
+        LEFT JOIN [dbo].[Outlets] o ON b.OutletServer = o.OutletCode
+        WHERE b.ScanDate = ?
+    """
+    params = [scan_date]
+    reset = not (since and has_rowver and since[0] == scan_date)
+    if has_rowver:
+        query += " AND b.RowVer < ?"
+        params.append(high_water)
+        if not reset:
+            query += " AND b.RowVer >= ?"
+            params.append(since[1])
+    query += " ORDER BY b.OutletServer"
+
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    token = encode_change_token(scan_date, bytes(high_water)) if has_rowver else None
+    return rows, scan_date, token, reset
@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+import threading
+from app.config import Config
+
+# ?format= value -> response mimetype
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+# Each running export holds a pooled database connection until its download
+# ends, so only a few may run at once per worker
+_export_slots = threading.BoundedSemaphore(max(1, Config.STATS_EXPORT_MAX_CONCURRENT))
+
+
+def try_start_export():
+    """Take an export slot; False when STATS_EXPORT_MAX_CONCURRENT exports are already running."""
+    return _export_slots.acquire(blocking=False)
+
+
+def finish_export():
+    """Give back the slot of try_start_export()."""
+    _export_slots.release()
+
+
+def _serialize_chunk(records, fmt, fields):
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore').writerows(records)
+        return buffer.getvalue()
+    return ''.join(json.dumps(record, default=str) + '\n' for record in records)
+
+
+def stream_export(chunks, fmt, fields):
+    """Serialize record chunks (lists of dicts) to NDJSON or CSV, one piece per chunk.
+
+    Only the chunk being written is held in memory, so the size of an export
+    does not change the worker's footprint. CSV starts with a header row of
+    fields, in that column order.
+    """
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(fields)
+        yield buffer.getvalue()
+    for records in chunks:
+        yield _serialize_chunk(records, fmt, fields)
@@ -0,0 +1,225 @@
+import base64
+import json
+from datetime import date, datetime
+from app.config import Config
+
+# ?sort= key -> stats column; each one leads an index after ScanDate
+# (migration_add_stats_sort_indexes.sql), OutletServer breaks ties
+SORT_COLUMNS = {
+    'outlet': 'b.OutletServer',
+    'status': 'b.Status',
+    'lastModified': 'b.LastBackupTakenUtc',
+    'size': 'b.BackupFileSizeBytes',
+}
+
+# ?status= value -> predicate (same Successful/Failed split as the daily summary)
+STATUS_FILTERS = {
+    'successful': "b.Status = 'Successful'",
+    'failed': "b.Status != 'Successful'",
+}
+
+PAGE_ARGS = ('limit', 'cursor', 'sort', 'status', 'search')
+MAX_SEARCH_LENGTH = 50
+
+
+def parse_filter_args(args):
+    """status/search query params as a filters dict; raises ValueError when invalid."""
+    status = (args.get('status') or '').strip().lower() or None
+    if status and status not in STATUS_FILTERS:
+        raise ValueError(f"status must be one of {sorted(STATUS_FILTERS)}")
+    search = (args.get('search') or '').strip() or None
+    if search and len(search) > MAX_SEARCH_LENGTH:
+        raise ValueError(f"search must be at most {MAX_SEARCH_LENGTH} characters")
+    return {'status': status, 'search': search}
+
+
+def parse_page_args(args):
+    """Paging query params as a page dict, or None when none were given.
+
+    limit (1..STATS_PAGE_MAX_SIZE, default STATS_PAGE_SIZE), sort (a
+    SORT_COLUMNS key, '-' prefix for descending, default 'outlet'), cursor
+    (nextCursor of the previous page, only valid with the same sort) plus the
+    status/search filters. Raises ValueError when a value is invalid.
+    """
+    if not any(args.get(name) for name in PAGE_ARGS):
+        return None
+
+    try:
+        limit = int(args.get('limit') or Config.STATS_PAGE_SIZE)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if not 1 <= limit <= Config.STATS_PAGE_MAX_SIZE:
+        raise ValueError(f"limit must be between 1 and {Config.STATS_PAGE_MAX_SIZE}")
+
+    sort = args.get('sort') or 'outlet'
+    if sort.lstrip('-') not in SORT_COLUMNS:
+        raise ValueError(f"sort must be one of {sorted(SORT_COLUMNS)} (prefix '-' for descending)")
+
+    page = {
+        'limit': limit,
+        'sort': sort.lstrip('-'),
+        'descending': sort.startswith('-'),
+        'after': None,
+    }
+    page.update(parse_filter_args(args))
+    if args.get('cursor'):
+        page['after'] = decode_cursor(args['cursor'], sort)
+    return page
+
+
+def encode_cursor(row, page):
+    """Opaque cursor after row (a page query row, keyset columns last)."""
+    scan_date, value, outlet = row[-3:]
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    payload = {
+        's': ('-' if page['descending'] else '') + page['sort'],
+        'd': scan_date.isoformat() if isinstance(scan_date, date) else scan_date,
+        'v': value,
+        'k': outlet,
+    }
+    token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode())
+    return token.decode().rstrip('=')
+
+
+def decode_cursor(token, sort):
+    """(scan_date, value, outlet) from a cursor issued for the same sort."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        issued_for, scan_date, value, outlet = payload['s'], payload['d'], payload['v'], payload['k']
+        scan_date = date.fromisoformat(scan_date)
+        if value is not None:
+            if sort.lstrip('-') == 'lastModified':
+                value = datetime.fromisoformat(value)
+            elif sort.lstrip('-') == 'size':
+                value = int(value)
+            else:
+                value = str(value)
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if issued_for != sort:
+        raise ValueError("cursor was issued for a different sort")
+    return scan_date, value, str(outlet)
+
+
+def _escape_like(text):
+    """Escape LIKE wildcards so search is a plain substring match."""
+    for ch in ('\\', '%', '_', '['):
+        text = text.replace(ch, '\\' + ch)
+    return text
+
+
+def _after_clause(column, descending, value, outlet):
+    """Rows after (value, outlet) in (column, OutletServer) order.
+
+    SQL Server sorts NULL first ascending and last descending; the cursor
+    value may itself be NULL.
+    """
+    if column == 'b.OutletServer':
+        return ("b.OutletServer < ?" if descending else "b.OutletServer > ?"), [outlet]
+    if value is None:
+        if descending:
+            return f"({column} IS NULL AND b.OutletServer < ?)", [outlet]
+        return f"({column} IS NOT NULL OR b.OutletServer > ?)", [outlet]
+    if descending:
+        return (f"({column} < ? OR {column} IS NULL OR ({column} = ? AND b.OutletServer < ?))",
+                [value, value, outlet])
+    return f"({column} > ? OR ({column} = ? AND b.OutletServer > ?))", [value, value, outlet]
+
+
+def _where(table, latest, outlet, date_from, date_to, filters, after=None):
+    """WHERE clause and params shared by the page and count queries.
+
+    latest=True restricts to the newest ScanDate; with a cursor the page stays
+    on the cursor's date, so a scan saved between two pages does not shift them.
+    """
+    clauses = []
+    params = []
+    if latest:
+        if after:
+            clauses.append("b.ScanDate = ?")
+            params.append(after[0])
+        else:
+            clauses.append(f"b.ScanDate = (SELECT TOP (1) ScanDate FROM [dbo].[{table}] ORDER BY ScanDate DESC)")
+    if outlet:
+        clauses.append("b.OutletServer = ?")
+        params.append(outlet)
+    if date_from:
+        clauses.append("b.ScanDate >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("b.ScanDate <= ?")
+        params.append(date_to)
+    if filters.get('status'):
+        clauses.append(STATUS_FILTERS[filters['status']])
+    if filters.get('search'):
+        clauses.append("b.OutletServer LIKE ? ESCAPE '\\'")
+        params.append(f"%{_escape_like(filters['search'])}%")
+    return clauses, params
+
+
+def build_page_query(table, stats_columns, page, latest, outlet=None, date_from=None, date_to=None):
+    """(sql, params) for one keyset page of a stats table.
+
+    Rows are ordered by ScanDate DESC, the sort column, then OutletServer, and
+    each page seeks past the previous page's last key instead of using OFFSET,
+    so a deep page reads no more rows than the first one. The query selects
+    stats_columns followed by the keyset columns (ScanDate, sort column,
+    OutletServer) and fetches one row more than the limit to detect a next page.
+    """
+    column = SORT_COLUMNS[page['sort']]
+    descending = page['descending']
+    after = page['after']
+
+    clauses, where_params = _where(table, latest, outlet, date_from, date_to, page, after)
+    if after:
+        after_sql, after_params = _after_clause(column, descending, after[1], after[2])
+        if latest:
+            clauses.append(after_sql)
+            where_params += after_params
+        else:
+            clauses.append(f"(b.ScanDate < ? OR (b.ScanDate = ? AND {after_sql}))")
+            where_params += [after[0], after[0]] + after_params
+
+    direction = 'DESC' if descending else 'ASC'
+    order = ["b.ScanDate DESC"]
+    if column != 'b.OutletServer':
+        order.append(f"{column} {direction}")
+    order.append(f"b.OutletServer {direction}")
+
+    sql = f"""
+        SELECT TOP (?) {stats_columns}, b.ScanDate, {column}, b.OutletServer
+        FROM [dbo].[{table}] b
+        LEFT JOIN [dbo].[Outlets] o ON b.OutletServer = o.OutletCode
+        WHERE {' AND '.join(clauses) if clauses else '1=1'}
+        ORDER BY {', '.join(order)}
+    """
+    return sql, [page['limit'] + 1] + where_params
+
+
+def build_count_query(table, filters, latest, outlet=None, date_from=None, date_to=None):
+    """(sql, params) counting the rows the page query walks through."""
+    clauses, params = _where(table, latest, outlet, date_from, date_to, filters)
+    sql = f"""
+        SELECT COUNT(*)
+        FROM [dbo].[{table}] b
+        WHERE {' AND '.join(clauses) if clauses else '1=1'}
+    """
+    return sql, params
+
+
+def build_export_query(table, stats_columns, filters, latest, outlet=None, date_from=None, date_to=None):
+    """(sql, params) for every row the filters match, in ScanDate DESC, OutletServer order.
+
+    The IX_*_ScanDate index already returns rows in that order, so the server
+    streams them without a sort and the caller can read them with fetchmany().
+    """
+    clauses, params = _where(table, latest, outlet, date_from, date_to, filters)
+    sql = f"""
+        SELECT {stats_columns}
+        FROM [dbo].[{table}] b
+        LEFT JOIN [dbo].[Outlets] o ON b.OutletServer = o.OutletCode
+        WHERE {' AND '.join(clauses) if clauses else '1=1'}
+        ORDER BY b.ScanDate DESC, b.OutletServer
+    """
+    return sql, params
@@ -0,0 +1,95 @@
+import json
+import threading
+from datetime import date
+import pyodbc
+
+# Stats_Version.ScanType values (Scheduler_Status / Backup_Daily_Summary naming)
+SNAPSHOT_SCAN_TYPES = ('D_Drive', 'IB_Storage')
+
+# Per-response payload fields kept out of the cached body (see stamp_body)
+VOLATILE_FIELDS = ('processingTime', 'timestamp')
+
+
+def bump_stats_version(cursor, scan_types):
+    """Advance Stats_Version for scan_types on the caller's cursor.
+
+    Called in the transaction that changes what the latest-stats payload
+    shows (saved results, moved outlet IPs), so the new version becomes
+    visible to every worker exactly when the change commits. No-op until
+    migration_add_stats_version.sql has run.
+    """
+    for scan_type in scan_types:
+        cursor.execute("""
+            IF OBJECT_ID('dbo.Stats_Version') IS NOT NULL
+            UPDATE [dbo].[Stats_Version]
+            SET Version = Version + 1, UpdatedAt = GETDATE()
+            WHERE ScanType = ?
+        """, (scan_type,))
+
+
+def read_stats_version(conn, scan_type):
+    """Current Stats_Version of scan_type, or None when the table or row is missing."""
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT Version FROM [dbo].[Stats_Version] WHERE ScanType = ?", (scan_type,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    except pyodbc.Error:
+        return None
+
+
+class StatsSnapshotCache:
+    """Per-process cache of the serialized latest-stats payload, one per scan type.
+
+    The version lives in SQL Server (Stats_Version), so all gunicorn workers
+    agree on it: a poll costs one primary-key read, and the payload is only
+    rebuilt (by one thread per scan type) after a save has bumped it. The
+    current year is part of the key because the advancedDate split depends
+    on it. VOLATILE_FIELDS are dropped from the cached body; stamp_body()
+    adds fresh values to each response.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_locks = {scan_type: threading.Lock() for scan_type in SNAPSHOT_SCAN_TYPES}
+        self._snapshots = {}  # scan_type -> (key, etag, body)
+
+    def get(self, scan_type, version, build):
+        """(etag, body bytes) for version, calling build() -> dict only on a miss."""
+        key = (version, date.today().year)
+        with self._lock:
+            cached = self._snapshots.get(scan_type)
+        if cached and cached[0] == key:
+            return cached[1], cached[2]
+
+        with self._build_locks[scan_type]:
+            with self._lock:
+                cached = self._snapshots.get(scan_type)
+            if cached and cached[0] == key:
+                return cached[1], cached[2]  # built by another thread meanwhile
+
+            payload = build()
+            for field in VOLATILE_FIELDS:
+                payload.pop(field, None)
+            payload['version'] = version
+            etag = f"{scan_type}-{version}-{key[1]}"
+            body = json.dumps(payload).encode()
+            with self._lock:
+                self._snapshots[scan_type] = (key, etag, body)
+            return etag, body
+
+
+_snapshot_cache = StatsSnapshotCache()
+
+
+def get_snapshot_cache():
+    """Process-wide StatsSnapshotCache."""
+    return _snapshot_cache
+
+
+def stamp_body(body, fields):
+    """Cached JSON object body with fields (e.g. processingTime, timestamp) appended."""
+    extra = json.dumps(fields)[1:-1].encode()
+    if not extra:
+        return body
+    return body[:-1] + b', ' + extra + b'}'
@@ -0,0 +1,225 @@
+import base64
+import json
+import queue
+import threading
+from app.config import Config
+from app.db_pool import get_local_connection
+from app.logging_config import get_scheduler_logger
+from app.services.stats_changes import decode_change_token
+from app.services.stats_snapshot import SNAPSHOT_SCAN_TYPES, read_stats_version
+
+logger = get_scheduler_logger()
+
+
+def encode_position(tokens):
+    """SSE event id: the change token of each scan type the client has seen."""
+    payload = json.dumps({scan_type: tokens.get(scan_type) for scan_type in SNAPSHOT_SCAN_TYPES},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_position(value):
+    """{scan_type: change token} from a Last-Event-ID; {} when missing or invalid."""
+    if not value:
+        return {}
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+        return {scan_type: payload.get(scan_type) for scan_type in SNAPSHOT_SCAN_TYPES}
+    except (ValueError, TypeError, AttributeError):
+        return {}
+
+
+def format_event(payload, position=None):
+    """One SSE message (data is JSON with a 'type', like the scan streams)."""
+    event_id = f"id: {position}\n" if position else ''
+    return f"{event_id}data: {json.dumps(payload)}\n\n"
+
+
+def _stats_event(scan_type, changes):
+    return {
+        'type': 'stats',
+        'scanType': scan_type,
+        'scanDate': changes['scanDate'],
+        'reset': changes['reset'],
+        'data': changes['normal'],
+        'advancedDate': changes['advancedDate'],
+        'count': len(changes['normal']),
+        'advancedDateCount': len(changes['advancedDate']),
+    }
+
+
+def _has_news(changes):
+    return bool(changes['reset'] or changes['normal'] or changes['advancedDate'])
+
+
+class _Subscriber:
+    def __init__(self, queue_size):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = False
+
+
+class StatsEventHub:
+    """Pushes stats deltas and scheduler transitions to this worker's SSE subscribers.
+
+    One background thread per worker is the single source: every
+    STATS_STREAM_POLL_SECONDS (or right away after notify()) it checks
+    Stats_Version and Scheduler_Status, reads the changed rows once through
+    the RowVer change tokens and puts the same event on every subscriber's
+    queue. The database work therefore does not grow with the number of open
+    dashboards, and saves made by the other gunicorn worker are picked up by
+    the next check. The thread idles while nobody is subscribed.
+
+    A subscriber whose queue overflows is dropped; its client reconnects with
+    Last-Event-ID and catches up from the change tokens.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()       # subscribers
+        self._poll_lock = threading.Lock()  # tokens, versions, scheduler state
+        self._wake = threading.Event()
+        self._subscribers = set()
+        self._thread = None
+        self._monitors = {}
+        self._tokens = {}
+        self._versions = {}
+        self._scheduler_state = None
+        self._primed = False
+
+    def _monitor(self, scan_type):
+        monitor = self._monitors.get(scan_type)
+        if monitor is None:
+            if scan_type == 'D_Drive':
+                from app.services.backup_service import BackupMonitor
+                monitor = BackupMonitor()
+            else:
+                from app.services.Ib_Storage_backup_service import IBStorageMonitor
+                monitor = IBStorageMonitor()
+            self._monitors[scan_type] = monitor
+        return monitor
+
+    def subscribe(self):
+        """Register a subscriber, or return None when STATS_STREAM_MAX_SUBSCRIBERS are connected."""
+        subscriber = _Subscriber(Config.STATS_STREAM_QUEUE_SIZE)
+        with self._poll_lock:
+            # Take the baseline before the subscriber's catch-up read, so the
+            # deltas published from here on leave no gap behind it (only
+            # happens while nobody is subscribed, so never when full)
+            if not self._primed:
+                self._poll(publish=False)
+            with self._lock:
+                # Check and add under one hold so concurrent connects cannot overshoot
+                if len(self._subscribers) >= Config.STATS_STREAM_MAX_SUBSCRIBERS:
+                    return None
+                self._subscribers.add(subscriber)
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='stats-event-hub', daemon=True)
+                    self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if not self._subscribers:
+                self._primed = False  # re-baseline when the next dashboard connects
+
+    def notify(self):
+        """Check for changes now (called after this worker commits a save or a scheduler state)."""
+        self._wake.set()
+
+    def catch_up(self, position):
+        """Initial events for a (re)connecting client at position (see decode_position).
+
+        Each scan type is sent as a delta since the client's token, or in full
+        (reset) when there is none or its scan date is no longer the latest;
+        the current scheduler state always follows.
+        """
+        tokens = dict(position)
+        for scan_type in SNAPSHOT_SCAN_TYPES:
+            since = None
+            if tokens.get(scan_type):
+                try:
+                    since = decode_change_token(tokens[scan_type])
+                except ValueError:
+                    since = None
+            changes = self._monitor(scan_type).get_backup_stat_changes(since)
+            if changes is None:
+                continue
+            tokens[scan_type] = changes['token']
+            if _has_news(changes):
+                yield format_event(_stats_event(scan_type, changes), encode_position(tokens))
+        with self._poll_lock:
+            state = self._scheduler_state
+        yield format_event({'type': 'scheduler', **(state or {})}, encode_position(tokens))
+
+    def _run(self):
+        while True:
+            self._wake.wait(Config.STATS_STREAM_POLL_SECONDS)
+            self._wake.clear()
+            with self._lock:
+                idle = not self._subscribers
+            if idle:
+                continue
+            try:
+                with self._poll_lock:
+                    self._poll(publish=True)
+            except Exception as e:
+                logger.error(f"[StatsStream] Poll error: {e}")
+
+    def _read_versions(self):
+        try:
+            with get_local_connection() as conn:
+                versions = {scan_type: read_stats_version(conn, scan_type) for scan_type in SNAPSHOT_SCAN_TYPES}
+        except Exception as e:
+            logger.error(f"[StatsStream] Stats_Version read error: {e}")
+            return None
+        return versions if all(v is not None for v in versions.values()) else None
+
+    def _poll(self, publish):
+        """Read what changed since the last poll and (if publish) fan it out. Caller holds _poll_lock."""
+        from app.services.scheduler_service import next_run_times, read_scan_statuses
+
+        versions = self._read_versions()
+        for scan_type in SNAPSHOT_SCAN_TYPES:
+            version = versions[scan_type] if versions else None
+            if scan_type in self._tokens:
+                if versions is not None and version == self._versions.get(scan_type):
+                    continue  # nothing saved since the last read
+                if versions is None and self._tokens[scan_type] is None:
+                    continue  # no migrations yet: only the initial snapshot is sent
+            since = decode_change_token(self._tokens[scan_type]) if self._tokens.get(scan_type) else None
+            changes = self._monitor(scan_type).get_backup_stat_changes(since)
+            if changes is None:
+                continue
+            self._tokens[scan_type] = changes['token']
+            self._versions[scan_type] = version
+            if publish and _has_news(changes):
+                self._publish(_stats_event(scan_type, changes))
+
+        state = {**read_scan_statuses(), **next_run_times()}
+        if publish and state != self._scheduler_state:
+            self._publish({'type': 'scheduler', **state})
+        self._scheduler_state = state
+        self._primed = True
+
+    def _publish(self, payload):
+        message = format_event(payload, encode_position(self._tokens))
+        with self._lock:
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.queue.put_nowait(message)
+                except queue.Full:
+                    subscriber.dropped = True
+                    self._subscribers.discard(subscriber)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_event_hub():
+    """Process-wide StatsEventHub."""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = StatsEventHub()
+        return _hub
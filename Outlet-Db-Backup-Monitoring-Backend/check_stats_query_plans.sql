@@ -0,0 +1,220 @@
+-- Plan regression check for the stats read queries (see migration_add_stats_indexes.sql)
+-- Run on a TEST or STAGING copy of the DBBAK database via SSMS (needs VIEW SERVER STATE)
+-- Everything runs in one transaction that is rolled back at the end. If a stats
+-- table has fewer than 1,000,000 rows, synthetic history (outlets 'PLANCHK...',
+-- dated before the real history) is added first so the queries are optimized as
+-- they would be against years of production data.
+--
+-- Each query below is a copy of the one the backend sends (keep them in sync).
+-- The check fails when a plan reads a stats table with a Table Scan or Clustered
+-- Index Scan, or when a query that must seek (latest scan, date range, unscanned
+-- outlets) has no Index Seek on it. The daily summary may use an ordered scan of
+-- the ScanDate index, which stops after the requested number of days.
+
+SET NOCOUNT ON;
+GO
+
+IF OBJECT_ID('tempdb..#check_plan') IS NOT NULL DROP PROCEDURE #check_plan;
+GO
+
+CREATE PROCEDURE #check_plan
+    @Name        NVARCHAR(100),
+    @Tag         NVARCHAR(100),
+    @TableName   NVARCHAR(128),
+    @RequireSeek BIT
+AS
+BEGIN
+    DECLARE @plan XML, @scans INT, @seeks INT;
+
+    SELECT TOP (1) @plan = qp.query_plan
+    FROM sys.dm_exec_cached_plans cp
+    CROSS APPLY sys.dm_exec_sql_text(cp.plan_handle) st
+    CROSS APPLY sys.dm_exec_query_plan(cp.plan_handle) qp
+    WHERE st.text LIKE N'%/* ' + @Tag + N' */%'
+      AND st.text NOT LIKE N'%dm_exec_sql_text%';
+
+    WITH XMLNAMESPACES (DEFAULT 'http://schemas.microsoft.com/sqlserver/2004/07/showplan')
+    SELECT
+        @scans = @plan.value('count(//RelOp[@PhysicalOp = "Table Scan" or @PhysicalOp = "Clustered Index Scan"]
+                                     /*/Object[@Table = sql:variable("@TableName")])', 'INT'),
+        @seeks = @plan.value('count(//RelOp[@PhysicalOp = "Index Seek" or @PhysicalOp = "Clustered Index Seek"]
+                                     /*/Object[@Table = sql:variable("@TableName")])', 'INT');
+
+    INSERT INTO #plan_check_results (CheckName, PlanFound, FullScans, Seeks, Passed)
+    VALUES (
+        @Name,
+        CASE WHEN @plan IS NULL THEN 0 ELSE 1 END,
+        @scans,
+        @seeks,
+        CASE WHEN @plan IS NOT NULL AND @scans = 0 AND (@RequireSeek = 0 OR @seeks > 0) THEN 1 ELSE 0 END
+    );
+END;
+GO
+
+IF OBJECT_ID('tempdb..#plan_check_results') IS NOT NULL DROP TABLE #plan_check_results;
+CREATE TABLE #plan_check_results (
+    CheckName  NVARCHAR(100) NOT NULL,
+    PlanFound  BIT           NOT NULL,
+    FullScans  INT           NULL,
+    Seeks      INT           NULL,
+    Passed     BIT           NOT NULL
+);
+GO
+
+SET XACT_ABORT ON;
+BEGIN TRANSACTION;
+
+DECLARE @target INT = 1000000;
+DECLARE @outlets INT = 800;
+DECLARE @have INT, @rows INT, @oldest DATE;
+
+-- ------------------------------------------------------------------
+-- Synthetic history up to @target rows per stats table
+-- ------------------------------------------------------------------
+
+SELECT @have = COUNT_BIG(*), @oldest = ISNULL(MIN(ScanDate), CAST(GETDATE() AS DATE)) FROM [dbo].[D_Drive_Backup_Stat];
+SET @rows = @target - @have;
+IF @rows > 0
+    INSERT INTO [dbo].[D_Drive_Backup_Stat]
+        (OutletServer, ScanDate, Status, LastBackupTaken, LastBackupTakenUtc,
+         BackupFile, BackupFileSize, BackupFileSizeBytes, ErrorDetails)
+    SELECT CONCAT('PLANCHK', i % @outlets),
+           DATEADD(day, -(1 + i / @outlets), @oldest),
+           CASE WHEN i % 7 = 0 THEN 'Error' ELSE 'Successful' END,
+           DATEADD(day, -(1 + i / @outlets), CAST(@oldest AS DATETIME)),
+           DATEADD(day, -(1 + i / @outlets), CAST(@oldest AS DATETIME2(3))),
+           'PLANCHK.bak', '1.5 GB', 1610612736,
+           CASE WHEN i % 7 = 0 THEN 'Server not Reachable' END
+    FROM (
+        SELECT TOP (@rows) CAST(ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) - 1 AS INT) AS i
+        FROM sys.all_columns a CROSS JOIN sys.all_columns b
+    ) n;
+
+SELECT @have = COUNT_BIG(*), @oldest = ISNULL(MIN(ScanDate), CAST(GETDATE() AS DATE)) FROM [dbo].[IB_Storage_Backup_Stat];
+SET @rows = @target - @have;
+IF @rows > 0
+    INSERT INTO [dbo].[IB_Storage_Backup_Stat]
+        (OutletServer, ScanDate, Status, LastBackupTaken, LastBackupTakenUtc,
+         BackupFile, BackupFileSize, BackupFileSizeBytes, ErrorDetails, DriveLetter)
+    SELECT CONCAT('PLANCHK', i % @outlets),
+           DATEADD(day, -(1 + i / @outlets), @oldest),
+           CASE WHEN i % 7 = 0 THEN 'Error' ELSE 'Successful' END,
+           DATEADD(day, -(1 + i / @outlets), CAST(@oldest AS DATETIME)),
+           DATEADD(day, -(1 + i / @outlets), CAST(@oldest AS DATETIME2(3))),
+           'PLANCHK.bak', '1.5 GB', 1610612736,
+           CASE WHEN i % 7 = 0 THEN 'IBSTORAGE drive not found (checked e$-i$)' END,
+           'e$'
+    FROM (
+        SELECT TOP (@rows) CAST(ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) - 1 AS INT) AS i
+        FROM sys.all_columns a CROSS JOIN sys.all_columns b
+    ) n;
+
+UPDATE STATISTICS [dbo].[D_Drive_Backup_Stat];
+UPDATE STATISTICS [dbo].[IB_Storage_Backup_Stat];
+
+-- ------------------------------------------------------------------
+-- Run the backend queries (tagged with a per-run id so fresh plans are compiled)
+-- ------------------------------------------------------------------
+
+DECLARE @run NVARCHAR(36) = CONVERT(NVARCHAR(36), NEWID());
+DECLARE @today DATE = CAST(GETDATE() AS DATE);
+DECLARE @from DATE = DATEADD(day, -7, @today);
+DECLARE @sql NVARCHAR(MAX), @tag NVARCHAR(100), @table NVARCHAR(128), @quoted NVARCHAR(130);
+DECLARE @stats_columns NVARCHAR(MAX);
+
+DECLARE @tables TABLE (TableName NVARCHAR(128), ExtraColumn NVARCHAR(100));
+INSERT INTO @tables VALUES ('D_Drive_Backup_Stat', ''), ('IB_Storage_Backup_Stat', 'b.DriveLetter, ');
+
+DECLARE table_cursor CURSOR LOCAL FAST_FORWARD FOR SELECT TableName, ExtraColumn FROM @tables;
+DECLARE @extra NVARCHAR(100);
+OPEN table_cursor;
+FETCH NEXT FROM table_cursor INTO @table, @extra;
+WHILE @@FETCH_STATUS = 0
+BEGIN
+    SET @quoted = QUOTENAME(@table);  -- showplan names objects as [Table]
+
+    -- STATS_COLUMNS in backup_service.py / Ib_Storage_backup_service.py
+    SET @stats_columns = N'b.OutletServer, o.IPAddress, b.Status, b.LastBackupTakenUtc, '
+        + N'b.BackupFile, b.BackupFileSize, b.ScanDate, b.ErrorDetails, ' + @extra + N'b.BackupFileSizeBytes, '
+        + N'CASE WHEN YEAR(b.LastBackupTakenUtc) > YEAR(GETDATE()) THEN 1 ELSE 0 END';
+
+    -- get_all_backup_stats
+    SET @tag = CONCAT(N'plancheck latest ', @table, N' ', @run);
+    SET @sql = N'/* ' + @tag + N' */
+        WITH latest AS (
+            SELECT TOP (1) ScanDate FROM [dbo].[' + @table + N'] ORDER BY ScanDate DESC
+        )
+        SELECT ' + @stats_columns + N'
+        FROM latest
+        INNER JOIN [dbo].[' + @table + N'] b ON b.ScanDate = latest.ScanDate
+        LEFT JOIN [dbo].[Outlets] o ON b.OutletServer = o.OutletCode
+        ORDER BY b.OutletServer';
+    EXEC sp_executesql @sql;
+    EXEC #check_plan @Name = @tag, @Tag = @tag, @TableName = @quoted, @RequireSeek = 1;
+
+    -- get_filtered_backup_stats with a date range
+    SET @tag = CONCAT(N'plancheck range ', @table, N' ', @run);
+    SET @sql = N'/* ' + @tag + N' */
+        SELECT ' + @stats_columns + N'
+        FROM [dbo].[' + @table + N'] b
+        LEFT JOIN [dbo].[Outlets] o ON b.OutletServer = o.OutletCode
+        WHERE 1=1 AND b.ScanDate >= @P1 AND b.ScanDate <= @P2
+        ORDER BY b.ScanDate DESC, b.OutletServer';
+    EXEC sp_executesql @sql, N'@P1 DATE, @P2 DATE', @from, @today;
+    EXEC #check_plan @Name = @tag, @Tag = @tag, @TableName = @quoted, @RequireSeek = 1;
+
+    -- get_daily_summary
+    SET @tag = CONCAT(N'plancheck summary ', @table, N' ', @run);
+    SET @sql = N'/* ' + @tag + N' */
+        SELECT
+            ScanDate,
+            COUNT(*) AS Total,
+            SUM(CASE WHEN Status = ''Successful'' THEN 1 ELSE 0 END) AS Successful,
+            SUM(CASE WHEN Status != ''Successful'' THEN 1 ELSE 0 END) AS Failed
+        FROM [dbo].[' + @table + N']
+        GROUP BY ScanDate
+        ORDER BY ScanDate DESC
+        OFFSET 0 ROWS FETCH NEXT @P1 ROWS ONLY';
+    EXEC sp_executesql @sql, N'@P1 INT', 30;
+    EXEC #check_plan @Name = @tag, @Tag = @tag, @TableName = @quoted, @RequireSeek = 0;
+
+    -- get_unscanned_outlets
+    SET @tag = CONCAT(N'plancheck unscanned ', @table, N' ', @run);
+    SET @sql = N'/* ' + @tag + N' */
+        SELECT o.OutletCode, o.IPAddress
+        FROM Outlets o
+        WHERE o.ActiveDepot = ''Y''
+        AND NOT EXISTS (
+            SELECT 1 FROM ' + @table + N' b
+            WHERE b.OutletServer = o.OutletCode
+            AND b.ScanDate = @P1
+        )';
+    EXEC sp_executesql @sql, N'@P1 DATE', @today;
+    EXEC #check_plan @Name = @tag, @Tag = @tag, @TableName = @quoted, @RequireSeek = 1;
+
+    FETCH NEXT FROM table_cursor INTO @table, @extra;
+END;
+CLOSE table_cursor;
+DEALLOCATE table_cursor;
+
+-- #temp tables are rolled back too; keep the results in a table variable
+DECLARE @results TABLE (CheckName NVARCHAR(100), PlanFound BIT, FullScans INT, Seeks INT, Passed BIT);
+INSERT INTO @results SELECT CheckName, PlanFound, FullScans, Seeks, Passed FROM #plan_check_results;
+
+ROLLBACK TRANSACTION;
+
+-- ------------------------------------------------------------------
+-- Verdict
+-- ------------------------------------------------------------------
+
+SELECT CheckName, PlanFound, FullScans, Seeks, Passed FROM @results ORDER BY CheckName;
+
+IF EXISTS (SELECT 1 FROM @results WHERE Passed = 0)
+    RAISERROR('Stats query plan check FAILED: see rows with Passed = 0', 16, 1);
+ELSE
+    PRINT 'Stats query plan check passed';
+GO
+
+DROP PROCEDURE #check_plan;
+DROP TABLE #plan_check_results;
+GO
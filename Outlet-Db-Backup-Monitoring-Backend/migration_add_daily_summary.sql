@@ -0,0 +1,50 @@
+-- Migration: Create Backup_Daily_Summary table (per-day scan counts for the dashboards)
+-- Run this script ONCE on the DBBAK database via SSMS
+-- save_backup_status keeps it current by applying status-transition deltas in the
+-- same transaction as the stats rows; /backup-stats/daily-summary and
+-- /ibstorage-stats/daily-summary read it by primary key.
+-- To recompute it from history later: python rebuild_daily_summary.py
+
+CREATE TABLE [dbo].[Backup_Daily_Summary] (
+    ScanType    VARCHAR(20)  NOT NULL,
+    ScanDate    DATE         NOT NULL,
+    Total       INT          NOT NULL DEFAULT 0,
+    Successful  INT          NOT NULL DEFAULT 0,
+    Failed      INT          NOT NULL DEFAULT 0,
+    UpdatedAt   DATETIME     NOT NULL DEFAULT GETDATE(),
+    CONSTRAINT PK_Backup_Daily_Summary PRIMARY KEY (ScanType, ScanDate DESC),
+    CONSTRAINT CK_Backup_Daily_Summary_ScanType CHECK (ScanType IN ('D_Drive', 'IB_Storage'))
+);
+GO
+
+-- Initial fill from the existing history, done like rebuild_daily_summary.py:
+-- lock the stats table first, then replace that scan type's rows, so saves made
+-- by a running backend are neither missed nor counted twice
+DECLARE @rows INT;
+
+BEGIN TRANSACTION;
+SELECT @rows = COUNT(*) FROM [dbo].[D_Drive_Backup_Stat] WITH (TABLOCK, HOLDLOCK);
+DELETE FROM [dbo].[Backup_Daily_Summary] WHERE ScanType = 'D_Drive';
+INSERT INTO [dbo].[Backup_Daily_Summary] (ScanType, ScanDate, Total, Successful, Failed, UpdatedAt)
+SELECT 'D_Drive', ScanDate,
+       COUNT(*),
+       SUM(CASE WHEN Status = 'Successful' THEN 1 ELSE 0 END),
+       SUM(CASE WHEN Status != 'Successful' THEN 1 ELSE 0 END),
+       GETDATE()
+FROM [dbo].[D_Drive_Backup_Stat]
+GROUP BY ScanDate;
+COMMIT TRANSACTION;
+
+BEGIN TRANSACTION;
+SELECT @rows = COUNT(*) FROM [dbo].[IB_Storage_Backup_Stat] WITH (TABLOCK, HOLDLOCK);
+DELETE FROM [dbo].[Backup_Daily_Summary] WHERE ScanType = 'IB_Storage';
+INSERT INTO [dbo].[Backup_Daily_Summary] (ScanType, ScanDate, Total, Successful, Failed, UpdatedAt)
+SELECT 'IB_Storage', ScanDate,
+       COUNT(*),
+       SUM(CASE WHEN Status = 'Successful' THEN 1 ELSE 0 END),
+       SUM(CASE WHEN Status != 'Successful' THEN 1 ELSE 0 END),
+       GETDATE()
+FROM [dbo].[IB_Storage_Backup_Stat]
+GROUP BY ScanDate;
+COMMIT TRANSACTION;
+GO
@@ -0,0 +1,14 @@
+-- Migration: Create Outlet_Host_Profile table (per-outlet SMB capability cache)
+-- Run this script ONCE on the DBBAK database via SSMS
+-- Remembers which drive letter last held IBSTORAGE so scans skip the drive probe.
+-- Rows are rewritten by the scanner; deleting them is always safe.
+
+CREATE TABLE [dbo].[Outlet_Host_Profile] (
+    OutletCode      NVARCHAR(50)   NOT NULL,
+    IBStorageDrive  NVARCHAR(10)   NULL,
+    IBStoragePath   NVARCHAR(255)  NULL,
+    SMBDialect      NVARCHAR(10)   NULL,
+    UpdatedAt       DATETIME       NOT NULL DEFAULT GETDATE(),
+    CONSTRAINT PK_Outlet_Host_Profile PRIMARY KEY (OutletCode)
+);
+GO
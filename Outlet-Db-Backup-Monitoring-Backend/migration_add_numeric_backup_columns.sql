@@ -0,0 +1,32 @@
+-- Migration: Add typed backup size / time columns to D_Drive_Backup_Stat and IB_Storage_Backup_Stat
+-- Run this script ONCE on the DBBAK database via SSMS, before deploying the updated backend code
+-- BackupFileSizeBytes holds the exact file size; BackupFileSize ('2.45 GB') is kept for the frontend.
+-- LastBackupTakenUtc holds the backup file's last write time (UTC) as DATETIME2;
+-- LastBackupTaken is still written for older readers.
+
+ALTER TABLE [dbo].[D_Drive_Backup_Stat] ADD
+    BackupFileSizeBytes BIGINT       NULL,
+    LastBackupTakenUtc  DATETIME2(3) NULL;
+GO
+
+ALTER TABLE [dbo].[IB_Storage_Backup_Stat] ADD
+    BackupFileSizeBytes BIGINT       NULL,
+    LastBackupTakenUtc  DATETIME2(3) NULL;
+GO
+
+-- Backfill from the legacy columns. Sizes were stored rounded to 0.01 GB, so
+-- backfilled byte counts are approximate; rows written from now on are exact.
+-- LastBackupTaken may hold a DATETIME or an ISO string ('2025-01-31T22:15:03+00:00'),
+-- so it goes through its ISO text form (an offset, if present, is applied);
+-- unparseable values stay NULL.
+UPDATE [dbo].[D_Drive_Backup_Stat]
+SET BackupFileSizeBytes = CAST(TRY_CONVERT(DECIMAL(18, 2), REPLACE(BackupFileSize, ' GB', '')) * 1073741824 AS BIGINT),
+    LastBackupTakenUtc  = CONVERT(DATETIME2(3), SWITCHOFFSET(TRY_CONVERT(DATETIMEOFFSET(3), CONVERT(NVARCHAR(50), LastBackupTaken, 126)), '+00:00'))
+WHERE BackupFileSizeBytes IS NULL AND LastBackupTakenUtc IS NULL;
+GO
+
+UPDATE [dbo].[IB_Storage_Backup_Stat]
+SET BackupFileSizeBytes = CAST(TRY_CONVERT(DECIMAL(18, 2), REPLACE(BackupFileSize, ' GB', '')) * 1073741824 AS BIGINT),
+    LastBackupTakenUtc  = CONVERT(DATETIME2(3), SWITCHOFFSET(TRY_CONVERT(DATETIMEOFFSET(3), CONVERT(NVARCHAR(50), LastBackupTaken, 126)), '+00:00'))
+WHERE BackupFileSizeBytes IS NULL AND LastBackupTakenUtc IS NULL;
+GO
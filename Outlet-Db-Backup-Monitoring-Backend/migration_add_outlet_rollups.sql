@@ -0,0 +1,55 @@
+-- Migration: Create Backup_Outlet_Rollup table (weekly/monthly per-outlet rollups for reports)
+-- Run this script ONCE on the DBBAK database via SSMS (after migration_add_numeric_backup_columns.sql)
+-- When a scan finishes, the week and month containing its scan date are re-aggregated
+-- from the stats table for every outlet; /backup-stats/rollups and
+-- /ibstorage-stats/rollups read this table instead of the raw per-day rows.
+-- Granularity: 'W' = week starting Monday, 'M' = calendar month (PeriodStart = first day).
+
+CREATE TABLE [dbo].[Backup_Outlet_Rollup] (
+    ScanType            VARCHAR(20)   NOT NULL,
+    Granularity         CHAR(1)       NOT NULL,
+    PeriodStart         DATE          NOT NULL,
+    OutletServer        NVARCHAR(50)  NOT NULL,
+    SuccessDays         INT           NOT NULL DEFAULT 0,
+    FailureDays         INT           NOT NULL DEFAULT 0,
+    FirstFailure        DATE          NULL,
+    LastFailure         DATE          NULL,
+    AvgBackupSizeBytes  BIGINT        NULL,
+    UpdatedAt           DATETIME      NOT NULL DEFAULT GETDATE(),
+    CONSTRAINT PK_Backup_Outlet_Rollup PRIMARY KEY (ScanType, Granularity, PeriodStart DESC, OutletServer),
+    CONSTRAINT CK_Backup_Outlet_Rollup_Granularity CHECK (Granularity IN ('W', 'M')),
+    CONSTRAINT CK_Backup_Outlet_Rollup_ScanType CHECK (ScanType IN ('D_Drive', 'IB_Storage'))
+);
+GO
+
+-- Initial fill from the existing history (1900-01-01 was a Monday, so the week
+-- start does not depend on SET DATEFIRST)
+WITH history AS (
+    SELECT 'D_Drive' AS ScanType, OutletServer, ScanDate, Status, BackupFileSizeBytes
+    FROM [dbo].[D_Drive_Backup_Stat]
+    UNION ALL
+    SELECT 'IB_Storage', OutletServer, ScanDate, Status, BackupFileSizeBytes
+    FROM [dbo].[IB_Storage_Backup_Stat]
+),
+periods AS (
+    SELECT h.*, g.Granularity,
+           CASE g.Granularity
+               WHEN 'W' THEN DATEADD(day, -(DATEDIFF(day, '19000101', h.ScanDate) % 7), h.ScanDate)
+               ELSE DATEFROMPARTS(YEAR(h.ScanDate), MONTH(h.ScanDate), 1)
+           END AS PeriodStart
+    FROM history h
+    CROSS JOIN (VALUES ('W'), ('M')) AS g (Granularity)
+)
+INSERT INTO [dbo].[Backup_Outlet_Rollup]
+    (ScanType, Granularity, PeriodStart, OutletServer, SuccessDays, FailureDays,
+     FirstFailure, LastFailure, AvgBackupSizeBytes, UpdatedAt)
+SELECT ScanType, Granularity, PeriodStart, OutletServer,
+       SUM(CASE WHEN Status = 'Successful' THEN 1 ELSE 0 END),
+       SUM(CASE WHEN Status != 'Successful' THEN 1 ELSE 0 END),
+       MIN(CASE WHEN Status != 'Successful' THEN ScanDate END),
+       MAX(CASE WHEN Status != 'Successful' THEN ScanDate END),
+       AVG(CASE WHEN Status = 'Successful' THEN BackupFileSizeBytes END),
+       GETDATE()
+FROM periods
+GROUP BY ScanType, Granularity, PeriodStart, OutletServer;
+GO
@@ -0,0 +1,30 @@
+-- Migration: Outlet sync watermark + Outlet_Sync_History table
+-- Run this script ONCE on the DBBAK database via SSMS (after migration_add_outlet_sync_state.sql)
+-- LastCheckedAt is the watermark: the time of the last sync that completed, whether or
+-- not central had changed. Scans only sync on demand when it is older than
+-- OUTLET_SYNC_TTL_MINUTES. Every sync run is logged in Outlet_Sync_History.
+
+ALTER TABLE [dbo].[Outlet_Sync_State] ADD LastCheckedAt DATETIME NULL;
+GO
+
+UPDATE [dbo].[Outlet_Sync_State] SET LastCheckedAt = LastSyncedAt WHERE LastCheckedAt IS NULL;
+GO
+
+CREATE TABLE [dbo].[Outlet_Sync_History] (
+    Id            INT           IDENTITY(1,1) NOT NULL,
+    StartedAt     DATETIME      NOT NULL,
+    DurationMs    INT           NOT NULL,
+    TriggeredBy   VARCHAR(20)   NOT NULL,
+    Status        VARCHAR(20)   NOT NULL,
+    CentralRows   INT           NULL,
+    Inserted      INT           NOT NULL DEFAULT 0,
+    Updated       INT           NOT NULL DEFAULT 0,
+    Deactivated   INT           NOT NULL DEFAULT 0,
+    ErrorMessage  VARCHAR(500)  NULL,
+    CONSTRAINT PK_Outlet_Sync_History PRIMARY KEY (Id),
+    CONSTRAINT CK_Outlet_Sync_History_Status CHECK (Status IN ('Applied', 'Unchanged', 'Failed'))
+);
+GO
+
+CREATE INDEX IX_Outlet_Sync_History_StartedAt ON [dbo].[Outlet_Sync_History] (StartedAt DESC);
+GO
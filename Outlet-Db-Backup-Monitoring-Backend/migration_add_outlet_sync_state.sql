@@ -0,0 +1,14 @@
+-- Migration: Create Outlet_Sync_State table (fingerprint of the last central outlet sync)
+-- Run this script ONCE on the DBBAK database via SSMS
+-- OutletSyncService skips the sync when the central Depot/DepotIP row count and
+-- CHECKSUM_AGG match the values stored here. Deleting the row forces a full sync.
+
+CREATE TABLE [dbo].[Outlet_Sync_State] (
+    Id               INT        NOT NULL,
+    CentralRowCount  BIGINT     NOT NULL,
+    CentralChecksum  INT        NULL,
+    LastSyncedAt     DATETIME   NOT NULL DEFAULT GETDATE(),
+    CONSTRAINT PK_Outlet_Sync_State PRIMARY KEY (Id),
+    CONSTRAINT CK_Outlet_Sync_State_SingleRow CHECK (Id = 1)
+);
+GO
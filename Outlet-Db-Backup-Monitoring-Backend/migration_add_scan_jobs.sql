@@ -0,0 +1,11 @@
+-- Migration: Add CancelRequested and Stages to Scan_Registry for the /scans job API
+-- Run this script ONCE on the DBBAK database via SSMS (after migration_add_scan_registry.sql)
+-- DELETE /scans/<id> sets CancelRequested; the worker running the scan reads
+-- it back with its next progress write and stops starting new outlets.
+-- Stages holds the scan engine's per-stage timing (JSON) so GET /scans/<id>
+-- shows it whichever gunicorn worker answers.
+
+ALTER TABLE [dbo].[Scan_Registry]
+ADD CancelRequested BIT NOT NULL CONSTRAINT DF_Scan_Registry_CancelRequested DEFAULT 0,
+    Stages NVARCHAR(MAX) NULL;
+GO
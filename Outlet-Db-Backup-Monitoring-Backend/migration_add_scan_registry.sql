@@ -0,0 +1,30 @@
+-- Migration: Create Scan_Registry table (one active scan per scan type and date across all workers)
+-- Run this script ONCE on the DBBAK database via SSMS
+-- A scan (manual, SSE or scheduled) claims its (ScanType, ScanDate) row under
+-- the 'ScanRegistry' app lock; while a Running row of the same or an
+-- overlapping type (Combined covers both) has a fresh HeartbeatAt, further
+-- requests attach to its progress instead of starting another scan. The row
+-- is reused by the next scan of that type and date.
+
+CREATE TABLE [dbo].[Scan_Registry] (
+    ScanType      VARCHAR(20)       NOT NULL,
+    ScanDate      DATE              NOT NULL,
+    ScanId        UNIQUEIDENTIFIER  NOT NULL,
+    Status        VARCHAR(20)       NOT NULL,
+    TriggeredBy   VARCHAR(20)       NOT NULL,
+    Owner         NVARCHAR(100)     NULL,
+    StartedAt     DATETIME          NOT NULL DEFAULT GETDATE(),
+    HeartbeatAt   DATETIME          NOT NULL DEFAULT GETDATE(),
+    FinishedAt    DATETIME          NULL,
+    Total         INT               NULL,
+    Completed     INT               NOT NULL DEFAULT 0,
+    Successful    INT               NOT NULL DEFAULT 0,
+    Failed        INT               NOT NULL DEFAULT 0,
+    CurrentOutlet NVARCHAR(50)      NULL,
+    ErrorMessage  NVARCHAR(500)     NULL,
+    CONSTRAINT PK_Scan_Registry PRIMARY KEY (ScanType, ScanDate),
+    CONSTRAINT UQ_Scan_Registry_ScanId UNIQUE (ScanId),
+    CONSTRAINT CK_Scan_Registry_ScanType CHECK (ScanType IN ('D_Drive', 'IB_Storage', 'Combined')),
+    CONSTRAINT CK_Scan_Registry_Status CHECK (Status IN ('Running', 'Completed', 'Failed', 'Cancelled'))
+);
+GO
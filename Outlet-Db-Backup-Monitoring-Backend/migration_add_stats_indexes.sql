@@ -0,0 +1,27 @@
+-- Migration: Covering ScanDate indexes for the stats tables + Outlets(ActiveDepot, OutletCode)
+-- Run this script ONCE on the DBBAK database via SSMS (after migration_add_numeric_backup_columns.sql)
+-- The (OutletServer, ScanDate) primary keys only help per-outlet lookups. These
+-- indexes serve the latest-scan read, date-range filters and the daily summary
+-- without touching the full history:
+--   - TOP (1) ScanDate ORDER BY ScanDate DESC  -> one-row seek
+--   - ScanDate = @latest / BETWEEN @from AND @to -> range seek, already in
+--     (ScanDate DESC, OutletServer) order, no key lookups
+--   - GROUP BY ScanDate ORDER BY ScanDate DESC  -> ordered stream aggregate that
+--     stops after the requested number of days
+-- Verify the plans with check_stats_query_plans.sql.
+
+CREATE NONCLUSTERED INDEX IX_D_Drive_Backup_Stat_ScanDate
+    ON [dbo].[D_Drive_Backup_Stat] (ScanDate DESC, OutletServer)
+    INCLUDE (Status, LastBackupTakenUtc, BackupFile, BackupFileSize, BackupFileSizeBytes, ErrorDetails);
+GO
+
+CREATE NONCLUSTERED INDEX IX_IB_Storage_Backup_Stat_ScanDate
+    ON [dbo].[IB_Storage_Backup_Stat] (ScanDate DESC, OutletServer)
+    INCLUDE (Status, LastBackupTakenUtc, BackupFile, BackupFileSize, BackupFileSizeBytes, ErrorDetails, DriveLetter);
+GO
+
+-- Active outlet lists (scan targets, filter dropdowns) seek on ActiveDepot = 'Y'
+CREATE NONCLUSTERED INDEX IX_Outlets_ActiveDepot_OutletCode
+    ON [dbo].[Outlets] (ActiveDepot, OutletCode)
+    INCLUDE (IPAddress);
+GO
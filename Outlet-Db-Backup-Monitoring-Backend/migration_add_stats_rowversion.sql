@@ -0,0 +1,24 @@
+-- Migration: Add RowVer (ROWVERSION) to the stats tables for the /changes delta endpoints
+-- Run this script ONCE on the DBBAK database via SSMS (after migration_add_stats_indexes.sql)
+-- SQL Server stamps RowVer on every INSERT and UPDATE, so each row saved by
+-- save_backup_status carries a database-wide increasing change sequence.
+-- /backup-stats/changes and /ibstorage-stats/changes return the rows of the
+-- latest ScanDate whose RowVer is at or above the client's token, read through
+-- the (ScanDate DESC, RowVer) indexes below.
+-- Adding the column stamps every existing row, so run it outside scan hours.
+
+ALTER TABLE [dbo].[D_Drive_Backup_Stat] ADD RowVer ROWVERSION NOT NULL;
+GO
+
+ALTER TABLE [dbo].[IB_Storage_Backup_Stat] ADD RowVer ROWVERSION NOT NULL;
+GO
+
+CREATE NONCLUSTERED INDEX IX_D_Drive_Backup_Stat_ScanDate_RowVer
+    ON [dbo].[D_Drive_Backup_Stat] (ScanDate DESC, RowVer)
+    INCLUDE (Status, LastBackupTakenUtc, BackupFile, BackupFileSize, BackupFileSizeBytes, ErrorDetails);
+GO
+
+CREATE NONCLUSTERED INDEX IX_IB_Storage_Backup_Stat_ScanDate_RowVer
+    ON [dbo].[IB_Storage_Backup_Stat] (ScanDate DESC, RowVer)
+    INCLUDE (Status, LastBackupTakenUtc, BackupFile, BackupFileSize, BackupFileSizeBytes, ErrorDetails, DriveLetter);
+GO
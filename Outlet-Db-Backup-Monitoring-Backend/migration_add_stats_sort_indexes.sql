@@ -0,0 +1,39 @@
+-- Migration: Keyset indexes for the paged/sorted stats reads
+-- Run this script ONCE on the DBBAK database via SSMS (after migration_add_stats_indexes.sql)
+-- /backup-stats and /ibstorage-stats pages are ordered by
+--   ScanDate DESC, <sort column>, OutletServer
+-- and each page seeks past the last key of the previous one (no OFFSET), so a
+-- page reads about `limit` rows however deep it is. The 'outlet' sort uses
+-- IX_*_ScanDate; these indexes cover the status, lastModified and size sorts.
+-- Within one scan date (the default latest-scan view) the descending variants
+-- read the same index backward.
+
+CREATE NONCLUSTERED INDEX IX_D_Drive_Backup_Stat_ScanDate_Status
+    ON [dbo].[D_Drive_Backup_Stat] (ScanDate DESC, Status, OutletServer)
+    INCLUDE (LastBackupTakenUtc, BackupFile, BackupFileSize, BackupFileSizeBytes, ErrorDetails);
+GO
+
+CREATE NONCLUSTERED INDEX IX_D_Drive_Backup_Stat_ScanDate_LastBackup
+    ON [dbo].[D_Drive_Backup_Stat] (ScanDate DESC, LastBackupTakenUtc, OutletServer)
+    INCLUDE (Status, BackupFile, BackupFileSize, BackupFileSizeBytes, ErrorDetails);
+GO
+
+CREATE NONCLUSTERED INDEX IX_D_Drive_Backup_Stat_ScanDate_Size
+    ON [dbo].[D_Drive_Backup_Stat] (ScanDate DESC, BackupFileSizeBytes, OutletServer)
+    INCLUDE (Status, LastBackupTakenUtc, BackupFile, BackupFileSize, ErrorDetails);
+GO
+
+CREATE NONCLUSTERED INDEX IX_IB_Storage_Backup_Stat_ScanDate_Status
+    ON [dbo].[IB_Storage_Backup_Stat] (ScanDate DESC, Status, OutletServer)
+    INCLUDE (LastBackupTakenUtc, BackupFile, BackupFileSize, BackupFileSizeBytes, ErrorDetails, DriveLetter);
+GO
+
+CREATE NONCLUSTERED INDEX IX_IB_Storage_Backup_Stat_ScanDate_LastBackup
+    ON [dbo].[IB_Storage_Backup_Stat] (ScanDate DESC, LastBackupTakenUtc, OutletServer)
+    INCLUDE (Status, BackupFile, BackupFileSize, BackupFileSizeBytes, ErrorDetails, DriveLetter);
+GO
+
+CREATE NONCLUSTERED INDEX IX_IB_Storage_Backup_Stat_ScanDate_Size
+    ON [dbo].[IB_Storage_Backup_Stat] (ScanDate DESC, BackupFileSizeBytes, OutletServer)
+    INCLUDE (Status, LastBackupTakenUtc, BackupFile, BackupFileSize, ErrorDetails, DriveLetter);
+GO
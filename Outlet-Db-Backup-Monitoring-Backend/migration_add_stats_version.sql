@@ -0,0 +1,21 @@
+-- Migration: Create Stats_Version table (change counter behind the /backup-stats and /ibstorage-stats ETags)
+-- Run this script ONCE on the DBBAK database via SSMS
+-- Version is incremented in the same transaction as every save that changes a
+-- stats row (and when an outlet sync moves an outlet to a new IP address).
+-- Each gunicorn worker caches the serialized latest-stats payload per
+-- ScanType and only rebuilds it when this version has moved; the dashboard
+-- polls revalidate with If-None-Match and get 304 while nothing changed.
+
+CREATE TABLE [dbo].[Stats_Version] (
+    ScanType   VARCHAR(20)  NOT NULL,
+    Version    BIGINT       NOT NULL DEFAULT 1,
+    UpdatedAt  DATETIME     NOT NULL DEFAULT GETDATE(),
+    CONSTRAINT PK_Stats_Version PRIMARY KEY (ScanType),
+    CONSTRAINT CK_Stats_Version_ScanType CHECK (ScanType IN ('D_Drive', 'IB_Storage'))
+);
+GO
+
+INSERT INTO [dbo].[Stats_Version] (ScanType, Version, UpdatedAt)
+VALUES ('D_Drive', 1, GETDATE()),
+       ('IB_Storage', 1, GETDATE());
+GO
@@ -0,0 +1,34 @@
+"""Recompute Backup_Daily_Summary from D_Drive_Backup_Stat / IB_Storage_Backup_Stat.
+
+The summary is normally kept current by save_backup_status; run this after
+editing the stats tables by hand (or restoring them), or if the summary is
+suspected to have drifted:
+
+    python rebuild_daily_summary.py               # both scan types
+    python rebuild_daily_summary.py IB_Storage    # one scan type
+"""
+import argparse
+import sys
+
+from app.logging_config import get_scheduler_logger
+from app.services.daily_summary_service import SUMMARY_TABLES, rebuild_daily_summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild Backup_Daily_Summary from the stats history.')
+    parser.add_argument('scan_types', nargs='*', choices=sorted(SUMMARY_TABLES), metavar='SCAN_TYPE',
+                        help=f"scan types to rebuild ({', '.join(sorted(SUMMARY_TABLES))}); default all")
+    args = parser.parse_args()
+
+    try:
+        rebuilt = rebuild_daily_summary(args.scan_types or None, logger=get_scheduler_logger())
+    except Exception as e:
+        print(f"Rebuild failed: {e}", file=sys.stderr)
+        return 1
+    for scan_type, days in rebuilt.items():
+        print(f"{scan_type}: {days} days")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+from app.services.adaptive_limiter import AdaptiveLimiter
+
+
+def _limiter(initial=10, minimum=2, maximum=20):
+    return AdaptiveLimiter('test', initial=initial, minimum=minimum, maximum=maximum, window=4,
+                           error_threshold=0.25, latency_factor=2.0, decrease_factor=0.5)
+
+
+def _window(limiter, latency=0.1, errors=0):
+    for i in range(limiter.window):
+        limiter.record(latency, i < errors)
+
+
+def test_healthy_window_adds_one():
+    limiter = _limiter()
+
+    _window(limiter)
+    _window(limiter)
+
+    assert limiter.limit == 12
+
+
+def test_error_rate_above_threshold_halves_limit():
+    limiter = _limiter()
+
+    _window(limiter, errors=2)
+
+    assert limiter.limit == 5
+    assert limiter.snapshot()['history'][-1]['reason'] == 'errors'
+
+
+def test_error_rate_at_threshold_still_increases():
+    limiter = _limiter()
+
+    _window(limiter, errors=1)
+
+    assert limiter.limit == 11
+
+
+def test_latency_spike_halves_limit():
+    limiter = _limiter()
+    _window(limiter, latency=0.1)
+
+    _window(limiter, latency=0.5)
+
+    assert limiter.limit == 5
+    assert limiter.snapshot()['history'][-1]['reason'] == 'latency'
+
+
+def test_limit_stays_within_bounds():
+    limiter = _limiter(initial=3, minimum=2, maximum=4)
+
+    for _ in range(3):
+        _window(limiter, errors=4)
+    assert limiter.limit == 2
+
+    for _ in range(5):
+        _window(limiter)
+    assert limiter.limit == 4
+
+
+def test_partial_window_does_not_adjust():
+    limiter = _limiter()
+
+    for _ in range(limiter.window - 1):
+        limiter.record(0.1, True)
+
+    assert limiter.limit == 10
+    assert limiter.snapshot()['history'] == []
+
+
+def test_slots_are_shared_up_to_the_limit():
+    limiter = _limiter(initial=2)
+
+    assert limiter.try_acquire()
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    assert limiter.snapshot()['inFlight'] == 2
+
+    limiter.release()
+
+    assert limiter.try_acquire()
+
+
+def test_lowered_limit_blocks_until_enough_slots_are_released():
+    limiter = _limiter(initial=4)
+    for _ in range(4):
+        limiter.try_acquire()
+
+    _window(limiter, errors=4)  # limit 4 -> 2
+    limiter.release()
+
+    assert not limiter.try_acquire()
+    limiter.release()
+    limiter.release()
+    assert limiter.try_acquire()
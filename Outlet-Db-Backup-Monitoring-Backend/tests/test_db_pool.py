@@ -0,0 +1,197 @@
+import threading
+import time
+
+import pyodbc
+import pytest
+
+from app import db_pool
+from app.db_pool import ConnectionPool, PoolTimeoutError, app_lock
+
+
+class FakeCursor:
+    def __init__(self, raw):
+        self.raw = raw
+        self.result = None
+
+    def execute(self, sql, params=None):
+        self.raw.executed.append((sql, params))
+        if 'sp_getapplock' in sql:
+            self.result = (self.raw.applock_result,)
+        else:
+            self.result = (1,)
+
+    def fetchone(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeRaw:
+    """Stands in for a pyodbc connection."""
+
+    def __init__(self):
+        self.closed = False
+        self.commits = 0
+        self.rollbacks = 0
+        self.executed = []
+        self.applock_result = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """Every raw connection the pool opens, in order."""
+    raws = []
+
+    def connect(conn_str):
+        raw = FakeRaw()
+        raws.append(raw)
+        return raw
+
+    monkeypatch.setattr(db_pool.pyodbc, 'connect', connect)
+    return raws
+
+
+def _pool(max_size=2, idle_timeout=300, checkout_timeout=0.2):
+    return ConnectionPool('test', 'DSN=fake', max_size, idle_timeout, checkout_timeout)
+
+
+def test_connections_are_reused(opened):
+    pool = _pool()
+
+    with pool.connection():
+        pass
+    with pool.connection():
+        pass
+
+    assert len(opened) == 1
+    assert opened[0].rollbacks == 2  # every release rolls back leftovers
+    assert pool.snapshot()['checkouts'] == 2
+
+
+def test_checkout_times_out_when_pool_is_exhausted(opened):
+    pool = _pool(max_size=1, checkout_timeout=0.1)
+    held = pool.connection()
+
+    started = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.connection()
+
+    assert time.monotonic() - started >= 0.1
+    assert pool.snapshot()['timeouts'] == 1
+    held.close()
+
+
+def test_waiting_checkout_gets_released_connection(opened):
+    pool = _pool(max_size=1, checkout_timeout=2)
+    held = pool.connection()
+    got = []
+
+    waiter = threading.Thread(target=lambda: got.append(pool.connection()))
+    waiter.start()
+    time.sleep(0.05)
+    held.close()
+    waiter.join(2)
+
+    assert len(got) == 1 and len(opened) == 1
+    assert pool.snapshot()['waits'] == 1
+    got[0].close()
+
+
+def test_disconnect_discards_connection_and_idle_ones(opened):
+    pool = _pool(max_size=3)
+    idle = pool.connection()
+    busy = pool.connection()
+    idle.close()
+
+    with pytest.raises(pyodbc.OperationalError):
+        with busy:
+            raise pyodbc.OperationalError('08S01', 'Communication link failure')
+
+    assert all(raw.closed for raw in opened)
+    snapshot = pool.snapshot()
+    assert (snapshot['open'], snapshot['idle'], snapshot['inUse']) == (0, 0, 0)
+    assert snapshot['discarded'] == 2
+
+
+def test_query_timeout_keeps_connection(opened):
+    pool = _pool()
+
+    with pytest.raises(pyodbc.OperationalError):
+        with pool.connection():
+            raise pyodbc.OperationalError('HYT00', 'Query timeout expired')
+
+    assert not opened[0].closed
+    assert pool.snapshot()['idle'] == 1
+
+
+def test_failed_connect_frees_its_slot(monkeypatch):
+    def connect(conn_str):
+        raise pyodbc.OperationalError('08001', 'Server not found')
+
+    monkeypatch.setattr(db_pool.pyodbc, 'connect', connect)
+    pool = _pool(max_size=1)
+
+    for _ in range(2):
+        with pytest.raises(pyodbc.OperationalError):
+            pool.connection()
+
+    assert pool.snapshot()['open'] == 0
+
+
+def test_idle_connections_are_evicted(opened):
+    pool = _pool(idle_timeout=0.05)
+    with pool.connection():
+        pass
+
+    time.sleep(0.1)
+    with pool.connection():
+        pass
+
+    assert opened[0].closed
+    assert len(opened) == 2
+    assert pool.snapshot()['open'] == 1
+
+
+def test_using_a_returned_connection_fails(opened):
+    pool = _pool()
+    conn = pool.connection()
+    conn.close()
+
+    with pytest.raises(pyodbc.ProgrammingError):
+        conn.cursor()
+
+
+def test_app_lock_is_released_after_the_block(opened):
+    pool = _pool()
+
+    with pool.connection() as conn:
+        with app_lock(conn, 'ScanRegistry', timeout_ms=10) as locked:
+            assert locked
+
+    statements = [sql for sql, _ in opened[0].executed]
+    assert "@LockOwner = 'Session'" in statements[0]
+    assert 'sp_releaseapplock' in statements[-1]
+
+
+def test_app_lock_not_granted(opened):
+    pool = _pool()
+
+    with pool.connection() as conn:
+        opened[0].applock_result = -1
+        with app_lock(conn, 'OutletSync') as locked:
+            assert not locked
+
+    assert not any('sp_releaseapplock' in sql for sql, _ in opened[0].executed)
@@ -0,0 +1,76 @@
+import socket
+import threading
+
+import pytest
+
+from app.services.port_sweep import PortSweeper, StageStats
+
+
+@pytest.fixture
+def listener():
+    """A TCP port open on 127.0.0.1 only; 127.0.0.2 on the same port refuses."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(64)
+    yield sock.getsockname()[1]
+    sock.close()
+
+
+def _sweep(port, targets, attempts=1, max_open=4, stop_event=None):
+    stats = StageStats('probe')
+    sweeper = PortSweeper(port=port, timeout=2, attempts=attempts, retry_delay=0,
+                          max_open=max_open, stats=stats)
+    reachable, unreachable = [], []
+    sweeper.sweep(targets, reachable.append, unreachable.append, stop_event)
+    return reachable, unreachable, stats.snapshot()
+
+
+def test_reachable_and_refused_hosts_are_split(listener):
+    targets = [('A', '127.0.0.1'), ('B', '127.0.0.2'), ('C', '127.0.0.1')]
+
+    reachable, unreachable, stats = _sweep(listener, targets)
+
+    assert sorted(reachable) == ['A', 'C']
+    assert unreachable == ['B']
+    assert stats['completed'] == 3
+    assert stats['queued'] == 0 and stats['inFlight'] == 0
+
+
+def test_refused_host_is_retried_then_reported_once(listener):
+    reachable, unreachable, stats = _sweep(listener, [('B', '127.0.0.2')], attempts=3)
+
+    assert reachable == []
+    assert unreachable == ['B']
+    assert stats['completed'] == 1
+
+
+def test_more_targets_than_open_sockets(listener):
+    targets = [(i, '127.0.0.1') for i in range(20)]
+
+    reachable, unreachable, _ = _sweep(listener, targets, max_open=2)
+
+    assert sorted(reachable) == list(range(20))
+    assert unreachable == []
+
+
+def test_stop_event_skips_remaining_targets(listener):
+    stop = threading.Event()
+    stop.set()
+
+    reachable, unreachable, _ = _sweep(listener, [('A', '127.0.0.1')], stop_event=stop)
+
+    assert reachable == [] and unreachable == []
+
+
+def test_stage_stats_track_peak_queue_and_retries():
+    stats = StageStats('smb')
+    stats.enqueue(3)
+    stats.start()
+    stats.retry()
+    stats.start()
+    stats.done()
+
+    snapshot = stats.snapshot()
+
+    assert snapshot['peakQueued'] == 3
+    assert (snapshot['queued'], snapshot['inFlight'], snapshot['completed']) == (2, 0, 1)
@@ -0,0 +1,129 @@
+import logging
+import time
+
+import pytest
+
+from app.services import result_batcher
+from app.services.result_batcher import ResultBatcher
+
+
+class FakeHub:
+    def __init__(self):
+        self.notified = 0
+
+    def notify(self):
+        self.notified += 1
+
+
+class FakeMonitor:
+    """Records saved batches; save_backup_status returns `counts` (None = failure)."""
+
+    def __init__(self, counts=None):
+        self.logger = logging.getLogger('test')
+        self.batches = []
+        self.rollup_refreshes = 0
+        self.counts = counts if counts is not None else {'inserted': 1}
+        self.fail = False
+
+    def save_backup_status(self, results):
+        self.batches.append(list(results))
+        if self.fail:
+            return None
+        return {key: (value * len(results) if isinstance(value, int) else value)
+                for key, value in self.counts.items()}
+
+    def refresh_rollups(self):
+        self.rollup_refreshes += 1
+
+
+class FakeRegistration:
+    def __init__(self):
+        self.reports = []
+
+    def report(self, completed, success, failed, current=None):
+        self.reports.append((completed, success, failed, current))
+
+
+@pytest.fixture(autouse=True)
+def hub(monkeypatch):
+    hub = FakeHub()
+    monkeypatch.setattr(result_batcher, 'get_event_hub', lambda: hub)
+    return hub
+
+
+def _result(code, status='Successful'):
+    return {'outletCode': code, 'status': status}
+
+
+def test_full_batch_is_saved_immediately(hub):
+    monitor = FakeMonitor()
+    batcher = ResultBatcher(monitor, batch_size=2, flush_seconds=60)
+
+    batcher.add(_result('A'))
+    assert monitor.batches == []
+    batcher.add(_result('B', 'Error'))
+
+    assert [[r['outletCode'] for r in batch] for batch in monitor.batches] == [['A', 'B']]
+    assert (batcher.success, batcher.failed, batcher.completed) == (1, 1, 2)
+    assert hub.notified == 1
+    batcher.close()
+
+
+def test_timer_flushes_a_partial_batch_without_further_results():
+    monitor = FakeMonitor()
+    batcher = ResultBatcher(monitor, batch_size=50, flush_seconds=0.05)
+
+    batcher.add(_result('A'))
+    deadline = time.monotonic() + 2
+    while not monitor.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert monitor.batches == [[_result('A')]]
+    batcher.close()
+    assert len(monitor.batches) == 1
+
+
+def test_close_saves_the_rest_and_refreshes_rollups_once():
+    monitor = FakeMonitor()
+
+    with ResultBatcher(monitor, batch_size=10, flush_seconds=60) as batcher:
+        batcher.add(_result('A'))
+        batcher.add(_result('B'))
+    batcher.close()
+
+    assert monitor.batches == [[_result('A'), _result('B')]]
+    assert monitor.rollup_refreshes == 1
+    assert batcher.saved == {'inserted': 2}
+
+
+def test_failed_saves_are_counted_and_skip_the_rollup_refresh(hub):
+    monitor = FakeMonitor()
+    monitor.fail = True
+
+    with ResultBatcher(monitor, batch_size=1, flush_seconds=60) as batcher:
+        batcher.add(_result('A'))
+        batcher.add(_result('B'))
+
+    assert (batcher.batches, batcher.save_failures) == (2, 2)
+    assert monitor.rollup_refreshes == 0
+    assert hub.notified == 0
+
+
+def test_nested_counts_are_accumulated():
+    monitor = FakeMonitor(counts={'dDrive': {'inserted': 1}, 'ibStorage': {'updated': 1}})
+
+    with ResultBatcher(monitor, batch_size=1, flush_seconds=60) as batcher:
+        batcher.add(_result('A'))
+        batcher.add(_result('B'))
+
+    assert batcher.saved == {'dDrive': {'inserted': 2}, 'ibStorage': {'updated': 2}}
+
+
+def test_progress_is_reported_to_the_registration():
+    registration = FakeRegistration()
+
+    with ResultBatcher(FakeMonitor(), batch_size=10, flush_seconds=60, registration=registration) as batcher:
+        batcher.add(_result('A'))
+        batcher.add(_result('B', 'Error'))
+
+    assert registration.reports == [(1, 1, 0, 'A'), (2, 1, 1, 'B')]
@@ -0,0 +1,102 @@
+from datetime import date
+
+import pytest
+
+from app.services.stats_changes import decode_change_token, encode_change_token, read_stat_changes
+
+HIGH_WATER = bytes.fromhex('00000000000007d0')
+LATEST = date(2026, 3, 2)
+
+
+class FakeCursor:
+    """Answers the bounds query with `bounds` and the rows query with `rows`."""
+
+    def __init__(self, bounds, rows=()):
+        self.bounds = bounds
+        self.rows = list(rows)
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchone(self):
+        return self.bounds
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+
+def _read(bounds, since=None, rows=()):
+    cursor = FakeCursor(bounds, rows)
+    return read_stat_changes(FakeConnection(cursor), 'D_Drive_Backup_Stat', 'b.OutletServer', since), cursor
+
+
+def test_token_round_trip():
+    token = encode_change_token(LATEST, HIGH_WATER)
+
+    assert decode_change_token(token) == (LATEST, HIGH_WATER)
+
+
+@pytest.mark.parametrize('token', ['', 'garbage', encode_change_token(LATEST, b'\x01\x02')])
+def test_invalid_token_rejected(token):
+    with pytest.raises(ValueError, match='Invalid since token'):
+        decode_change_token(token)
+
+
+def test_no_token_returns_whole_latest_date():
+    (rows, scan_date, token, reset), cursor = _read((HIGH_WATER, LATEST, 8), rows=[('OUT01',)])
+
+    assert reset is True
+    assert rows == [('OUT01',)]
+    assert scan_date == LATEST
+    assert decode_change_token(token) == (LATEST, HIGH_WATER)
+    sql, params = cursor.executed[-1]
+    assert 'RowVer >=' not in sql
+    assert params == [LATEST, HIGH_WATER]
+
+
+def test_token_for_latest_date_returns_only_changes():
+    since = (LATEST, bytes.fromhex('00000000000003e8'))
+
+    (_, _, token, reset), cursor = _read((HIGH_WATER, LATEST, 8), since=since)
+
+    assert reset is False
+    sql, params = cursor.executed[-1]
+    assert 'b.RowVer < ?' in sql and 'b.RowVer >= ?' in sql
+    assert params == [LATEST, HIGH_WATER, since[1]]
+    assert decode_change_token(token) == (LATEST, HIGH_WATER)
+
+
+def test_token_for_older_date_resets():
+    since = (date(2026, 3, 1), bytes.fromhex('00000000000003e8'))
+
+    (_, scan_date, _, reset), cursor = _read((HIGH_WATER, LATEST, 8), since=since)
+
+    assert reset is True
+    assert scan_date == LATEST
+    assert 'RowVer >=' not in cursor.executed[-1][0]
+
+
+def test_without_rowver_column_always_resets_and_issues_no_token():
+    since = (LATEST, bytes.fromhex('00000000000003e8'))
+
+    (_, _, token, reset), cursor = _read((HIGH_WATER, LATEST, None), since=since)
+
+    assert reset is True
+    assert token is None
+    assert 'RowVer' not in cursor.executed[-1][0]
+
+
+def test_empty_table_resets():
+    (rows, scan_date, token, reset), cursor = _read((HIGH_WATER, None, 8))
+
+    assert (rows, scan_date, token, reset) == ([], None, None, True)
+    assert len(cursor.executed) == 1
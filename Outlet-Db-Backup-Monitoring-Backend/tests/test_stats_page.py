@@ -0,0 +1,103 @@
+import sqlite3
+from datetime import date, datetime
+
+import pytest
+
+from app.services.stats_page import _after_clause, decode_cursor, encode_cursor
+
+# SQLite orders NULL like SQL Server does: first ascending, last descending
+ROWS = [
+    ('OUT01', 'Successful'),
+    ('OUT02', None),
+    ('OUT03', 'Error'),
+    ('OUT04', None),
+    ('OUT05', 'Successful'),
+    ('OUT06', 'Error'),
+    ('OUT07', None),
+]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE stats (OutletServer TEXT, Status TEXT)")
+    conn.executemany("INSERT INTO stats VALUES (?, ?)", ROWS)
+    yield conn
+    conn.close()
+
+
+def _walk(conn, column, descending, page_size):
+    """Read every row page by page, seeking past the previous page's last key."""
+    direction = 'DESC' if descending else 'ASC'
+    order = f"{column} {direction}, b.OutletServer {direction}" if column != 'b.OutletServer' \
+        else f"b.OutletServer {direction}"
+    seen = []
+    after = None
+    while True:
+        where, params = ('1=1', [])
+        if after:
+            where, params = _after_clause(column, descending, *after)
+        page = conn.execute(
+            f"SELECT b.OutletServer, {column} FROM stats b WHERE {where} ORDER BY {order} LIMIT ?",
+            params + [page_size]
+        ).fetchall()
+        if not page:
+            return seen
+        seen.extend(page)
+        outlet, value = page[-1]
+        after = (value, outlet)
+
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('page_size', [1, 2, 3])
+@pytest.mark.parametrize('column', ['b.Status', 'b.OutletServer'])
+def test_keyset_pages_match_full_order(conn, column, descending, page_size):
+    direction = 'DESC' if descending else 'ASC'
+    order = f"{column} {direction}, b.OutletServer {direction}" if column != 'b.OutletServer' \
+        else f"b.OutletServer {direction}"
+    expected = conn.execute(f"SELECT b.OutletServer, {column} FROM stats b ORDER BY {order}").fetchall()
+
+    assert _walk(conn, column, descending, page_size) == expected
+
+
+def test_null_cursor_value_ascending_moves_on_to_non_null_rows():
+    sql, params = _after_clause('b.Status', False, None, 'OUT04')
+
+    assert sql == "(b.Status IS NOT NULL OR b.OutletServer > ?)"
+    assert params == ['OUT04']
+
+
+def test_null_cursor_value_descending_stays_within_null_rows():
+    sql, params = _after_clause('b.Status', True, None, 'OUT04')
+
+    assert sql == "(b.Status IS NULL AND b.OutletServer < ?)"
+    assert params == ['OUT04']
+
+
+def test_cursor_round_trip():
+    page = {'sort': 'lastModified', 'descending': True}
+    row = ('ignored', date(2026, 3, 1), datetime(2026, 2, 28, 23, 15), 'OUT09')
+
+    token = encode_cursor(row, page)
+
+    assert decode_cursor(token, '-lastModified') == (date(2026, 3, 1), datetime(2026, 2, 28, 23, 15), 'OUT09')
+
+
+def test_cursor_keeps_null_value():
+    page = {'sort': 'size', 'descending': False}
+
+    token = encode_cursor((date(2026, 3, 1), None, 'OUT02'), page)
+
+    assert decode_cursor(token, 'size') == (date(2026, 3, 1), None, 'OUT02')
+
+
+def test_cursor_rejected_for_another_sort():
+    token = encode_cursor((date(2026, 3, 1), 'Error', 'OUT03'), {'sort': 'status', 'descending': False})
+
+    with pytest.raises(ValueError, match='different sort'):
+        decode_cursor(token, '-status')
+
+
+def test_garbage_cursor_rejected():
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_cursor('not-a-cursor', 'outlet')